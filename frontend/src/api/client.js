@@ -30,24 +30,77 @@ export function filterProductsByCategory(products, category) {
   return products.filter(p => p.category === category);
 }
 
-/**
- * Search for deals using a product query
- */
-export async function searchDeals(query) {
-  const response = await fetch(`${API_BASE_URL}/deals`, {
-    method: 'POST',
-    headers: {
-      'Content-Type': 'application/json',
-    },
-    body: JSON.stringify({ query }),
-  });
-  
+// Listing fields the deal feed renders (see hooks/useDealFeed.js); the API
+// selects only these, so listings carry nothing the page doesn't show
+export const LISTING_FIELDS = [
+  'title',
+  'listing_url',
+  'price',
+  'currency',
+  'condition_category',
+  'condition_description',
+  'fetched_at',
+  'marketplace_id',
+  'discount_pct',
+];
+
+// Last response and ETag per deals request, replayed when the API answers
+// 304 Not Modified (nothing was ingested since)
+const dealsResponseCache = new Map();
+
+// Times a deals request is retried when the API answers 503 (its database
+// connections are all busy), after the Retry-After it sends
+const BUSY_RETRIES = 2;
+const MAX_RETRY_AFTER_MS = 5000;
+
+function retryAfterMs(response) {
+  const seconds = Number(response.headers.get('Retry-After'));
+  return Number.isFinite(seconds) && seconds > 0 ? Math.min(seconds * 1000, MAX_RETRY_AFTER_MS) : 1000;
+}
+
+async function postDeals(path, payload) {
+  const body = JSON.stringify(payload);
+  const key = `${path} ${body}`;
+  const cached = dealsResponseCache.get(key);
+  const headers = { 'Content-Type': 'application/json' };
+  if (cached) headers['If-None-Match'] = cached.etag;
+
+  let response = await fetch(`${API_BASE_URL}${path}`, { method: 'POST', headers, body });
+  for (let retry = 0; response.status === 503 && retry < BUSY_RETRIES; retry++) {
+    await new Promise((resolve) => setTimeout(resolve, retryAfterMs(response)));
+    response = await fetch(`${API_BASE_URL}${path}`, { method: 'POST', headers, body });
+  }
+
+  if (response.status === 304 && cached) return cached.data;
+
   if (!response.ok) {
     const error = await response.json().catch(() => ({ error: 'Failed to search deals' }));
     throw new Error(error.error || 'Failed to search deals');
   }
-  
-  return response.json();
+
+  const data = await response.json();
+  const etag = response.headers.get('ETag');
+  if (etag) dealsResponseCache.set(key, { etag, data });
+  return data;
+}
+
+/**
+ * Search for deals using a product query.
+ * Resolves to { benchmark, listings, next_cursor }; pass `cursor: next_cursor`
+ * to get the page after it.
+ */
+export async function searchDeals(query, { fields = LISTING_FIELDS, pageSize, cursor } = {}) {
+  return postDeals('/deals', { query, fields, page_size: pageSize, cursor });
+}
+
+/**
+ * Search for deals for many product queries in one request.
+ * Resolves to [{ query, benchmark, listings, next_cursor }] in the order of
+ * `queries`, each the first page of that query's deals.
+ */
+export async function searchDealsBatch(queries, { fields = LISTING_FIELDS, pageSize } = {}) {
+  const data = await postDeals('/deals/batch', { queries, fields, page_size: pageSize });
+  return Array.isArray(data?.results) ? data.results : [];
 }
 
 /**
@@ -61,21 +114,50 @@ export function calculateDiscount(price, median) {
 }
 
 /**
- * Fan-out /deals across every product and return a flat result set.
+ * Load /deals for every product and return a flat result set.
  * Each returned entry keeps a reference to its source product + benchmark so
  * downstream code can derive category, fair value, trim window, etc.
  *
+ * Products are requested through /deals/batch, `batchSize` queries per
+ * request. If a batch request fails (e.g. an API without the batch route),
+ * its products fall back to one /deals request each, `concurrency` at a time.
+ *
  * Returns { results: [{ product, benchmark, listings, error? }], errors: string[] }.
  */
-export async function fetchDealsForProducts(products, { concurrency = 6 } = {}) {
+export async function fetchDealsForProducts(products, { concurrency = 6, batchSize = 50 } = {}) {
   const results = new Array(products.length);
   const errors = [];
+  const fallback = [];
+
+  for (let start = 0; start < products.length; start += batchSize) {
+    const indexes = [];
+    for (let i = start; i < Math.min(start + batchSize, products.length); i++) indexes.push(i);
+    try {
+      const batch = await searchDealsBatch(indexes.map((i) => products[i].query));
+      indexes.forEach((i, k) => {
+        const data = batch[k];
+        if (!data) {
+          fallback.push(i);
+          return;
+        }
+        results[i] = {
+          product: products[i],
+          benchmark: data.benchmark ?? null,
+          listings: Array.isArray(data.listings) ? data.listings : [],
+        };
+      });
+    } catch {
+      fallback.push(...indexes);
+    }
+  }
+
   let cursor = 0;
 
   async function worker() {
     while (true) {
-      const i = cursor++;
-      if (i >= products.length) return;
+      const next = cursor++;
+      if (next >= fallback.length) return;
+      const i = fallback[next];
       const product = products[i];
       try {
         const data = await searchDeals(product.query);
@@ -93,10 +175,98 @@ export async function fetchDealsForProducts(products, { concurrency = 6 } = {})
   }
 
   const workers = Array.from(
-    { length: Math.max(1, Math.min(concurrency, products.length || 1)) },
+    { length: Math.max(1, Math.min(concurrency, fallback.length || 1)) },
     () => worker()
   );
   await Promise.all(workers);
 
   return { results, errors };
 }
+
+function dealsEntry(product, data) {
+  return {
+    product,
+    benchmark: data?.benchmark ?? null,
+    listings: Array.isArray(data?.listings) ? data.listings : [],
+  };
+}
+
+/**
+ * Like fetchDealsForProducts, but over one /deals/stream request: the API
+ * computes every product's deals and sends each as soon as it is ready, and
+ * `onResult(index, entry)` is called per product as its entry arrives, so the
+ * feed can render before the slowest query finishes.
+ *
+ * If the stream cannot be opened or ends before its summary (e.g. an API
+ * without the stream route), the products still missing are loaded with
+ * fetchDealsForProducts.
+ *
+ * Returns { results: [{ product, benchmark, listings, error? }], errors: string[] }.
+ */
+export async function streamDealsForProducts(products, { onResult, fields = LISTING_FIELDS } = {}) {
+  const results = new Array(products.length);
+  const indexesByQuery = new Map();
+  products.forEach((product, i) => {
+    const indexes = indexesByQuery.get(product.query) || [];
+    indexes.push(i);
+    indexesByQuery.set(product.query, indexes);
+  });
+
+  function settle(i, entry) {
+    results[i] = entry;
+    onResult?.(i, entry);
+  }
+
+  const streamErrors = [];
+  let summary = null;
+
+  function handle(event) {
+    const indexes = indexesByQuery.get(event.query) || [];
+    if (event.type === 'result') {
+      for (const i of indexes) settle(i, dealsEntry(products[i], event));
+    } else if (event.type === 'error') {
+      for (const i of indexes) {
+        const product = products[i];
+        streamErrors.push(`${product.name || product.query}: ${event.error}`);
+        settle(i, { product, benchmark: null, listings: [], error: event.error });
+      }
+    } else if (event.type === 'summary') {
+      summary = event;
+    }
+  }
+
+  try {
+    const response = await fetch(`${API_BASE_URL}/deals/stream`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json', Accept: 'application/x-ndjson' },
+      body: JSON.stringify({ queries: [...indexesByQuery.keys()], fields }),
+    });
+    if (!response.ok || !response.body) throw new Error('Failed to stream deals');
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffered = '';
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffered += decoder.decode(value, { stream: true });
+      const lines = buffered.split('\n');
+      buffered = lines.pop();
+      for (const line of lines) {
+        if (line) handle(JSON.parse(line));
+      }
+    }
+  } catch {
+    // Fall through: whatever did not arrive is fetched below
+  }
+
+  if (summary) return { results, errors: summary.errors };
+
+  const missing = [];
+  products.forEach((_, i) => {
+    if (!results[i]) missing.push(i);
+  });
+  const fallback = await fetchDealsForProducts(missing.map((i) => products[i]));
+  missing.forEach((i, k) => settle(i, fallback.results[k]));
+  return { results, errors: [...streamErrors, ...fallback.errors] };
+}
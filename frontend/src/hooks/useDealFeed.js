@@ -1,5 +1,5 @@
 import { useCallback, useEffect, useMemo, useState } from 'react';
-import { fetchProducts, fetchDealsForProducts } from '../api/client';
+import { fetchProducts, streamDealsForProducts } from '../api/client';
 
 const CATEGORY_IMAGE_MAP = {
   Laptop: 'laptop',
@@ -89,7 +89,18 @@ export function useDealFeed() {
         setProductsLoading(false);
 
         setDealsLoading(true);
-        const { results, errors } = await fetchDealsForProducts(data);
+        setProductResults([]);
+        // Render each product's deals as the API streams them in
+        const { results, errors } = await streamDealsForProducts(data, {
+          onResult: (i, entry) => {
+            if (cancelled) return;
+            setProductResults((prev) => {
+              const next = prev.slice();
+              next[i] = entry;
+              return next;
+            });
+          },
+        });
         if (cancelled) return;
         setProductResults(results);
         setLastFetchedAt(new Date());
@@ -0,0 +1,125 @@
+"""
+Parsed, validated products.json, shared by the pricing engine and mock-api.
+
+load_catalog(path) returns a Catalog that is cached per path and rebuilt only
+when the file's mtime or size changes, so callers can ask for it on every
+request. Besides the raw config, a Catalog precomputes what /products and
+/deals need: the public product projection (name, category, query), an
+index of that projection by category, the api_query_id of every query, and
+the serialized /products bodies with their ETags.
+
+If the file becomes unreadable or invalid after a successful load, the last
+good catalog keeps being served and the error is logged; the first load
+raises.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PUBLIC_FIELDS = ("name", "category", "query")
+
+_cache: Dict[str, "Catalog"] = {}
+# (mtime_ns, size) of a file version that failed to load, so it is parsed
+# and logged once rather than on every call
+_failed: Dict[str, Tuple[int, int]] = {}
+_cache_lock = threading.Lock()
+
+
+def api_query_id(query: str) -> str:
+    """The key ebay_listings rows are grouped by."""
+    return hashlib.sha256(query.encode("utf-8")).hexdigest()
+
+
+def validate_config(cfg: Any) -> None:
+    """Raise ValueError if `cfg` is not a usable products.json."""
+    if not isinstance(cfg, dict):
+        raise ValueError("products.json must contain a JSON object")
+    default = cfg.get("default", {})
+    if not isinstance(default, dict):
+        raise ValueError("'default' must be an object")
+    if not isinstance(default.get("blacklist", []), list):
+        raise ValueError("'default.blacklist' must be a list")
+
+    products = cfg.get("products", [])
+    if not isinstance(products, list):
+        raise ValueError("'products' must be a list")
+    for i, product in enumerate(products):
+        if not isinstance(product, dict):
+            raise ValueError(f"products[{i}] must be an object")
+        query = product.get("query")
+        if not isinstance(query, str) or not query.strip():
+            raise ValueError(f"products[{i}] needs a non-empty 'query'")
+        for key in ("blacklist_add", "blacklist_remove"):
+            if not isinstance(product.get(key, []), list):
+                raise ValueError(f"products[{i}].{key} must be a list")
+
+
+def _serialize(value: Any) -> Tuple[bytes, str]:
+    body = json.dumps(value, sort_keys=True, separators=(",", ":")).encode("utf-8") + b"\n"
+    return body, hashlib.sha256(body).hexdigest()[:32]
+
+
+class Catalog:
+    def __init__(self, config: Dict[str, Any], mtime_ns: int, size: int):
+        self.config = config
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.last_modified = datetime.fromtimestamp(mtime_ns / 1e9, tz=timezone.utc).replace(microsecond=0)
+
+        self.products: List[Dict[str, Any]] = [
+            {field: product.get(field) for field in PUBLIC_FIELDS}
+            for product in config.get("products", [])
+        ]
+        self.categories: Dict[Any, List[Dict[str, Any]]] = {}
+        for product in self.products:
+            self.categories.setdefault(product["category"], []).append(product)
+        self.query_ids: Dict[str, str] = {p["query"]: api_query_id(p["query"]) for p in self.products}
+
+        # Pre-serialized /products bodies: None for all products, else per category
+        self._bodies: Dict[Any, Tuple[bytes, str]] = {None: _serialize(self.products)}
+        for category, products in self.categories.items():
+            self._bodies[category] = _serialize(products)
+
+    def body(self, category: Optional[str] = None) -> Tuple[bytes, str]:
+        """(JSON body, ETag) of the product projection, optionally one category's."""
+        if category is not None and category not in self.categories:
+            return _serialize([])
+        return self._bodies[category]
+
+    def query_id(self, query: str) -> str:
+        cached = self.query_ids.get(query)
+        return cached if cached is not None else api_query_id(query)
+
+
+def load_catalog(path: str) -> Catalog:
+    """The Catalog for `path`, re-parsed only if the file changed since the last call."""
+    key = os.path.abspath(path)
+    with _cache_lock:
+        current = _cache.get(key)
+        try:
+            st = os.stat(key)
+            version = (st.st_mtime_ns, st.st_size)
+            if current is not None and (version == (current.mtime_ns, current.size) or version == _failed.get(key)):
+                return current
+            with open(key, "r", encoding="utf-8") as f:
+                config = json.load(f)
+            validate_config(config)
+        except (OSError, ValueError) as e:
+            if current is None:
+                raise
+            if isinstance(e, ValueError):
+                _failed[key] = version
+            logger.error("CATALOG_RELOAD | path=%s | status=FAILED | error=%s | action=KEEP_PREVIOUS", key, str(e))
+            return current
+
+        catalog = Catalog(config, st.st_mtime_ns, st.st_size)
+        _cache[key] = catalog
+        _failed.pop(key, None)
+        logger.info("CATALOG_RELOAD | path=%s | products=%d | status=SUCCESS", key, len(catalog.products))
+        return catalog
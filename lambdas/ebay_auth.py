@@ -1,15 +1,21 @@
 import os
 import base64
+import logging
+import tempfile
+import threading
 import time
 import json
 import hashlib
-import requests
 from dotenv import load_dotenv
 from datetime import datetime
 from pathlib import Path
 
+from http_client import request as http_request
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 CLIENT_ID = os.getenv("CLIENT_ID")
 CLIENT_SECRET = os.getenv("CLIENT_SECRET")
 EBAY_ENV = os.getenv("EBAY_ENV", "sandbox").lower()  
@@ -30,6 +36,17 @@ TOKEN_URL = (
 SCOPE = os.getenv("EBAY_SCOPE", "https://api.ebay.com/oauth/api_scope")
 
 REFRESH_BUFFER = 60  # seconds
+# The background refresher mints a new token this many seconds before refresh_at
+PREFETCH_LEAD = int(os.getenv("EBAY_TOKEN_PREFETCH", 300))
+BACKGROUND_REFRESH = os.getenv("EBAY_TOKEN_BACKGROUND_REFRESH", "true").lower() not in ("0", "false", "no")
+REFRESH_RETRY = 15  # seconds between background attempts after a refresh or failure
+
+# Process-level cache: (token, refresh_at), replaced as a whole so readers never
+# see a half-updated pair. _refresh_lock makes refreshes single-flight.
+_cached = (None, 0)
+_refresh_lock = threading.Lock()
+_refresher = None
+_refresher_lock = threading.Lock()
 
 def _cache_path() -> str:
     client_tag = CLIENT_ID[:8]
@@ -49,7 +66,7 @@ def get_app_token():
         "scope": SCOPE,
     }
 
-    r = requests.post(TOKEN_URL, headers=headers, data=data, timeout=30)
+    r = http_request("POST", TOKEN_URL, headers=headers, data=data)
     if not r.ok:
         raise RuntimeError(f"Token request failed: {r.status_code} {r.text}")
 
@@ -73,19 +90,80 @@ def _load_cached_token():
         return None, 0
 
 def _save_cached_token(token: str, refresh_at: int):
+    # Write to a temp file in the same directory and rename over the cache, so
+    # concurrent readers (or other processes) never see a partial file.
     path = _cache_path()
-    with open(path, "w") as f:
-        json.dump({"access_token": token, "refresh_at": refresh_at}, f)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".ebay_token_cache.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump({"access_token": token, "refresh_at": refresh_at}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def _refresh_token(valid_after: int):
+    """
+    Return a token whose refresh_at is later than `valid_after`, minting one if needed.
+
+    Only one thread at a time gets past _refresh_lock; callers that queued behind
+    it pick up the token it stored instead of hitting TOKEN_URL again. The disk
+    cache is checked first in case another process already refreshed.
+    """
+    global _cached
+    with _refresh_lock:
+        token, refresh_at = _cached
+        if token and refresh_at > valid_after:
+            return token, refresh_at
+
+        token, refresh_at = _load_cached_token()
+        if not (token and refresh_at > valid_after):
+            token, refresh_at = get_app_token()
+            _save_cached_token(token, refresh_at)
+            logger.info("TOKEN_REFRESH | env=%s | refresh_at=%d | status=SUCCESS", EBAY_ENV, refresh_at)
+
+        _cached = (token, refresh_at)
+        return token, refresh_at
+
+def _background_refresh_loop():
+    while True:
+        _, refresh_at = _cached
+        wait = refresh_at - PREFETCH_LEAD - time.time()
+        if wait > 0:
+            time.sleep(wait)
+            continue
+        try:
+            _refresh_token(int(time.time()) + PREFETCH_LEAD)
+        except Exception as e:
+            logger.warning("TOKEN_REFRESH | env=%s | status=FAILED | error=%s", EBAY_ENV, str(e))
+        time.sleep(REFRESH_RETRY)
+
+def _ensure_background_refresh():
+    global _refresher
+    if not BACKGROUND_REFRESH or _refresher is not None:
+        return
+    with _refresher_lock:
+        if _refresher is None:
+            _refresher = threading.Thread(
+                target=_background_refresh_loop,
+                name="ebay-token-refresh",
+                daemon=True
+            )
+            _refresher.start()
 
 def get_token_cached():
-    token, refresh_at = _load_cached_token()
+    token, refresh_at = _cached
     now = int(time.time())
 
-    if token and refresh_at > now:
-        return token, refresh_at
+    if not (token and refresh_at > now):
+        token, refresh_at = _refresh_token(now)
 
-    token, refresh_at = get_app_token()
-    _save_cached_token(token, refresh_at)
+    _ensure_background_refresh()
     return token, refresh_at
 
 if __name__ == "__main__":
@@ -0,0 +1,583 @@
+"""
+MySQL write path for ebay_listings rows.
+
+Rows are plain tuples in LISTING_COLUMNS order. Three write modes are
+supported, picked with DB_WRITE_MODE:
+
+    row        one INSERT per listing (the original behaviour)
+    batch      multi-row INSERTs of DB_BATCH_SIZE rows (default)
+    load_data  LOAD DATA LOCAL INFILE for products with at least
+               DB_LOAD_DATA_MIN_ROWS rows, batch mode below that
+
+A batch that fails is replayed row by row, so a single bad listing is
+still counted and logged on its own instead of sinking its neighbours.
+Connections come from one MySQLConnectionPool per db_config that lives for
+the whole run.
+
+DB_INGEST_MODE=delta switches to change-only ingestion: the last known
+price/condition of every (api_query_id, ebay_item_id) is kept in
+MYSQL_STATE_TABLE, only new or changed listings become new ebay_listings
+rows, and unchanged listings just have last_seen_at moved forward on the
+row that holds their current price.
+
+refresh_query_benchmarks materializes the /deals benchmark (trimmed median
+over the last BENCHMARK_WINDOW_DAYS, bottom BENCHMARK_TRIM_PCT percent
+dropped) into MYSQL_BENCHMARK_TABLE at the end of each ingestion run.
+
+bump_run_version rewrites the RUN_VERSION_FILE marker once a run's rows and
+benchmarks are committed; mock-api caches /deals responses until it changes.
+
+db_config_from_env, table_name_from_env, refresh_benchmarks_for_ids and
+bump_run_version are shared by fetch_data.py and spool_loader.py, so both
+end a load the same way.
+"""
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import mysql.connector
+from mysql.connector import pooling
+
+logger = logging.getLogger(__name__)
+
+LISTING_COLUMNS = (
+    "marketplace_id",
+    "query_name",
+    "api_query_text",
+    "api_query_id",
+    "fetched_at",
+    "last_seen_at",
+    "ebay_item_id",
+    "title",
+    "condition_category",
+    "condition_description",
+    "listing_url",
+    "price",
+    "currency",
+)
+
+WRITE_MODES = ("row", "batch", "load_data")
+
+WRITE_MODE = os.environ.get("DB_WRITE_MODE", "batch").lower()
+BATCH_SIZE = max(1, int(os.environ.get("DB_BATCH_SIZE", 500)))
+LOAD_DATA_MIN_ROWS = max(1, int(os.environ.get("DB_LOAD_DATA_MIN_ROWS", 5000)))
+INGEST_MODE = os.environ.get("DB_INGEST_MODE", "full").lower()
+STATE_TABLE = os.environ.get("MYSQL_STATE_TABLE", "ebay_listing_state")
+BENCHMARK_TABLE = os.environ.get("MYSQL_BENCHMARK_TABLE", "query_benchmarks")
+BENCHMARK_WINDOW_DAYS = max(1, int(os.environ.get("BENCHMARK_WINDOW_DAYS", 7)))
+BENCHMARK_TRIM_PCT = int(os.environ.get("BENCHMARK_TRIM_PCT", 15))
+# Empty disables the marker (e.g. on Lambda, where nothing reads it)
+RUN_VERSION_FILE = os.environ.get(
+    "RUN_VERSION_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".run_version")
+)
+
+_COL = {name: i for i, name in enumerate(LISTING_COLUMNS)}
+
+# mysql.connector refuses pools larger than this
+MAX_POOL_SIZE = pooling.CNX_POOL_MAXSIZE
+
+_pools: Dict[Tuple, pooling.MySQLConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def db_config_from_env() -> Dict[str, Any]:
+    """mysql.connector settings from the MYSQL_* environment variables."""
+    return {
+        "host": os.environ.get("MYSQL_HOST", "localhost"),
+        "port": int(os.environ.get("MYSQL_PORT", 3306)),
+        "user": os.environ.get("MYSQL_USER", "root"),
+        "password": os.environ.get("MYSQL_PASSWORD", ""),
+        "database": os.environ.get("MYSQL_DATABASE", ""),
+    }
+
+
+def table_name_from_env() -> str:
+    """MYSQL_TABLE, the listings table; raises ValueError unless it is a plain identifier."""
+    table_name = os.environ.get("MYSQL_TABLE", "")
+    if not table_name or not table_name.replace('_', '').isalnum():
+        raise ValueError("Invalid table name configuration")
+    return table_name
+
+
+def get_pool(db_config: Dict[str, Any], pool_size: int = 1) -> pooling.MySQLConnectionPool:
+    """Return the run-wide pool for `db_config`, creating it on first use."""
+    key = tuple(sorted(db_config.items()))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            config = dict(db_config)
+            if WRITE_MODE == "load_data":
+                config.setdefault("allow_local_infile", True)
+            pool = pooling.MySQLConnectionPool(
+                pool_name=f"listings{len(_pools)}",
+                pool_size=max(1, min(pool_size, MAX_POOL_SIZE)),
+                pool_reset_session=False,
+                **config
+            )
+            _pools[key] = pool
+        return pool
+
+
+def _columns_sql() -> str:
+    return ",\n            ".join(LISTING_COLUMNS)
+
+
+def insert_sql(table_name: str, row_count: int = 1) -> str:
+    placeholders = "(" + ", ".join(["%s"] * len(LISTING_COLUMNS)) + ")"
+    return f"""
+        INSERT INTO {table_name} (
+            {_columns_sql()}
+        ) VALUES {", ".join([placeholders] * row_count)}
+        ON DUPLICATE KEY UPDATE id=id
+    """
+
+
+def _write_rows_single(
+    cursor,
+    table_name: str,
+    rows: Sequence[Tuple],
+    query_name: str,
+    failed_ids: Optional[set] = None
+) -> Tuple[int, int]:
+    sql = insert_sql(table_name)
+    written = 0
+    failed = 0
+    for row in rows:
+        try:
+            cursor.execute(sql, row)
+            if cursor.rowcount > 0:
+                written += 1
+        except mysql.connector.Error as e:
+            failed += 1
+            if failed_ids is not None:
+                failed_ids.add(row[_COL["ebay_item_id"]])
+            logger.warning(
+                "DB_WRITE_ITEM | query=%s | ebay_item_id=%s | status=FAILED | error=%s",
+                query_name, row[_COL["ebay_item_id"]], str(e)
+            )
+    return written, failed
+
+
+def _write_rows_batched(
+    conn,
+    cursor,
+    table_name: str,
+    rows: Sequence[Tuple],
+    query_name: str,
+    batch_size: int,
+    failed_ids: Optional[set] = None
+) -> Tuple[int, int]:
+    written = 0
+    failed = 0
+    full_batch_sql = insert_sql(table_name, batch_size)
+
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        sql = full_batch_sql if len(batch) == batch_size else insert_sql(table_name, len(batch))
+        params = [val for row in batch for val in row]
+        try:
+            cursor.execute(sql, params)
+            # With ON DUPLICATE KEY UPDATE id=id, duplicates report 0 affected rows
+            written += max(cursor.rowcount, 0)
+        except mysql.connector.Error as e:
+            logger.warning(
+                "DB_WRITE_BATCH | query=%s | batch_start=%d | batch_rows=%d | "
+                "status=FAILED | fallback=row | error=%s",
+                query_name, start, len(batch), str(e)
+            )
+            batch_written, batch_failed = _write_rows_single(cursor, table_name, batch, query_name, failed_ids)
+            written += batch_written
+            failed += batch_failed
+        # Commit per batch so a later deadlock can't roll back batches already counted
+        conn.commit()
+
+    return written, failed
+
+
+def _tsv_field(val: Any) -> str:
+    if val is None:
+        return "\\N"
+    return (
+        str(val)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def _write_rows_load_data(cursor, table_name: str, rows: Sequence[Tuple]) -> int:
+    # Rows rejected by LOAD DATA (duplicates, bad values) are skipped by the
+    # server rather than raised, so they show up as records_skipped.
+    fd, path = tempfile.mkstemp(prefix="ebay_listings.", suffix=".tsv")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            for row in rows:
+                f.write("\t".join(_tsv_field(v) for v in row))
+                f.write("\n")
+
+        cursor.execute(
+            f"""
+            LOAD DATA LOCAL INFILE %s
+            IGNORE INTO TABLE {table_name}
+            CHARACTER SET utf8mb4
+            FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\'
+            LINES TERMINATED BY '\\n'
+            ({", ".join(LISTING_COLUMNS)})
+            """,
+            (path,)
+        )
+        return max(cursor.rowcount, 0)
+    finally:
+        os.unlink(path)
+
+
+def write_listing_rows(
+    conn,
+    table_name: str,
+    rows: List[Tuple],
+    query_name: str,
+    mode: Optional[str] = None,
+    batch_size: Optional[int] = None,
+    failed_ids: Optional[set] = None
+) -> Tuple[int, int]:
+    """
+    Write `rows` to `table_name` and commit. Returns (rows_written, rows_failed).
+
+    If `failed_ids` is given, the ebay_item_id of every row that failed on its
+    own is added to it. Raises mysql.connector.Error only for failures outside
+    a single row, such as a lost connection, after rolling back the
+    uncommitted work.
+    """
+    mode = (mode or WRITE_MODE).lower()
+    if mode not in WRITE_MODES:
+        raise ValueError(f"Unknown DB_WRITE_MODE: {mode}")
+    batch_size = batch_size or BATCH_SIZE
+
+    cursor = conn.cursor()
+    try:
+        if mode == "load_data" and len(rows) >= LOAD_DATA_MIN_ROWS:
+            try:
+                written = _write_rows_load_data(cursor, table_name, rows)
+                conn.commit()
+                return written, 0
+            except mysql.connector.Error as e:
+                conn.rollback()
+                logger.warning(
+                    "DB_WRITE_LOAD_DATA | query=%s | rows=%d | status=FAILED | fallback=batch | error=%s",
+                    query_name, len(rows), str(e)
+                )
+            return _write_rows_batched(conn, cursor, table_name, rows, query_name, batch_size, failed_ids)
+
+        if mode == "row":
+            written, failed = _write_rows_single(cursor, table_name, rows, query_name, failed_ids)
+            conn.commit()
+            return written, failed
+
+        return _write_rows_batched(conn, cursor, table_name, rows, query_name, batch_size, failed_ids)
+    except mysql.connector.Error:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def _money(val: Any) -> Decimal:
+    # Same rounding MySQL applies when storing into DECIMAL(10,2)
+    return Decimal(str(val)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+
+
+def _state_upsert_sql(state_table: str, row_count: int) -> str:
+    placeholders = ", ".join(["(%s, %s, %s, %s, %s, %s, %s)"] * row_count)
+    # observed_at is assigned before price/condition so the IF() still sees the
+    # previous values: it only moves when the listing actually changed.
+    return f"""
+        INSERT INTO {state_table} (
+            api_query_id,
+            ebay_item_id,
+            price,
+            condition_description,
+            observed_at,
+            first_seen_at,
+            last_seen_at
+        ) VALUES {placeholders}
+        ON DUPLICATE KEY UPDATE
+            observed_at = IF(
+                price <=> VALUES(price) AND condition_description <=> VALUES(condition_description),
+                observed_at,
+                VALUES(observed_at)
+            ),
+            price = VALUES(price),
+            condition_description = VALUES(condition_description),
+            last_seen_at = VALUES(last_seen_at)
+    """
+
+
+def write_listing_rows_delta(
+    conn,
+    table_name: str,
+    rows: List[Tuple],
+    query_name: str,
+    state_table: Optional[str] = None,
+    mode: Optional[str] = None,
+    batch_size: Optional[int] = None
+) -> Tuple[int, int, int]:
+    """
+    Change-only variant of write_listing_rows. Returns (written, failed, unchanged).
+
+    Rows whose (api_query_id, ebay_item_id) has the same price and condition
+    as the last stored observation are not inserted again; instead the state
+    table and the existing ebay_listings row get the new last_seen_at.
+    """
+    state_table = state_table or STATE_TABLE
+    if not state_table.replace('_', '').isalnum():
+        raise ValueError("Invalid state table name configuration")
+    batch_size = batch_size or BATCH_SIZE
+
+    by_query: "OrderedDict[str, List[Tuple]]" = OrderedDict()
+    for row in rows:
+        by_query.setdefault(row[_COL["api_query_id"]], []).append(row)
+
+    written = 0
+    failed = 0
+    unchanged = 0
+
+    for api_query_id, query_rows in by_query.items():
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                f"SELECT ebay_item_id, price, condition_description FROM {state_table} WHERE api_query_id = %s",
+                (api_query_id,)
+            )
+            known = {item_id: (Decimal(price), cond) for item_id, price, cond in cursor.fetchall()}
+        finally:
+            cursor.close()
+
+        changed_rows = []
+        for row in query_rows:
+            prev = known.get(row[_COL["ebay_item_id"]])
+            current = (_money(row[_COL["price"]]), row[_COL["condition_description"]])
+            if prev != current:
+                changed_rows.append(row)
+        unchanged += len(query_rows) - len(changed_rows)
+
+        failed_ids: set = set()
+        if changed_rows:
+            query_written, query_failed = write_listing_rows(
+                conn, table_name, changed_rows, query_name,
+                mode=mode, batch_size=batch_size, failed_ids=failed_ids
+            )
+            written += query_written
+            failed += query_failed
+
+        # Rows that failed to insert keep their old state so the next run retries them
+        state_rows = [r for r in query_rows if r[_COL["ebay_item_id"]] not in failed_ids]
+        seen_at = query_rows[0][_COL["last_seen_at"]]
+
+        cursor = conn.cursor()
+        try:
+            full_sql = _state_upsert_sql(state_table, batch_size)
+            for start in range(0, len(state_rows), batch_size):
+                batch = state_rows[start:start + batch_size]
+                sql = full_sql if len(batch) == batch_size else _state_upsert_sql(state_table, len(batch))
+                params = []
+                for r in batch:
+                    params.extend((
+                        api_query_id,
+                        r[_COL["ebay_item_id"]],
+                        r[_COL["price"]],
+                        r[_COL["condition_description"]],
+                        r[_COL["fetched_at"]],
+                        r[_COL["fetched_at"]],
+                        r[_COL["last_seen_at"]],
+                    ))
+                cursor.execute(sql, params)
+
+            # Carry last_seen_at onto the ebay_listings row that holds each
+            # unchanged listing's current observation (found via uq_one_observation)
+            cursor.execute(
+                f"""
+                UPDATE {table_name} e
+                JOIN {state_table} s
+                  ON e.api_query_id = s.api_query_id
+                 AND e.fetched_at = s.observed_at
+                 AND e.ebay_item_id = s.ebay_item_id
+                SET e.last_seen_at = s.last_seen_at
+                WHERE s.api_query_id = %s
+                  AND s.last_seen_at = %s
+                  AND e.last_seen_at < s.last_seen_at
+                """,
+                (api_query_id, seen_at)
+            )
+            conn.commit()
+        except mysql.connector.Error:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    return written, failed, unchanged
+
+
+def refresh_query_benchmarks(
+    conn,
+    table_name: str,
+    api_query_ids: Sequence[str],
+    benchmark_table: Optional[str] = None,
+    window_days: Optional[int] = None,
+    trim_pct: Optional[float] = None
+) -> int:
+    """
+    Recompute and upsert the benchmark of each api_query_id. Returns the number
+    of benchmarks written.
+
+    Same computation /deals used to run per request: rows with last_seen_at in
+    the window, those whose PERCENT_RANK() by price is not above trim_pct
+    dropped, then the AVG of the middle one or two prices. Queries with no
+    rows left get a NULL median so stale values don't linger.
+    """
+    benchmark_table = benchmark_table or BENCHMARK_TABLE
+    if not benchmark_table.replace('_', '').isalnum():
+        raise ValueError("Invalid benchmark table name configuration")
+    window_days = int(window_days or BENCHMARK_WINDOW_DAYS)
+    trim_pct = float(BENCHMARK_TRIM_PCT if trim_pct is None else trim_pct)
+
+    ids = list(dict.fromkeys(api_query_ids))
+    if not ids:
+        return 0
+    placeholders = ", ".join(["%s"] * len(ids))
+
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            f"""
+            WITH windowed AS (
+              SELECT
+                api_query_id,
+                price,
+                PERCENT_RANK() OVER (PARTITION BY api_query_id ORDER BY price) AS price_percentile
+              FROM {table_name}
+              WHERE last_seen_at >= DATE_SUB(NOW(), INTERVAL {window_days} DAY)
+                AND api_query_id IN ({placeholders})
+            ),
+            samples AS (
+              SELECT api_query_id, COUNT(*) AS sample_count
+              FROM windowed
+              GROUP BY api_query_id
+            ),
+            medians AS (
+              SELECT api_query_id, AVG(price) AS trimmed_median
+              FROM (
+                SELECT
+                  api_query_id,
+                  price,
+                  ROW_NUMBER() OVER (PARTITION BY api_query_id ORDER BY price) AS row_num,
+                  COUNT(*) OVER (PARTITION BY api_query_id) AS total_count
+                FROM windowed
+                WHERE price_percentile > {trim_pct / 100}
+              ) ranked
+              WHERE row_num IN (FLOOR((total_count + 1) / 2), CEIL((total_count + 1) / 2))
+              GROUP BY api_query_id
+            )
+            SELECT s.api_query_id, m.trimmed_median, s.sample_count
+            FROM samples s
+            LEFT JOIN medians m ON m.api_query_id = s.api_query_id
+            """,
+            ids
+        )
+        computed = {api_query_id: (median, count) for api_query_id, median, count in cursor.fetchall()}
+
+        params = []
+        for api_query_id in ids:
+            median, count = computed.get(api_query_id, (None, 0))
+            params.append((api_query_id, median, count, trim_pct, window_days))
+        cursor.executemany(
+            f"""
+            INSERT INTO {benchmark_table} (
+                api_query_id,
+                trimmed_median,
+                sample_count,
+                trim_pct,
+                window_days,
+                computed_at
+            ) VALUES (%s, %s, %s, %s, %s, UTC_TIMESTAMP())
+            ON DUPLICATE KEY UPDATE
+                trimmed_median = VALUES(trimmed_median),
+                sample_count = VALUES(sample_count),
+                trim_pct = VALUES(trim_pct),
+                window_days = VALUES(window_days),
+                computed_at = VALUES(computed_at)
+            """,
+            params
+        )
+        conn.commit()
+    except mysql.connector.Error:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    return len(ids)
+
+
+def refresh_benchmarks_for_ids(
+    db_config: Dict[str, Any],
+    table_name: str,
+    api_query_ids: Sequence[str]
+) -> None:
+    """
+    refresh_query_benchmarks on a pooled connection, logged as
+    BENCHMARK_REFRESH. A database error is logged, not raised: the listings
+    are already stored and /deals falls back to computing the benchmark.
+    """
+    operation_start = time.perf_counter()
+    conn = None
+    try:
+        conn = get_pool(db_config).get_connection()
+        refreshed = refresh_query_benchmarks(conn, table_name, api_query_ids)
+        logger.info(
+            "BENCHMARK_REFRESH | queries=%d | duration_ms=%.2f | status=SUCCESS",
+            refreshed, (time.perf_counter() - operation_start) * 1000
+        )
+    except mysql.connector.Error as e:
+        logger.error(
+            "BENCHMARK_REFRESH | queries=%d | duration_ms=%.2f | status=FAILED | error=%s",
+            len(api_query_ids), (time.perf_counter() - operation_start) * 1000, str(e)
+        )
+    finally:
+        if conn:
+            conn.close()
+
+
+def bump_run_version(path: Optional[str] = None) -> Optional[str]:
+    """
+    Write a new version token to the run-version marker and return it, or
+    None when the marker is disabled or can't be written. The file is
+    replaced atomically so readers never see a partial token.
+    """
+    path = RUN_VERSION_FILE if path is None else path
+    if not path:
+        return None
+
+    version = f"{int(time.time())}-{uuid.uuid4().hex[:12]}"
+    try:
+        fd, tmp_path = tempfile.mkstemp(prefix=".run_version.", dir=os.path.dirname(os.path.abspath(path)))
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(version + "\n")
+            os.replace(tmp_path, path)
+        except OSError:
+            os.unlink(tmp_path)
+            raise
+    except OSError as e:
+        logger.warning("RUN_VERSION | file=%s | status=FAILED | error=%s", path, str(e))
+        return None
+
+    logger.info("RUN_VERSION | file=%s | version=%s | status=SUCCESS", path, version)
+    return version
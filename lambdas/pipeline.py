@@ -0,0 +1,202 @@
+"""
+Small threaded stage pipeline joined by bounded queues.
+
+Each stage runs `fn(item)` on its own worker threads and forwards every
+value `fn` yields to the next stage's queue. Queues are bounded, so a slow
+stage blocks the stages feeding it (backpressure) instead of letting work
+pile up in memory. Per-stage counters record how long workers spent busy,
+starved (waiting on an empty inbound queue) and blocked (waiting on a full
+outbound queue), plus the depth of each inbound queue sampled on every put.
+
+Items that belong together (e.g. the pages of one product) keep their order
+through a stage only if that stage has a single worker.
+"""
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+_DONE = object()
+
+
+class MeteredQueue:
+    """queue.Queue wrapper that records put-blocking time and depth samples."""
+
+    def __init__(self, maxsize: int):
+        self._q: "queue.Queue[Any]" = queue.Queue(maxsize=maxsize)
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self.puts = 0
+        self.depth_total = 0
+        self.max_depth = 0
+
+    def put(self, item: Any) -> float:
+        """Put `item`, returning the seconds spent blocked on a full queue."""
+        start = time.perf_counter()
+        self._q.put(item)
+        waited = time.perf_counter() - start
+        depth = self._q.qsize()
+        with self._lock:
+            self.puts += 1
+            self.depth_total += depth
+            if depth > self.max_depth:
+                self.max_depth = depth
+        return waited
+
+    def get(self) -> Any:
+        return self._q.get()
+
+    def avg_depth(self) -> float:
+        with self._lock:
+            return self.depth_total / self.puts if self.puts else 0.0
+
+
+class Stage:
+    def __init__(self, name: str, fn: Callable[[Any], Optional[Iterable[Any]]], workers: int, queue_size: int):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.inbound = MeteredQueue(queue_size)
+        self._lock = threading.Lock()
+        self._live_workers = self.workers
+        self.items_in = 0
+        self.items_out = 0
+        self.busy_s = 0.0
+        self.starved_s = 0.0
+        self.blocked_s = 0.0
+
+    def add(self, **deltas: float) -> None:
+        with self._lock:
+            for key, val in deltas.items():
+                setattr(self, key, getattr(self, key) + val)
+
+    def worker_exited(self) -> bool:
+        """Mark one worker finished; True for the last one out."""
+        with self._lock:
+            self._live_workers -= 1
+            return self._live_workers == 0
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "stage": self.name,
+            "workers": self.workers,
+            "items_in": self.items_in,
+            "items_out": self.items_out,
+            "busy_sec": round(self.busy_s, 3),
+            "starved_sec": round(self.starved_s, 3),
+            "blocked_sec": round(self.blocked_s, 3),
+            "queue_capacity": self.inbound.maxsize,
+            "queue_max_depth": self.inbound.max_depth,
+            "queue_avg_depth": round(self.inbound.avg_depth(), 2),
+        }
+
+
+class Pipeline:
+    """
+    Linear pipeline: source -> stage 1 -> ... -> stage N -> caller.
+
+    run() is a generator yielding whatever the last stage emits. If any stage
+    raises, the remaining items are drained without processing and the first
+    exception is re-raised from run() once every thread has stopped.
+    """
+
+    def __init__(self, queue_size: int = 8):
+        self.queue_size = max(1, queue_size)
+        self.stages: List[Stage] = []
+        self._error: Optional[BaseException] = None
+        self._failed = threading.Event()
+
+    def add_stage(self, name: str, fn: Callable[[Any], Optional[Iterable[Any]]], workers: int = 1) -> "Pipeline":
+        self.stages.append(Stage(name, fn, workers, self.queue_size))
+        return self
+
+    def _fail(self, exc: BaseException) -> None:
+        if not self._failed.is_set():
+            self._error = exc
+            self._failed.set()
+
+    def _feed(self, source: Iterable[Any]) -> None:
+        first = self.stages[0]
+        try:
+            for item in source:
+                if self._failed.is_set():
+                    break
+                first.inbound.put(item)
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            for _ in range(first.workers):
+                first.inbound.put(_DONE)
+
+    def _work(self, index: int, sink: MeteredQueue) -> None:
+        stage = self.stages[index]
+        is_last = index == len(self.stages) - 1
+        downstream = sink if is_last else self.stages[index + 1].inbound
+        downstream_workers = 1 if is_last else self.stages[index + 1].workers
+
+        while True:
+            start = time.perf_counter()
+            item = stage.inbound.get()
+            stage.add(starved_s=time.perf_counter() - start)
+            if item is _DONE:
+                break
+            if self._failed.is_set():
+                continue
+
+            stage.add(items_in=1)
+            busy_start = time.perf_counter()
+            blocked = 0.0
+            emitted = 0
+            try:
+                for out in stage.fn(item) or ():
+                    blocked += downstream.put(out)
+                    emitted += 1
+            except BaseException as e:
+                self._fail(e)
+            busy = time.perf_counter() - busy_start - blocked
+            stage.add(busy_s=busy, blocked_s=blocked, items_out=emitted)
+
+        if stage.worker_exited():
+            for _ in range(downstream_workers):
+                downstream.put(_DONE)
+
+    def run(self, source: Iterable[Any]) -> Iterator[Any]:
+        if not self.stages:
+            raise ValueError("Pipeline has no stages")
+
+        sink = MeteredQueue(self.queue_size)
+        threads = [threading.Thread(target=self._feed, args=(source,), name="pipeline-source", daemon=True)]
+        for index, stage in enumerate(self.stages):
+            for n in range(stage.workers):
+                threads.append(threading.Thread(
+                    target=self._work,
+                    args=(index, sink),
+                    name=f"pipeline-{stage.name}-{n}",
+                    daemon=True
+                ))
+        for t in threads:
+            t.start()
+
+        finished = False
+        try:
+            while True:
+                item = sink.get()
+                if item is _DONE:
+                    finished = True
+                    break
+                if not self._failed.is_set():
+                    yield item
+        finally:
+            if not finished:
+                # Caller stopped iterating early; let the workers drain and exit
+                self._fail(GeneratorExit())
+                while sink.get() is not _DONE:
+                    pass
+            for t in threads:
+                t.join()
+
+        if self._error is not None and not isinstance(self._error, GeneratorExit):
+            raise self._error
+
+    def metrics(self) -> List[Dict[str, Any]]:
+        return [stage.metrics() for stage in self.stages]
@@ -0,0 +1,195 @@
+"""
+Local append-only spool between ingestion and MySQL.
+
+Ingestion appends each product's normalized ebay_listings rows as one JSON
+line to the open segment (`seg-<ts>-<pid>-<n>.jsonl.open`). Segments are sealed
+(fsynced and renamed to `.jsonl`) once they reach SPOOL_SEGMENT_BYTES or
+when the run ends, and spool_loader.py drains sealed segments into MySQL.
+Writes are fsynced every SPOOL_FSYNC_EVERY records rather than per record.
+
+A crash can leave an `.open` segment with a torn last line; the next Spool
+over the same directory seals it (unless the process that owns it is still
+alive), and readers skip the incomplete line. Lines the loader cannot
+decode are set aside in `<segment>.bad` (see spool_loader.py).
+"""
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_MAX_BYTES = max(1, int(os.environ.get("SPOOL_SEGMENT_BYTES", 16 * 1024 * 1024)))
+FSYNC_EVERY = max(1, int(os.environ.get("SPOOL_FSYNC_EVERY", 16)))
+
+OPEN_SUFFIX = ".jsonl.open"
+SEALED_SUFFIX = ".jsonl"
+BAD_SUFFIX = ".bad"
+RECORD_VERSION = 1
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _segment_pid(path: Path) -> Optional[int]:
+    # seg-<time_ns>-<pid>-<seq>.jsonl.open
+    parts = path.name.split("-")
+    try:
+        return int(parts[2])
+    except (IndexError, ValueError):
+        return None
+
+
+def _fsync_dir(directory: Path) -> None:
+    fd = os.open(str(directory), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class Spool:
+    def __init__(
+        self,
+        directory: str,
+        segment_max_bytes: int = SEGMENT_MAX_BYTES,
+        fsync_every: int = FSYNC_EVERY
+    ):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.segment_max_bytes = segment_max_bytes
+        self.fsync_every = max(1, fsync_every)
+
+        self._lock = threading.Lock()
+        self._file = None
+        self._path: Optional[Path] = None
+        self._size = 0
+        self._unsynced = 0
+        self._seq = 0
+
+        self._recover()
+
+    def _recover(self) -> None:
+        for path in sorted(self.directory.glob("*" + OPEN_SUFFIX)):
+            pid = _segment_pid(path)
+            if pid is not None and pid != os.getpid() and _pid_alive(pid):
+                # Still being written by another ingestion process
+                continue
+            sealed = path.with_name(path.name[: -len(OPEN_SUFFIX)] + SEALED_SUFFIX)
+            os.replace(path, sealed)
+            logger.warning("SPOOL_RECOVER | segment=%s | status=SEALED", sealed.name)
+
+    def _open_segment(self) -> None:
+        self._seq += 1
+        name = f"seg-{time.time_ns()}-{os.getpid()}-{self._seq:04d}{OPEN_SUFFIX}"
+        self._path = self.directory / name
+        self._file = open(self._path, "ab")
+        self._size = 0
+        self._unsynced = 0
+
+    def _seal_locked(self) -> Optional[Path]:
+        if self._file is None:
+            return None
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+
+        sealed = self._path.with_name(self._path.name[: -len(OPEN_SUFFIX)] + SEALED_SUFFIX)
+        os.replace(self._path, sealed)
+        _fsync_dir(self.directory)
+
+        self._file = None
+        self._path = None
+        return sealed
+
+    def append(self, record: Dict[str, Any]) -> str:
+        """Append one record; returns the name of the segment it went to."""
+        line = (json.dumps(record, separators=(",", ":"), default=str) + "\n").encode("utf-8")
+        with self._lock:
+            if self._file is None:
+                self._open_segment()
+            self._file.write(line)
+            self._size += len(line)
+            self._unsynced += 1
+            segment = self._path.name
+
+            if self._unsynced >= self.fsync_every:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._unsynced = 0
+            if self._size >= self.segment_max_bytes:
+                self._seal_locked()
+        return segment
+
+    def seal(self) -> Optional[Path]:
+        """Close the open segment (if any) and make it visible to the loader."""
+        with self._lock:
+            return self._seal_locked()
+
+
+def listing_record(
+    columns: List[str],
+    rows: List[tuple],
+    query_name: str,
+    api_query_id: str
+) -> Dict[str, Any]:
+    return {
+        "v": RECORD_VERSION,
+        "query_name": query_name,
+        "api_query_id": api_query_id,
+        "columns": list(columns),
+        "rows": [list(r) for r in rows],
+    }
+
+
+def sealed_segments(directory: str) -> List[Path]:
+    path = Path(directory)
+    if not path.is_dir():
+        return []
+    return sorted(path.glob("*" + SEALED_SUFFIX))
+
+
+def read_segment_lines(path: Path) -> Iterator[Tuple[int, bytes]]:
+    """Yield (line number, raw line) of a sealed segment, skipping a torn final line."""
+    with open(path, "rb") as f:
+        for lineno, raw in enumerate(f, start=1):
+            if not raw.endswith(b"\n"):
+                logger.warning("SPOOL_READ | segment=%s | line=%d | status=TRUNCATED", path.name, lineno)
+                return
+            yield lineno, raw
+
+
+def read_segment(path: Path) -> Iterator[Dict[str, Any]]:
+    """Yield the records in a sealed segment, skipping a torn final line."""
+    for _, raw in read_segment_lines(path):
+        yield json.loads(raw)
+
+
+def quarantine_path(path: Path) -> Path:
+    """Where the undecodable lines of segment `path` are kept"""
+    return path.with_name(path.name + BAD_SUFFIX)
+
+
+_spools: Dict[str, Spool] = {}
+_spools_lock = threading.Lock()
+
+
+def get_spool(directory: str) -> Spool:
+    """Process-wide Spool for `directory`."""
+    key = str(Path(directory).resolve())
+    with _spools_lock:
+        spool = _spools.get(key)
+        if spool is None:
+            spool = Spool(key)
+            _spools[key] = spool
+        return spool
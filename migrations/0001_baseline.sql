@@ -0,0 +1,81 @@
+-- Baseline: the schema as it stood before versioned migrations.
+--
+-- ebay_listings is created as the original mysql_commands.txt defined it,
+-- then given the last_seen_at column that DB_INGEST_MODE=delta added, only
+-- where it is missing: added NULL, backfilled from fetched_at (what full-mode
+-- ingestion writes), then made NOT NULL. The other tables are IF NOT EXISTS.
+-- So this applies to an empty database, to one created from the original
+-- mysql_commands.txt, and to one created from (or manually upgraded to) the
+-- later version with last_seen_at.
+
+CREATE TABLE IF NOT EXISTS ebay_listings (
+  id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
+
+  marketplace_id VARCHAR(16) NOT NULL,
+  query_name VARCHAR(64) NOT NULL,
+  api_query_text VARCHAR(255) NOT NULL,
+  api_query_id CHAR(64) NOT NULL,
+
+  fetched_at DATETIME NOT NULL,
+
+  ebay_item_id VARCHAR(64) NOT NULL,
+  title VARCHAR(512) NOT NULL,
+  condition_category VARCHAR(64) NOT NULL,
+  condition_description VARCHAR(255) NULL,
+  listing_url VARCHAR(2048) NOT NULL,
+
+  price DECIMAL(10,2) NOT NULL,
+  currency CHAR(3) NOT NULL DEFAULT 'USD',
+
+  PRIMARY KEY (id),
+
+  UNIQUE KEY uq_one_observation (api_query_id, fetched_at, ebay_item_id)
+) ENGINE=InnoDB;
+
+DROP PROCEDURE IF EXISTS baseline_add_last_seen_at;
+
+DELIMITER $$
+CREATE PROCEDURE baseline_add_last_seen_at()
+BEGIN
+  IF NOT EXISTS (
+    SELECT 1 FROM information_schema.COLUMNS
+    WHERE TABLE_SCHEMA = DATABASE()
+      AND TABLE_NAME = 'ebay_listings'
+      AND COLUMN_NAME = 'last_seen_at'
+  ) THEN
+    ALTER TABLE ebay_listings ADD COLUMN last_seen_at DATETIME NULL AFTER fetched_at;
+    UPDATE ebay_listings SET last_seen_at = fetched_at;
+    ALTER TABLE ebay_listings MODIFY last_seen_at DATETIME NOT NULL;
+  END IF;
+END$$
+DELIMITER ;
+
+CALL baseline_add_last_seen_at();
+
+DROP PROCEDURE baseline_add_last_seen_at;
+
+CREATE TABLE IF NOT EXISTS ebay_listing_state (
+  api_query_id CHAR(64) NOT NULL,
+  ebay_item_id VARCHAR(64) NOT NULL,
+
+  price DECIMAL(10,2) NOT NULL,
+  condition_description VARCHAR(255) NULL,
+
+  observed_at DATETIME NOT NULL,
+  first_seen_at DATETIME NOT NULL,
+  last_seen_at DATETIME NOT NULL,
+
+  PRIMARY KEY (api_query_id, ebay_item_id)
+) ENGINE=InnoDB;
+
+CREATE TABLE IF NOT EXISTS query_benchmarks (
+  api_query_id CHAR(64) NOT NULL,
+
+  trimmed_median DECIMAL(14,6) NULL,
+  sample_count INT UNSIGNED NOT NULL,
+  trim_pct DECIMAL(5,2) NOT NULL,
+  window_days INT UNSIGNED NOT NULL,
+  computed_at DATETIME NOT NULL,
+
+  PRIMARY KEY (api_query_id)
+) ENGINE=InnoDB;
@@ -0,0 +1,22 @@
+-- Access paths of the benchmark and deals queries.
+--
+-- idx_query_window covers the benchmark window scans: the per-query
+-- trimmed median and refresh_query_benchmarks' batch (api_query_id = ? or
+-- IN (...), last_seen_at >= ?, reading only api_query_id and price) are
+-- answered from the index without touching the clustered index.
+--
+-- It does not cover /deals. That query also reads listing_key, title,
+-- listing_url, condition_description and the other listing columns, so
+-- every row left after the index is still fetched from the clustered
+-- index. Price comes after the last_seen_at range, so the deal price band
+-- is checked in the index (index condition pushdown) rather than used to
+-- narrow the range; what the index saves /deals is the lookup of window
+-- rows outside the band. The dedup window and page order are still sorted.
+-- Covering /deals would mean indexing the 2048-character listing_url.
+--
+-- idx_last_seen serves window_engine.py's incremental poll and the
+-- partition rotation's "anything still live?" probe.
+
+ALTER TABLE ebay_listings
+  ADD INDEX idx_query_window (api_query_id, last_seen_at, price),
+  ADD INDEX idx_last_seen (last_seen_at);
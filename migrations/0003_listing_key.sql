@@ -0,0 +1,9 @@
+-- Fixed-width hash of listing_url, used instead of the 2048-char URL as the
+-- /deals dedup key (ROW_NUMBER() OVER (PARTITION BY listing_key ...)).
+-- Stored so the hash is computed once at insert; INVISIBLE so SELECT * and
+-- the ingestion INSERTs are unaffected (MySQL 8.0.23+).
+
+ALTER TABLE ebay_listings
+  ADD COLUMN listing_key BINARY(32)
+    AS (UNHEX(SHA2(listing_url, 256))) STORED INVISIBLE
+    AFTER listing_url;
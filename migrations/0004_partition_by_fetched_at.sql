@@ -0,0 +1,114 @@
+-- Range-partition ebay_listings by day of fetched_at, with rotation.
+--
+-- Every unique key of a partitioned table must contain the partitioning
+-- column, so the primary key becomes (id, fetched_at); uq_one_observation
+-- already contains it. This rebuilds the table once.
+--
+-- Partitions are named p<YYYYMMDD> and hold that day's observations; pmax
+-- catches anything beyond the last one (the first partition the migration
+-- creates also holds all earlier history). rotate_ebay_listings_partitions()
+-- adds partitions days_ahead into the future and drops those whose rows were
+-- all fetched before the retention cutoff. In DB_INGEST_MODE=delta an
+-- unchanged listing keeps its original row and only moves last_seen_at, so a
+-- partition that still holds a row seen after the cutoff is kept and only
+-- its expired rows are deleted. ebay_listing_state rows not seen since the
+-- cutoff are deleted too, so a listing that comes back is stored afresh.
+--
+-- The retention (90 days) must stay above BENCHMARK_WINDOW_DAYS. The daily
+-- event needs event_scheduler=ON; otherwise call the procedure from cron.
+
+ALTER TABLE ebay_listings
+  DROP PRIMARY KEY,
+  ADD PRIMARY KEY (id, fetched_at)
+  PARTITION BY RANGE (TO_DAYS(fetched_at)) (
+    PARTITION pmax VALUES LESS THAN MAXVALUE
+  );
+
+DROP PROCEDURE IF EXISTS rotate_ebay_listings_partitions;
+
+DELIMITER $$
+CREATE PROCEDURE rotate_ebay_listings_partitions(IN retention_days INT, IN days_ahead INT)
+BEGIN
+  DECLARE cutoff DATE DEFAULT DATE_SUB(CURRENT_DATE, INTERVAL retention_days DAY);
+  DECLARE day_start DATE DEFAULT CURRENT_DATE;
+  DECLARE max_bound BIGINT DEFAULT 0;
+  DECLARE part_name VARCHAR(64);
+  DECLARE part_bound BIGINT DEFAULT 0;
+  DECLARE CONTINUE HANDLER FOR NOT FOUND SET part_name = NULL;
+
+  -- Future partitions, split off pmax one day at a time
+  SELECT COALESCE(MAX(CAST(PARTITION_DESCRIPTION AS SIGNED)), 0) INTO max_bound
+  FROM information_schema.PARTITIONS
+  WHERE TABLE_SCHEMA = DATABASE()
+    AND TABLE_NAME = 'ebay_listings'
+    AND PARTITION_NAME <> 'pmax';
+
+  WHILE day_start <= DATE_ADD(CURRENT_DATE, INTERVAL days_ahead DAY) DO
+    IF TO_DAYS(DATE_ADD(day_start, INTERVAL 1 DAY)) > max_bound THEN
+      SET @rotate_sql = CONCAT(
+        'ALTER TABLE ebay_listings REORGANIZE PARTITION pmax INTO (',
+        'PARTITION p', DATE_FORMAT(day_start, '%Y%m%d'),
+        ' VALUES LESS THAN (', TO_DAYS(DATE_ADD(day_start, INTERVAL 1 DAY)), '), ',
+        'PARTITION pmax VALUES LESS THAN MAXVALUE)'
+      );
+      PREPARE stmt FROM @rotate_sql;
+      EXECUTE stmt;
+      DEALLOCATE PREPARE stmt;
+    END IF;
+    SET day_start = DATE_ADD(day_start, INTERVAL 1 DAY);
+  END WHILE;
+
+  -- Expired partitions, oldest first
+  SET @rotate_cutoff = cutoff;
+  drop_loop: LOOP
+    SET part_name = NULL;
+    SELECT PARTITION_NAME, CAST(PARTITION_DESCRIPTION AS SIGNED)
+      INTO part_name, part_bound
+    FROM information_schema.PARTITIONS
+    WHERE TABLE_SCHEMA = DATABASE()
+      AND TABLE_NAME = 'ebay_listings'
+      AND PARTITION_NAME <> 'pmax'
+      AND CAST(PARTITION_DESCRIPTION AS SIGNED) > part_bound
+      AND CAST(PARTITION_DESCRIPTION AS SIGNED) <= TO_DAYS(cutoff)
+    ORDER BY CAST(PARTITION_DESCRIPTION AS SIGNED)
+    LIMIT 1;
+
+    IF part_name IS NULL THEN
+      LEAVE drop_loop;
+    END IF;
+
+    SET @rotate_sql = CONCAT(
+      'SELECT COUNT(*) INTO @rotate_live FROM (SELECT 1 FROM ebay_listings PARTITION (',
+      part_name, ') WHERE last_seen_at >= ? LIMIT 1) live'
+    );
+    PREPARE stmt FROM @rotate_sql;
+    EXECUTE stmt USING @rotate_cutoff;
+    DEALLOCATE PREPARE stmt;
+
+    IF @rotate_live = 0 THEN
+      SET @rotate_sql = CONCAT('ALTER TABLE ebay_listings DROP PARTITION ', part_name);
+      PREPARE stmt FROM @rotate_sql;
+      EXECUTE stmt;
+    ELSE
+      SET @rotate_sql = CONCAT(
+        'DELETE FROM ebay_listings PARTITION (', part_name, ') WHERE last_seen_at < ?'
+      );
+      PREPARE stmt FROM @rotate_sql;
+      EXECUTE stmt USING @rotate_cutoff;
+    END IF;
+    DEALLOCATE PREPARE stmt;
+  END LOOP;
+
+  DELETE FROM ebay_listing_state WHERE last_seen_at < cutoff;
+END$$
+DELIMITER ;
+
+DROP EVENT IF EXISTS ev_rotate_ebay_listings;
+
+CREATE EVENT ev_rotate_ebay_listings
+  ON SCHEDULE EVERY 1 DAY
+  STARTS (CURRENT_DATE + INTERVAL 1 DAY + INTERVAL 30 MINUTE)
+  DO CALL rotate_ebay_listings_partitions(90, 7);
+
+-- Create today's and the next week's partitions now
+CALL rotate_ebay_listings_partitions(90, 7);
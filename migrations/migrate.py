@@ -0,0 +1,179 @@
+"""
+Apply the versioned SQL migrations in this directory.
+
+Files are named NNNN_description.sql and applied in version order; applied
+versions are recorded in schema_migrations together with a checksum of the
+file, and a file that changed after it was applied is reported instead of
+being re-run. Files may use mysql client DELIMITER lines for procedure
+bodies, so they also work with `mysql < file`.
+
+MySQL commits DDL implicitly, so a migration that fails halfway is not
+rolled back: fix the cause, undo the partial change if needed, and re-run.
+
+    python migrations/migrate.py             # apply everything pending
+    python migrations/migrate.py --status    # list applied / pending versions
+    python migrations/migrate.py --to 2      # apply up to version 0002
+    python migrations/migrate.py --dry-run   # print the statements only
+"""
+import argparse
+import hashlib
+import os
+import re
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import mysql.connector
+from dotenv import load_dotenv
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent
+MIGRATION_FILE = re.compile(r"^(\d{4})_([a-z0-9_]+)\.sql$")
+
+load_dotenv(MIGRATIONS_DIR.parent / ".env")
+
+
+def discover(directory: Path = MIGRATIONS_DIR) -> List[Tuple[int, str, Path]]:
+    found = []
+    for path in sorted(directory.glob("*.sql")):
+        match = MIGRATION_FILE.match(path.name)
+        if match:
+            found.append((int(match.group(1)), match.group(2), path))
+    versions = [v for v, _, _ in found]
+    if len(versions) != len(set(versions)):
+        raise ValueError("Duplicate migration version in " + str(directory))
+    return found
+
+
+def split_statements(sql: str) -> List[str]:
+    """Split a migration into statements, honouring DELIMITER lines."""
+    statements = []
+    delimiter = ";"
+    buffer: List[str] = []
+    for line in sql.splitlines():
+        stripped = line.strip()
+        if stripped.upper().startswith("DELIMITER "):
+            delimiter = stripped.split(None, 1)[1]
+            continue
+        if not buffer and (not stripped or stripped.startswith("--")):
+            continue
+        buffer.append(line)
+        if stripped.endswith(delimiter):
+            text = "\n".join(buffer).rstrip()
+            statements.append(text[: -len(delimiter)].rstrip())
+            buffer = []
+    if "".join(buffer).strip():
+        statements.append("\n".join(buffer).strip())
+    return statements
+
+
+def checksum(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def ensure_history_table(cursor) -> None:
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+          version INT UNSIGNED NOT NULL,
+          name VARCHAR(128) NOT NULL,
+          checksum CHAR(64) NOT NULL,
+          applied_at DATETIME NOT NULL,
+          PRIMARY KEY (version)
+        ) ENGINE=InnoDB
+        """
+    )
+
+
+def applied_versions(cursor) -> Dict[int, str]:
+    cursor.execute("SELECT version, checksum FROM schema_migrations")
+    return {version: digest for version, digest in cursor.fetchall()}
+
+
+def run_statement(cursor, statement: str) -> None:
+    cursor.execute(statement)
+    # Drain any result set so the connection is ready for the next statement
+    if cursor.with_rows:
+        cursor.fetchall()
+
+
+def migrate(conn, target: Optional[int] = None, dry_run: bool = False) -> int:
+    """Apply pending migrations up to `target`; returns how many were applied."""
+    cursor = conn.cursor(buffered=True)
+    try:
+        ensure_history_table(cursor)
+        applied = applied_versions(cursor)
+
+        count = 0
+        for version, name, path in discover():
+            if target is not None and version > target:
+                break
+            digest = checksum(path)
+            if version in applied:
+                if applied[version] != digest:
+                    print(f"WARNING {version:04d}_{name}: file changed after it was applied")
+                continue
+
+            statements = split_statements(path.read_text(encoding="utf-8"))
+            print(f"{'would apply' if dry_run else 'applying'} {version:04d}_{name} ({len(statements)} statements)")
+            if dry_run:
+                for statement in statements:
+                    print(statement + ";\n")
+                continue
+
+            for statement in statements:
+                run_statement(cursor, statement)
+            cursor.execute(
+                "INSERT INTO schema_migrations (version, name, checksum, applied_at) VALUES (%s, %s, %s, UTC_TIMESTAMP())",
+                (version, name, digest)
+            )
+            conn.commit()
+            count += 1
+        return count
+    finally:
+        cursor.close()
+
+
+def status(conn) -> None:
+    cursor = conn.cursor(buffered=True)
+    try:
+        ensure_history_table(cursor)
+        applied = applied_versions(cursor)
+    finally:
+        cursor.close()
+    for version, name, path in discover():
+        state = "pending"
+        if version in applied:
+            state = "applied" if applied[version] == checksum(path) else "applied (file changed)"
+        print(f"{version:04d}_{name:<40} {state}")
+
+
+def db_config_from_env() -> Dict[str, object]:
+    return {
+        "host": os.environ.get("MYSQL_HOST", "localhost"),
+        "port": int(os.environ.get("MYSQL_PORT", 3306)),
+        "user": os.environ.get("MYSQL_USER", "root"),
+        "password": os.environ.get("MYSQL_PASSWORD", ""),
+        "database": os.environ.get("MYSQL_DATABASE", ""),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply versioned schema migrations")
+    parser.add_argument("--to", type=int, help="highest version to apply")
+    parser.add_argument("--status", action="store_true", help="list migrations and exit")
+    parser.add_argument("--dry-run", action="store_true", help="print pending statements without running them")
+    args = parser.parse_args()
+
+    conn = mysql.connector.connect(**db_config_from_env())
+    try:
+        if args.status:
+            status(conn)
+        else:
+            applied_count = migrate(conn, target=args.to, dry_run=args.dry_run)
+            if not args.dry_run:
+                print(f"{applied_count} migration(s) applied")
+    except mysql.connector.Error as e:
+        print(f"Migration failed: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        conn.close()
@@ -0,0 +1,289 @@
+"""
+Throughput of the Flask app (products.py) vs. the ASGI app (products_async.py).
+
+Each simulated visitor loads the page the way the frontend does: GET
+/products, then fetchDealsForProducts over every product, either through
+/deals/batch in chunks of --batch-size (--mode batch) or as one POST /deals
+per product, --concurrency at a time (--mode single, the fallback path and
+the browser's per-host connection limit). --clients visitors run back to
+back for --duration seconds against each app in turn.
+
+By default both apps are started here against the MySQL database from the
+root .env: Flask's threaded server and uvicorn with --asgi-workers workers.
+They run with DEALS_CACHE_SIZE=0 so every request reaches MySQL (pass
+--cache to keep the response cache on). To measure servers started some
+other way, pass --flask-url / --asgi-url instead.
+
+    python benchmarks/bench_serving.py [--clients 32] [--duration 30] [--mode single]
+"""
+import argparse
+import gzip
+import http.client
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+API_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+START_TIMEOUT = 60
+REQUEST_TIMEOUT = 60
+
+
+class Client:
+    """One keep-alive connection, like a browser socket."""
+
+    def __init__(self, base_url: str):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.conn: Optional[http.client.HTTPConnection] = None
+
+    def request(self, method: str, path: str, payload: Any = None) -> Tuple[int, Any]:
+        body = json.dumps(payload).encode("utf-8") if payload is not None else None
+        headers = {"Accept-Encoding": "gzip", "Content-Type": "application/json"}
+        for attempt in (1, 2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=REQUEST_TIMEOUT)
+            try:
+                self.conn.request(method, path, body=body, headers=headers)
+                response = self.conn.getresponse()
+                data = response.read()
+                break
+            except (OSError, http.client.HTTPException):
+                # Servers may drop idle keep-alive connections; retry once on a fresh one
+                self.conn.close()
+                self.conn = None
+                if attempt == 2:
+                    raise
+        if response.getheader("Content-Encoding") == "gzip":
+            data = gzip.decompress(data)
+        return response.status, data
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors = 0
+
+    def timed(self, client: Client, route: str, method: str, path: str, payload: Any = None) -> Optional[Any]:
+        start = time.perf_counter()
+        try:
+            status, data = client.request(method, path, payload)
+        except (OSError, http.client.HTTPException):
+            status, data = 0, b""
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            self.latencies.setdefault(route, []).append(elapsed)
+            if status != 200:
+                self.errors += 1
+                return None
+        return json.loads(data)
+
+
+def visit(recorder: Recorder, args: argparse.Namespace, clients: List[Client]) -> None:
+    """One page load: /products, then deals for every product."""
+    products = recorder.timed(clients[0], "GET /products", "GET", "/products")
+    if not products:
+        return
+    queries = [p["query"] for p in products]
+
+    if args.mode == "batch":
+        for start in range(0, len(queries), args.batch_size):
+            recorder.timed(
+                clients[0], "POST /deals/batch", "POST", "/deals/batch",
+                {"queries": queries[start:start + args.batch_size]}
+            )
+        return
+
+    cursor = iter(range(len(queries)))
+    lock = threading.Lock()
+
+    def worker(client: Client) -> None:
+        while True:
+            with lock:
+                i = next(cursor, None)
+            if i is None:
+                return
+            recorder.timed(client, "POST /deals", "POST", "/deals", {"query": queries[i]})
+
+    threads = [threading.Thread(target=worker, args=(c,)) for c in clients]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def run_load(name: str, base_url: str, args: argparse.Namespace) -> Dict[str, Any]:
+    recorder = Recorder()
+    visits = [0]
+    deadline = time.monotonic() + args.duration
+
+    def visitor() -> None:
+        clients = [Client(base_url) for _ in range(args.concurrency)]
+        while time.monotonic() < deadline:
+            visit(recorder, args, clients)
+            with recorder.lock:
+                visits[0] += 1
+
+    print(f"{name}: {args.clients} visitors for {args.duration:.0f}s against {base_url}")
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.clients) as pool:
+        for future in [pool.submit(visitor) for _ in range(args.clients)]:
+            future.result()
+    elapsed = time.perf_counter() - start
+
+    routes = {}
+    for route, samples in recorder.latencies.items():
+        samples.sort()
+        routes[route] = {
+            "requests": len(samples),
+            "rps": len(samples) / elapsed,
+            "p50_ms": statistics.median(samples) * 1000,
+            "p95_ms": percentile(samples, 0.95) * 1000,
+            "p99_ms": percentile(samples, 0.99) * 1000,
+        }
+    total = sum(r["requests"] for r in routes.values())
+    return {
+        "url": base_url,
+        "seconds": elapsed,
+        "page_loads": visits[0],
+        "page_loads_per_sec": visits[0] / elapsed,
+        "requests": total,
+        "rps": total / elapsed,
+        "errors": recorder.errors,
+        "routes": routes,
+    }
+
+
+def wait_until_up(base_url: str, process: subprocess.Popen) -> None:
+    deadline = time.monotonic() + START_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server for {base_url} exited with {process.returncode}")
+        try:
+            Client(base_url).request("GET", "/products")
+            return
+        except (OSError, http.client.HTTPException):
+            time.sleep(0.5)
+    raise RuntimeError(f"server for {base_url} did not come up in {START_TIMEOUT}s")
+
+
+def start_servers(args: argparse.Namespace) -> List[Tuple[str, str, subprocess.Popen]]:
+    env = dict(os.environ)
+    if not args.cache:
+        env["DEALS_CACHE_SIZE"] = "0"
+    commands = [
+        ("flask", args.flask_port, [
+            sys.executable, "-c",
+            # No per-request access log, like uvicorn at --log-level warning
+            "import logging; logging.getLogger('werkzeug').setLevel(logging.WARNING); "
+            f"import products; products.app.run(port={args.flask_port}, threaded=True)",
+        ]),
+        ("asgi", args.asgi_port, [
+            sys.executable, "-m", "uvicorn", "products_async:app",
+            "--port", str(args.asgi_port), "--workers", str(args.asgi_workers), "--log-level", "warning",
+        ]),
+    ]
+    servers = []
+    for name, port, command in commands:
+        process = subprocess.Popen(command, cwd=API_DIR, env=env, stdout=subprocess.DEVNULL)
+        servers.append((name, f"http://127.0.0.1:{port}", process))
+    return servers
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=API_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=32, help="concurrent visitors")
+    parser.add_argument("--duration", type=float, default=30, help="seconds per app")
+    parser.add_argument("--mode", choices=("batch", "single"), default="single")
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=6, help="requests in flight per visitor")
+    parser.add_argument("--flask-url", help="use a running Flask app instead of starting one")
+    parser.add_argument("--asgi-url", help="use a running ASGI app instead of starting one")
+    parser.add_argument("--flask-port", type=int, default=5101)
+    parser.add_argument("--asgi-port", type=int, default=5102)
+    parser.add_argument("--asgi-workers", type=int, default=2)
+    parser.add_argument("--cache", action="store_true", help="keep the /deals response cache enabled")
+    parser.add_argument("--output", help="report path (default: benchmarks/results/<time>-<commit>-serving.json)")
+    args = parser.parse_args()
+
+    started = datetime.now(timezone.utc)
+    servers = []
+    if args.flask_url and args.asgi_url:
+        targets = [("flask", args.flask_url), ("asgi", args.asgi_url)]
+    elif args.flask_url or args.asgi_url:
+        sys.exit("Pass both --flask-url and --asgi-url, or neither")
+    else:
+        servers = start_servers(args)
+        targets = [(name, url) for name, url, _ in servers]
+
+    results = {}
+    try:
+        for _, base_url, process in servers:
+            wait_until_up(base_url, process)
+        for name, base_url in targets:
+            results[name] = run_load(name, base_url, args)
+    except RuntimeError as e:
+        sys.exit(str(e))
+    finally:
+        for _, _, process in servers:
+            process.terminate()
+            process.wait()
+
+    print(f"\n{'app':<6} {'route':<18} {'requests':>9} {'rps':>8} {'p50_ms':>8} {'p95_ms':>8} {'p99_ms':>8}")
+    for name, result in results.items():
+        for route, r in result["routes"].items():
+            print(
+                f"{name:<6} {route:<18} {r['requests']:>9,} {r['rps']:>8.1f} "
+                f"{r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f}"
+            )
+        print(
+            f"{name:<6} {'page loads':<18} {result['page_loads']:>9,} {result['page_loads_per_sec']:>8.2f}"
+            f"   errors={result['errors']}"
+        )
+    if "flask" in results and "asgi" in results and results["flask"]["rps"]:
+        print(f"\nasgi/flask throughput: {results['asgi']['rps'] / results['flask']['rps']:.2f}x")
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "started": started.isoformat(),
+        "settings": {
+            k: getattr(args, k)
+            for k in ("clients", "duration", "mode", "batch_size", "concurrency", "asgi_workers", "cache")
+        },
+        "results": results,
+    }
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{started:%Y%m%dT%H%M%S}-{commit}-serving.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"report written to {output}")
+
+
+if __name__ == "__main__":
+    main()
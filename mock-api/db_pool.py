@@ -0,0 +1,172 @@
+"""
+Bounded MySQL connection pool for the Flask app.
+
+mysql.connector's pool raises PoolError the moment every connection is
+checked out, so a burst of /deals requests used to turn into 500s. Here a
+semaphore sits in front of it: a checkout waits up to
+MYSQL_POOL_ACQUIRE_TIMEOUT seconds (default 2) for a connection to come back
+and only then raises PoolTimeout, which the routes answer with 503 and a
+Retry-After of MYSQL_POOL_RETRY_AFTER seconds (default 1). The pool holds
+MYSQL_POOL_SIZE connections (default 16). mysql.connector refuses pools of
+more than 32, so a larger value is clamped to MAX_POOL_SIZE with a warning
+rather than failing at startup.
+
+Checked-out connections go back to the pool when closed, and
+``with pool.connection() as conn`` closes them on every path out of the
+block, early returns and exceptions included.
+
+PoolStats counts checkouts, time spent waiting for a connection and
+timeouts; products_async.py keeps one for its aiomysql pool as well.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict
+
+import mysql.connector
+from mysql.connector import pooling
+
+# mysql.connector.pooling.CNX_POOL_MAXSIZE
+MAX_POOL_SIZE = 32
+POOL_SIZE = int(os.environ.get("MYSQL_POOL_SIZE", 16))
+if POOL_SIZE > MAX_POOL_SIZE:
+    print(f"MYSQL_POOL_SIZE={POOL_SIZE} exceeds mysql.connector's limit; using {MAX_POOL_SIZE}")
+    POOL_SIZE = MAX_POOL_SIZE
+ACQUIRE_TIMEOUT = float(os.environ.get("MYSQL_POOL_ACQUIRE_TIMEOUT", 2))
+RETRY_AFTER = int(os.environ.get("MYSQL_POOL_RETRY_AFTER", 1))
+
+
+class PoolTimeout(Exception):
+    """No connection came back within the acquire timeout."""
+
+
+class PoolUnavailable(Exception):
+    """There is no pool, or it could not open a connection."""
+
+
+class PoolStats:
+    """Thread-safe counters of one pool's checkouts."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._lock = threading.Lock()
+        self.in_use = 0
+        self.waiting = 0
+        self.acquired = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def wait_started(self) -> float:
+        with self._lock:
+            self.waiting += 1
+        return time.perf_counter()
+
+    def _waited(self, started: float) -> None:
+        waited = time.perf_counter() - started
+        self.waiting -= 1
+        self.wait_seconds += waited
+        self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+    def checked_out(self, started: float) -> None:
+        with self._lock:
+            self._waited(started)
+            self.in_use += 1
+            self.acquired += 1
+
+    def timed_out(self, started: float) -> None:
+        with self._lock:
+            self._waited(started)
+            self.timeouts += 1
+
+    def failed(self, started: float) -> None:
+        with self._lock:
+            self._waited(started)
+            self.errors += 1
+
+    def checked_in(self) -> None:
+        with self._lock:
+            self.in_use -= 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": self.size,
+                "in_use": self.in_use,
+                "waiting": self.waiting,
+                "acquired": self.acquired,
+                "timeouts": self.timeouts,
+                "errors": self.errors,
+                "wait_seconds": self.wait_seconds,
+                "max_wait_seconds": self.max_wait_seconds,
+            }
+
+
+class PooledConnection:
+    """A checked-out connection; close() hands it back to the pool (once)."""
+
+    def __init__(self, pool: "ConnectionPool", conn: Any):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._conn, name)
+
+    def close(self) -> None:
+        conn, self._conn = self._conn, None
+        if conn is None:
+            return
+        try:
+            conn.close()
+        finally:
+            self._pool._check_in()
+
+    def __enter__(self) -> "PooledConnection":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+class ConnectionPool:
+    """mysql.connector pool whose checkouts wait for a free connection instead of failing."""
+
+    def __init__(self, config: Dict[str, Any], size: int = POOL_SIZE, acquire_timeout: float = ACQUIRE_TIMEOUT):
+        self._pool = pooling.MySQLConnectionPool(
+            pool_name="mypool",
+            pool_size=size,
+            pool_reset_session=True,
+            **config
+        )
+        self._slots = threading.BoundedSemaphore(size)
+        self.acquire_timeout = acquire_timeout
+        self.stats = PoolStats(size)
+
+    def get_connection(self) -> PooledConnection:
+        """A connection to close when done; raises PoolTimeout or PoolUnavailable."""
+        started = self.stats.wait_started()
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            self.stats.timed_out(started)
+            raise PoolTimeout(f"No database connection free within {self.acquire_timeout:g}s")
+        try:
+            conn = self._pool.get_connection()
+        except mysql.connector.Error as e:
+            self._slots.release()
+            self.stats.failed(started)
+            raise PoolUnavailable(str(e)) from e
+        self.stats.checked_out(started)
+        return PooledConnection(self, conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.get_connection()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _check_in(self) -> None:
+        self._slots.release()
+        self.stats.checked_in()
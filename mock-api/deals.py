@@ -0,0 +1,644 @@
+"""
+Settings, SQL and response bodies for /deals, shared by the Flask app
+(products.py) and the ASGI app (products_async.py) so both serve the same
+schemas from the same queries. Only the I/O around them differs.
+
+The database work of a request is written once, as a plan: a generator
+that yields a Fetch for each statement it needs and is sent back
+(columns, rows), or an EngineLookup for window engine benchmarks. The
+Flask app runs plans with run_plan and a blocking fetch, the ASGI app with
+run_plan_async and an awaitable one; benchmark source selection, the SQL
+fallback, batch assembly and caching all live here.
+"""
+import asyncio
+import base64
+import os
+import sys
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from dotenv import load_dotenv
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+
+from response_cache import DealsCache, RunVersion
+from responses import dumps, encode_rows
+
+# catalog.py lives with the pricing engine, so both sides parse and validate
+# products.json the same way
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'pricing-engine'))
+from catalog import api_query_id as hash_query, load_catalog
+
+# Load .env from parent directory
+load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'))
+
+PRODUCTS_JSON_PATH = os.path.join(
+    os.path.dirname(__file__),
+    '..',
+    'pricing-engine',
+    'products.json'
+)
+
+db_config = {
+    "host": os.environ.get("MYSQL_HOST", "localhost"),
+    "port": int(os.environ.get("MYSQL_PORT", 3306)),
+    "user": os.environ.get("MYSQL_USER", "root"),
+    "password": os.environ.get("MYSQL_PASSWORD", ""),
+    "database": os.environ.get("MYSQL_DATABASE", ""),
+}
+
+# Configuration for benchmark computation (same variables as the pricing
+# engine, which materializes benchmarks into BENCHMARK_TABLE after each run)
+WINDOW_DAYS = int(os.environ.get("BENCHMARK_WINDOW_DAYS", 7))
+TRIM_PCT = int(os.environ.get("BENCHMARK_TRIM_PCT", 15))  # Percentage trimmed from bottom tail
+BENCHMARK_TABLE = os.environ.get("MYSQL_BENCHMARK_TABLE", "query_benchmarks")
+# Where /deals gets benchmarks: "table" reads BENCHMARK_TABLE, "engine" keeps
+# an in-memory sliding window (see window_engine.py), "sql" computes them per
+# request. Both "table" and "engine" fall back to "sql" when they have no
+# answer, "table" also while BENCHMARK_TABLE doesn't exist.
+BENCHMARK_SOURCE = os.environ.get("BENCHMARK_SOURCE", "table").lower()
+
+DEALS_LIMIT = 15  # Listings returned per query (default page size)
+DEALS_PAGE_MAX = int(os.environ.get("DEALS_PAGE_MAX", 100))  # Largest page_size a client may ask for
+DEALS_BATCH_MAX = int(os.environ.get("DEALS_BATCH_MAX", 100))  # Queries per /deals/batch request
+DEALS_STREAM_MAX = int(os.environ.get("DEALS_STREAM_MAX", 500))  # Queries per /deals/stream request
+# Queries a single /deals/stream request computes at once, each on its own connection
+DEALS_STREAM_CONCURRENCY = int(os.environ.get("DEALS_STREAM_CONCURRENCY", 4))
+
+# /deals responses are cached per query for at most DEALS_CACHE_TTL seconds,
+# and dropped as soon as the pricing engine bumps the run-version marker.
+# DEALS_CACHE_SIZE=0 disables the cache.
+DEALS_CACHE_TTL = float(os.environ.get("DEALS_CACHE_TTL", 300))
+DEALS_CACHE_SIZE = int(os.environ.get("DEALS_CACHE_SIZE", 1024))
+RUN_VERSION_FILE = os.environ.get(
+    "RUN_VERSION_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'pricing-engine', '.run_version')
+)
+run_version = RunVersion(RUN_VERSION_FILE)
+deals_cache = DealsCache(DEALS_CACHE_SIZE, DEALS_CACHE_TTL)
+
+# Listing fields a client may ask for, in response order; all of them by
+# default. discount_pct is computed, the rest are ebay_listings columns.
+LISTING_FIELDS = (
+    'id', 'marketplace_id', 'query_name', 'api_query_text', 'fetched_at', 'last_seen_at', 'title',
+    'condition_category', 'condition_description', 'listing_url', 'price', 'currency', 'discount_pct'
+)
+LISTING_COLUMNS = LISTING_FIELDS[:-1]
+# Columns the deals queries need whatever the client asked for: the page
+# key (price, id), and fetched_at / listing_key for deduplication
+KEY_COLUMNS = ('price', 'id')
+DEDUP_COLUMNS = ('fetched_at', 'listing_key')
+
+def valid_identifier(name):
+    """Table names can't be parameterized, so only alphanumerics and underscores are allowed"""
+    return bool(name) and name.replace('_', '').isalnum()
+
+# MySQL's ER_NO_SUCH_TABLE
+ER_NO_SUCH_TABLE = 1146
+
+def no_such_table(error):
+    """Whether a mysql.connector or aiomysql error says a table doesn't exist"""
+    code = getattr(error, 'errno', None)
+    if code is None and error.args:
+        code = error.args[0]
+    return code == ER_NO_SUCH_TABLE
+
+def benchmark_payload(benchmark_value, computed_at=None):
+    return {
+        "value": benchmark_value,
+        "currency": "USD",
+        "median_type": "trimmed_median",
+        "trim_pct": TRIM_PCT,
+        "window_days": WINDOW_DAYS,
+        "computed_at": (computed_at or datetime.utcnow()).isoformat() + "Z"
+    }
+
+class ListingRequest:
+    """Validated listing options of a /deals or /deals/batch request."""
+    __slots__ = ('fields', 'page_size', 'cursor', 'after')
+
+    def __init__(self, fields=LISTING_FIELDS, page_size=DEALS_LIMIT, cursor=None):
+        self.fields = fields
+        self.page_size = page_size
+        self.cursor = cursor
+        self.after = decode_cursor(cursor) if cursor is not None else None
+
+    @classmethod
+    def parse(cls, data, allow_cursor=True):
+        """From a request body; raises ValueError with a client-facing message."""
+        fields = data.get('fields')
+        if fields is None:
+            fields = LISTING_FIELDS
+        else:
+            if not isinstance(fields, list) or not fields or not all(isinstance(f, str) for f in fields):
+                raise ValueError("fields must be a non-empty list of field names")
+            unknown = sorted(set(fields) - set(LISTING_FIELDS))
+            if unknown:
+                raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+            fields = tuple(f for f in LISTING_FIELDS if f in fields)
+
+        page_size = data.get('page_size', DEALS_LIMIT)
+        if type(page_size) is not int or not 1 <= page_size <= DEALS_PAGE_MAX:
+            raise ValueError(f"page_size must be an integer from 1 to {DEALS_PAGE_MAX}")
+
+        cursor = data.get('cursor')
+        if cursor is not None and not allow_cursor:
+            raise ValueError("cursor is only supported by /deals")
+        if cursor is not None and not isinstance(cursor, str):
+            raise ValueError("Invalid cursor")
+        return cls(fields, page_size, cursor)
+
+    @property
+    def columns(self):
+        """Columns the deals query returns: the requested ones plus the page key"""
+        return tuple(c for c in LISTING_COLUMNS if c in self.fields or c in KEY_COLUMNS)
+
+    def cache_key(self, api_query_id):
+        """Response cache key; the default request shares the plain api_query_id with /deals/batch"""
+        if self.fields == LISTING_FIELDS and self.page_size == DEALS_LIMIT and self.cursor is None:
+            return api_query_id
+        return f"{api_query_id}|{','.join(self.fields)}|{self.page_size}|{self.cursor or ''}"
+
+def encode_cursor(price, row_id):
+    return base64.urlsafe_b64encode(f"{price}:{row_id}".encode("ascii")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor):
+    """(price, id) of the last listing of the previous page; ValueError if malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("ascii")
+        price, row_id = raw.split(":")
+        return Decimal(price), int(row_id)
+    except (ValueError, InvalidOperation, UnicodeError):
+        raise ValueError("Invalid cursor") from None
+
+def paginate(columns, rows, page_size):
+    """Rows of one page out of page_size + 1 fetched, and the cursor of the next page (None on the last)"""
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    last = rows[-1]
+    return rows, encode_cursor(last[columns.index('price')], last[columns.index('id')])
+
+def deals_body(columns, rows, benchmark_value, computed_at=None, listing=None, next_cursor=None):
+    """
+    Serialized /deals response: the benchmark, the listing rows with the
+    fields `listing` asked for (discount_pct computed against the
+    benchmark), and the cursor of the next page.
+    """
+    listing = listing or ListingRequest()
+    price_index = columns.index('price') if rows else None
+
+    def discount_pct(row):
+        # Compute discount percentage from category median
+        price = row[price_index]
+        if benchmark_value and price:
+            return round((1 - float(price) / benchmark_value) * 100, 1)
+        return None
+
+    drop = [c for c in columns if c not in listing.fields]
+    extra = [('discount_pct', discount_pct)] if 'discount_pct' in listing.fields else []
+    listings = encode_rows(columns, rows, drop=drop, extra=extra)
+    return (
+        b'{"benchmark":' + dumps(benchmark_payload(benchmark_value, computed_at))
+        + b',"listings":' + listings + b',"next_cursor":' + dumps(next_cursor) + b'}'
+    )
+
+def batch_body(queries, ids_by_query, bodies):
+    """/deals/batch response: each query's /deals body with "query" added up front"""
+    results = b",".join(
+        b'{"query":' + dumps(query) + b"," + bodies[ids_by_query[query]][1:] for query in queries
+    )
+    return b'{"results":[' + results + b"]}"
+
+def config_error():
+    """Message of the 500 for an unusable MYSQL_TABLE or BENCHMARK_TABLE, or None"""
+    if not valid_identifier(os.environ.get("MYSQL_TABLE", "")):
+        return "Invalid table name"
+    # Only the table source reads BENCHMARK_TABLE
+    if BENCHMARK_SOURCE == "table" and not valid_identifier(BENCHMARK_TABLE):
+        return "Invalid benchmark table name"
+    return None
+
+def batch_queries(data):
+    """Queries of a /deals/batch request; raises ValueError"""
+    queries = data.get('queries')
+    if not isinstance(queries, list) or not queries or not all(isinstance(q, str) and q for q in queries):
+        raise ValueError("A non-empty list of query texts is required")
+    if len(queries) > DEALS_BATCH_MAX:
+        raise ValueError(f"At most {DEALS_BATCH_MAX} queries per batch")
+    return queries
+
+def stream_queries(data):
+    """Queries of a /deals/stream request, or None for every catalog product; raises ValueError"""
+    queries = data.get('queries')
+    if queries is None:
+        return None
+    if not isinstance(queries, list) or not queries or not all(isinstance(q, str) and q for q in queries):
+        raise ValueError("queries must be a non-empty list of query texts")
+    if len(queries) > DEALS_STREAM_MAX:
+        raise ValueError(f"At most {DEALS_STREAM_MAX} queries per stream")
+    return queries
+
+def stream_targets(queries, catalog):
+    """
+    (name, query, api_query_id) for each distinct query of `queries`, or of
+    every product when None. Names come from the catalog (the query text
+    for unknown queries), as the client labels its errors.
+    """
+    names = {}
+    if catalog is not None:
+        for product in catalog.products:
+            names.setdefault(product["query"], product.get("name"))
+        if queries is None:
+            queries = [product["query"] for product in catalog.products]
+    ids_by_query = api_query_ids_for(queries)
+    return [(names.get(q) or q, q, ids_by_query[q]) for q in dict.fromkeys(queries)]
+
+# Content types of /deals/stream: NDJSON unless the client accepts SSE
+NDJSON_MIMETYPE = "application/x-ndjson"
+SSE_MIMETYPE = "text/event-stream"
+
+def wants_sse(accept):
+    """True when the Accept header prefers SSE over NDJSON"""
+    accepted = parse_accept_header(accept, MIMEAccept)
+    return accepted.quality(SSE_MIMETYPE) > accepted.quality(NDJSON_MIMETYPE)
+
+def stream_frame(event, data, sse):
+    """One stream event: an NDJSON line, or an SSE event whose data is the same JSON"""
+    if sse:
+        return b"event: " + event.encode("ascii") + b"\ndata: " + data + b"\n\n"
+    return data + b"\n"
+
+def result_event(name, query, body, sse):
+    """A query's serialized /deals body, tagged with its product"""
+    return stream_frame(
+        "result",
+        b'{"type":"result","name":' + dumps(name) + b',"query":' + dumps(query) + b"," + body[1:],
+        sse
+    )
+
+def error_event(name, query, message, sse):
+    return stream_frame("error", dumps({"type": "error", "name": name, "query": query, "error": message}), sse)
+
+def summary_event(total, errors, sse):
+    """Last event of a stream; `errors` reads "<name>: <message>" like the client's errors array"""
+    return stream_frame("summary", dumps({"type": "summary", "total": total, "errors": errors}), sse)
+
+def api_query_ids_for(queries):
+    """query text -> api_query_id, using the catalog's precomputed hashes for known products"""
+    try:
+        catalog = load_catalog(PRODUCTS_JSON_PATH)
+    except (OSError, ValueError):
+        return {q: hash_query(q) for q in queries}
+    return {q: catalog.query_id(q) for q in queries}
+
+def table_benchmark_query():
+    """Stored benchmark of one api_query_id"""
+    return f"SELECT trimmed_median, computed_at FROM {BENCHMARK_TABLE} WHERE api_query_id = %s"
+
+def benchmark_query(table_name):
+    """Trimmed median benchmark of one api_query_id, computed from the window"""
+    return f"""
+    WITH ranked_prices AS (
+      SELECT
+        price,
+        PERCENT_RANK() OVER (ORDER BY price) as price_percentile
+      FROM {table_name}
+      WHERE last_seen_at >= DATE_SUB(NOW(), INTERVAL {WINDOW_DAYS} DAY)
+        AND api_query_id = %s
+    ),
+    trimmed_prices AS (
+      SELECT price
+      FROM ranked_prices
+      WHERE price_percentile > {TRIM_PCT / 100}
+    )
+    SELECT AVG(price) as trimmed_median
+    FROM (
+      SELECT
+        price,
+        ROW_NUMBER() OVER (ORDER BY price) as row_num,
+        COUNT(*) OVER () as total_count
+      FROM trimmed_prices
+    ) ranked
+    WHERE row_num IN (FLOOR((total_count + 1) / 2), CEIL((total_count + 1) / 2))
+    """
+
+# Joins that give the deals query its benchmark b.trimmed_median
+TABLE_BENCHMARK_JOIN = f"INNER JOIN {BENCHMARK_TABLE} b ON b.api_query_id = e.api_query_id"
+VALUE_BENCHMARK_JOIN = "CROSS JOIN (SELECT %s AS trimmed_median) b"
+
+def deals_query(table_name, benchmark_join, listing):
+    """
+    One page of deals of one api_query_id, priced against the benchmark
+    `benchmark_join` provides, with only the columns `listing` needs. Pages
+    are keyed on (price, id): with a cursor, the params end with
+    (price, price, id) of the previous page's last row. One row more than
+    the page is fetched to tell whether there is a next page.
+    """
+    inner = dict.fromkeys(listing.columns + DEDUP_COLUMNS)
+    after = " AND (price > %s OR (price = %s AND id > %s))" if listing.after is not None else ""
+    return f"""
+    WITH filtered_deals AS (
+      SELECT {", ".join("e." + c for c in inner)}
+      FROM {table_name} e
+      {benchmark_join}
+      WHERE e.price < 0.80 * b.trimmed_median
+        AND e.price > 0.35 * b.trimmed_median
+        AND e.last_seen_at >= DATE_SUB(NOW(), INTERVAL {WINDOW_DAYS} DAY)
+        AND e.api_query_id = %s
+    ),
+    deduplicated_deals AS (
+      SELECT
+        *,
+        ROW_NUMBER() OVER (PARTITION BY listing_key ORDER BY price ASC, fetched_at DESC) as rn
+      FROM filtered_deals
+    )
+    SELECT {", ".join(listing.columns)}
+    FROM deduplicated_deals
+    WHERE rn = 1{after}
+    ORDER BY price ASC, id ASC
+    LIMIT {listing.page_size + 1}
+    """
+
+def page_params(benchmark_params, listing):
+    """Params of deals_query after the benchmark join's"""
+    if listing.after is None:
+        return tuple(benchmark_params)
+    price, row_id = listing.after
+    return tuple(benchmark_params) + (price, price, row_id)
+
+def table_benchmarks_query(count):
+    """Stored benchmarks of `count` api_query_ids"""
+    return (
+        f"SELECT api_query_id, trimmed_median, computed_at FROM {BENCHMARK_TABLE} "
+        f"WHERE api_query_id IN ({', '.join(['%s'] * count)})"
+    )
+
+def batch_benchmarks_query(table_name, count):
+    """Trimmed median benchmarks of `count` api_query_ids, in one partitioned pass"""
+    return f"""
+    WITH ranked_prices AS (
+      SELECT
+        api_query_id,
+        price,
+        PERCENT_RANK() OVER (PARTITION BY api_query_id ORDER BY price) as price_percentile
+      FROM {table_name}
+      WHERE last_seen_at >= DATE_SUB(NOW(), INTERVAL {WINDOW_DAYS} DAY)
+        AND api_query_id IN ({", ".join(["%s"] * count)})
+    ),
+    trimmed_prices AS (
+      SELECT api_query_id, price
+      FROM ranked_prices
+      WHERE price_percentile > {TRIM_PCT / 100}
+    )
+    SELECT api_query_id, AVG(price) as trimmed_median
+    FROM (
+      SELECT
+        api_query_id,
+        price,
+        ROW_NUMBER() OVER (PARTITION BY api_query_id ORDER BY price) as row_num,
+        COUNT(*) OVER (PARTITION BY api_query_id) as total_count
+      FROM trimmed_prices
+    ) ranked
+    WHERE row_num IN (FLOOR((total_count + 1) / 2), CEIL((total_count + 1) / 2))
+    GROUP BY api_query_id
+    """
+
+def batch_deals_query(table_name, count, listing):
+    """
+    First pages of deals of `count` api_query_ids in one scan partitioned by
+    api_query_id, as deals_query would return them; params are
+    (api_query_id, trimmed_median) pairs. Rows start with api_query_id.
+    """
+    inner = dict.fromkeys(('api_query_id',) + listing.columns + DEDUP_COLUMNS)
+    benchmark_rows = " UNION ALL ".join(["SELECT %s AS api_query_id, %s AS trimmed_median"] * count)
+    return f"""
+    WITH benchmarks AS (
+      {benchmark_rows}
+    ),
+    filtered_deals AS (
+      SELECT {", ".join("e." + c for c in inner)}
+      FROM {table_name} e
+      INNER JOIN benchmarks b ON e.api_query_id = b.api_query_id
+      WHERE e.price < 0.80 * b.trimmed_median
+        AND e.price > 0.35 * b.trimmed_median
+        AND e.last_seen_at >= DATE_SUB(NOW(), INTERVAL {WINDOW_DAYS} DAY)
+    ),
+    deduplicated_deals AS (
+      SELECT
+        *,
+        ROW_NUMBER() OVER (PARTITION BY api_query_id, listing_key ORDER BY price ASC, fetched_at DESC) as rn
+      FROM filtered_deals
+    ),
+    ranked_deals AS (
+      SELECT
+        *,
+        ROW_NUMBER() OVER (PARTITION BY api_query_id ORDER BY price ASC, id ASC) as deal_rank
+      FROM deduplicated_deals
+      WHERE rn = 1
+    )
+    SELECT api_query_id, {", ".join(listing.columns)}
+    FROM ranked_deals
+    WHERE deal_rank <= {listing.page_size + 1}
+    ORDER BY api_query_id, price ASC, id ASC
+    """
+
+class Fetch:
+    """A named statement a plan needs; the plan is sent back (columns, rows)"""
+    __slots__ = ('statement', 'sql', 'params')
+
+    def __init__(self, statement, sql, params):
+        self.statement = statement
+        self.sql = sql
+        self.params = params
+
+class EngineLookup:
+    """Window engine benchmarks a plan needs; the plan is sent {api_query_id: median}"""
+    __slots__ = ('engine', 'api_query_ids')
+
+    def __init__(self, engine, api_query_ids):
+        self.engine = engine
+        self.api_query_ids = api_query_ids
+
+    def __call__(self):
+        return {i: self.engine.trimmed_median(i) for i in self.api_query_ids}
+
+def run_plan(plan, fetch):
+    """
+    Run `plan` to completion with fetch(Fetch) -> (columns, rows) and return
+    its result. An error raised by fetch is thrown into the plan, which
+    either handles it or lets it propagate out of here.
+    """
+    try:
+        step = next(plan)
+        while True:
+            try:
+                result = fetch(step) if isinstance(step, Fetch) else step()
+            except Exception as e:
+                step = plan.throw(e)
+            else:
+                step = plan.send(result)
+    except StopIteration as done:
+        return done.value
+
+async def run_plan_async(plan, fetch):
+    """
+    run_plan with an awaitable fetch. Window engine lookups run in a worker
+    thread, since the engine's lock is held while it applies a poll.
+    """
+    try:
+        step = next(plan)
+        while True:
+            try:
+                if isinstance(step, Fetch):
+                    result = await fetch(step)
+                else:
+                    result = await asyncio.to_thread(step)
+            except Exception as e:
+                step = plan.throw(e)
+            else:
+                step = plan.send(result)
+    except StopIteration as done:
+        return done.value
+
+def stored_benchmarks(step):
+    """
+    Rows of a BENCHMARK_TABLE statement, with none while the table doesn't
+    exist yet (the engine hasn't run), so the SQL benchmark is used instead
+    of failing the request.
+    """
+    try:
+        _, rows = yield step
+    except Exception as e:
+        if not no_such_table(e):
+            raise
+        return []
+    return rows
+
+def engine_ready(engine):
+    return engine is not None and engine.ready
+
+def deals_plan(table_name, api_query_id, listing, engine=None):
+    """
+    Plan of one /deals page of api_query_id: its benchmark from
+    BENCHMARK_SOURCE (or the SQL fallback), then its deal rows. Returns
+    (columns, rows, benchmark_value, computed_at).
+    """
+    benchmark = None
+    computed_at = None
+    benchmark_join = None
+    if BENCHMARK_SOURCE == "table":
+        rows = yield from stored_benchmarks(
+            Fetch("table_benchmark_query", table_benchmark_query(), (api_query_id,))
+        )
+        if rows:
+            benchmark, computed_at = rows[0]
+            benchmark_join = TABLE_BENCHMARK_JOIN
+            deals_params = (api_query_id,)
+    elif engine_ready(engine):
+        medians = yield EngineLookup(engine, (api_query_id,))
+        benchmark = medians[api_query_id]
+        benchmark_join = VALUE_BENCHMARK_JOIN
+        deals_params = (benchmark, api_query_id)
+
+    if benchmark_join is None:
+        _, rows = yield Fetch("benchmark_query", benchmark_query(table_name), (api_query_id,))
+        benchmark = rows[0][0] if rows else None
+        benchmark_join = VALUE_BENCHMARK_JOIN
+        deals_params = (benchmark, api_query_id)
+    benchmark_value = float(benchmark) if benchmark else None
+
+    if benchmark is None:
+        # No benchmark for this query means no deals
+        return [], [], benchmark_value, computed_at
+    columns, results = yield Fetch(
+        "deals_query", deals_query(table_name, benchmark_join, listing), page_params(deals_params, listing)
+    )
+    return (columns if results else []), results, benchmark_value, computed_at
+
+def batch_plan(table_name, api_query_ids, listing, engine=None):
+    """
+    Plan of the first /deals pages of api_query_ids: every benchmark in one
+    lookup (missing ones computed in one partitioned pass), then the deals
+    of all queries in one scan. Returns (benchmarks, columns, listings_by_id)
+    with benchmarks as api_query_id -> (benchmark, computed_at).
+    """
+    benchmarks = {}
+    if BENCHMARK_SOURCE == "table":
+        rows = yield from stored_benchmarks(
+            Fetch("table_benchmarks_query", table_benchmarks_query(len(api_query_ids)), api_query_ids)
+        )
+        for api_query_id, median, computed_at in rows:
+            benchmarks[api_query_id] = (median, computed_at)
+    elif engine_ready(engine):
+        medians = yield EngineLookup(engine, api_query_ids)
+        for api_query_id in api_query_ids:
+            benchmarks[api_query_id] = (medians[api_query_id], None)
+
+    missing = [i for i in api_query_ids if i not in benchmarks]
+    if missing:
+        _, rows = yield Fetch("batch_benchmarks_query", batch_benchmarks_query(table_name, len(missing)), missing)
+        computed = dict(rows)
+        for api_query_id in missing:
+            benchmarks[api_query_id] = (computed.get(api_query_id), None)
+
+    # Benchmarks travel into the deals scan as a derived table, whichever
+    # source they came from
+    priced = [(i, b[0]) for i, b in benchmarks.items() if b[0] is not None]
+    listings_by_id = {i: [] for i in api_query_ids}
+    columns = []
+    if priced:
+        columns, rows = yield Fetch(
+            "batch_deals_query", batch_deals_query(table_name, len(priced), listing),
+            [p for row in priced for p in row]
+        )
+        id_index = columns.index('api_query_id')
+        for row in rows:
+            listings_by_id[row[id_index]].append(row)
+    return benchmarks, columns, listings_by_id
+
+def cache_deals_body(api_query_id, listing, version, page):
+    """Serialized /deals body of a deals_plan result, cached for `version`"""
+    columns, results, benchmark_value, computed_at = page
+    results, next_cursor = paginate(columns, results, listing.page_size)
+    body = deals_body(columns, results, benchmark_value, computed_at, listing, next_cursor)
+    deals_cache.put(listing.cache_key(api_query_id), version, body)
+    return body
+
+def cached_bodies(api_query_ids, listing, version):
+    """api_query_id -> cached /deals body of those of api_query_ids cached for `version`"""
+    bodies = {}
+    for api_query_id in dict.fromkeys(api_query_ids):
+        cached = deals_cache.get(listing.cache_key(api_query_id), version)
+        if cached is not None:
+            bodies[api_query_id] = cached
+    return bodies
+
+def cache_batch_bodies(bodies, api_query_ids, listing, version, batch):
+    """Add the serialized /deals bodies of a batch_plan result to `bodies`, caching each for `version`"""
+    benchmarks, columns, listings_by_id = batch
+    for api_query_id in api_query_ids:
+        benchmark, computed_at = benchmarks[api_query_id]
+        bodies[api_query_id] = cache_deals_body(
+            api_query_id, listing, version,
+            (columns, listings_by_id[api_query_id], float(benchmark) if benchmark else None, computed_at)
+        )
+
+def stream_split(targets, listing, version, sse):
+    """(result events of the cached targets, the (name, query, api_query_id) still to compute)"""
+    events = []
+    pending = []
+    for name, query, api_query_id in targets:
+        cached = deals_cache.get(listing.cache_key(api_query_id), version)
+        if cached is not None:
+            events.append(result_event(name, query, cached, sse))
+        else:
+            pending.append((name, query, api_query_id))
+    return events, pending
+
+def stream_event(name, query, body, error, errors, sse):
+    """The event of a computed stream query; an error is also added to `errors` for the summary"""
+    if error is None:
+        return result_event(name, query, body, sse)
+    errors.append(f"{name}: {error}")
+    return error_event(name, query, error, sse)
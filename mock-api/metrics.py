@@ -0,0 +1,181 @@
+"""
+In-process request, SQL and pool metrics, served by GET /metrics in the
+Prometheus text exposition format.
+
+Recording is a dict lookup, a bisect and a few additions under a lock, so
+every request and statement is measured, not a sample. Both apps record:
+
+    deals_api_request_duration_seconds{method,route}   histogram, whole response
+    deals_api_requests_total{method,route,status}      counter
+    deals_api_stage_duration_seconds{route,stage}      histogram of the Server-Timing
+                                                        stages: db, serialize, compress
+    deals_api_sql_duration_seconds{statement}          histogram, execute + fetch
+    deals_api_sql_rows_total{statement}                counter of rows returned
+
+where statement names the deals.py builder (benchmark_query, deals_query,
+...). render() adds families read at scrape time from the response cache
+(cache_families) and the connection pool (pool_families).
+
+Values are per process: with several uvicorn workers each one reports its
+own, and a scrape reaches whichever worker accepts it.
+"""
+import threading
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Upper bounds in seconds, from a cache hit to a slow window scan
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# (name, type, help, [(labels, value), ...]) of a metric family read at scrape time
+Family = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[Any]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)) + "}"
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[Any, ...], float] = {}
+
+    def inc(self, *labels: Any, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def expose(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # labels -> [count per bucket (last one is +Inf), sum, count]
+        self._values: Dict[Tuple[Any, ...], List[Any]] = {}
+
+    def observe(self, value: float, *labels: Any) -> None:
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def expose(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            values = sorted((labels, [list(e[0]), e[1], e[2]]) for labels, e in self._values.items())
+        names = self.labelnames + ("le",)
+        for labels, (counts, total, count) in values:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_labels(names, labels + (_number(bound),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+REQUEST_SECONDS = Histogram(
+    "deals_api_request_duration_seconds", "Time to serve a request, until its last byte", ("method", "route")
+)
+REQUESTS = Counter("deals_api_requests_total", "Requests served", ("method", "route", "status"))
+STAGE_SECONDS = Histogram(
+    "deals_api_stage_duration_seconds", "Time spent in each Server-Timing stage of a response", ("route", "stage")
+)
+SQL_SECONDS = Histogram(
+    "deals_api_sql_duration_seconds", "Time to execute a named SQL statement and fetch its rows", ("statement",)
+)
+SQL_ROWS = Counter("deals_api_sql_rows_total", "Rows returned by named SQL statements", ("statement",))
+
+_METRICS = (REQUEST_SECONDS, REQUESTS, STAGE_SECONDS, SQL_SECONDS, SQL_ROWS)
+
+
+def observe_request(method: str, route: str, status: int, seconds: float) -> None:
+    REQUEST_SECONDS.observe(seconds, method, route)
+    REQUESTS.inc(method, route, status)
+
+
+def observe_stages(route: str, timings: Dict[str, float]) -> None:
+    for stage, seconds in timings.items():
+        STAGE_SECONDS.observe(seconds, route, stage)
+
+
+def observe_sql(statement: str, seconds: float, rows: int) -> None:
+    SQL_SECONDS.observe(seconds, statement)
+    SQL_ROWS.inc(statement, amount=rows)
+
+
+def cache_families(cache: Any) -> List[Family]:
+    """The /deals response cache's counters (see response_cache.DealsCache)"""
+    return [
+        ("deals_api_cache_hits_total", "counter", "Response cache hits", [({}, cache.hits)]),
+        ("deals_api_cache_misses_total", "counter", "Response cache misses", [({}, cache.misses)]),
+        ("deals_api_cache_evictions_total", "counter", "Response cache LRU evictions", [({}, cache.evictions)]),
+        ("deals_api_cache_entries", "gauge", "Responses in the cache", [({}, len(cache))]),
+    ]
+
+
+def pool_families(stats: Optional[Dict[str, Any]]) -> List[Family]:
+    """A connection pool's PoolStats snapshot (see db_pool.py); nothing without a pool"""
+    if stats is None:
+        return []
+    return [
+        ("deals_api_pool_size", "gauge", "Connections the pool may hold", [({}, stats["size"])]),
+        ("deals_api_pool_in_use", "gauge", "Connections checked out", [({}, stats["in_use"])]),
+        ("deals_api_pool_waiting", "gauge", "Checkouts waiting for a connection", [({}, stats["waiting"])]),
+        ("deals_api_pool_acquired_total", "counter", "Connections checked out", [({}, stats["acquired"])]),
+        ("deals_api_pool_timeouts_total", "counter", "Checkouts that timed out", [({}, stats["timeouts"])]),
+        ("deals_api_pool_errors_total", "counter", "Checkouts that failed to connect", [({}, stats["errors"])]),
+        (
+            "deals_api_pool_wait_seconds_total", "counter", "Time spent waiting for a connection",
+            [({}, stats["wait_seconds"])]
+        ),
+        (
+            "deals_api_pool_max_wait_seconds", "gauge", "Longest wait for a connection",
+            [({}, stats["max_wait_seconds"])]
+        ),
+    ]
+
+
+def render(families: Iterable[Family] = ()) -> bytes:
+    """Exposition text of the recorded metrics followed by `families`"""
+    lines: List[str] = []
+    for metric in _METRICS:
+        lines.extend(metric.expose())
+    for name, kind, help, samples in families:
+        lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            lines.append(f"{name}{_labels(tuple(labels), tuple(labels.values()))} {_number(value)}")
+    return ("\n".join(lines) + "\n").encode("utf-8")
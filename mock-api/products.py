@@ -1,81 +1,157 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, g, jsonify, request
 from flask_cors import CORS
-import json
-import os
 import mysql.connector
-from mysql.connector import pooling
-import hashlib
-from datetime import datetime
-from dotenv import load_dotenv
-
-# Load .env from parent directory
-load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'))
-
-app = Flask(__name__)
-CORS(app)  # Enable CORS for all routes
-
-PRODUCTS_JSON_PATH = os.path.join(
-    os.path.dirname(__file__), 
-    '..', 
-    'pricing-engine', 
-    'products.json'
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import closing
+from functools import partial
+from window_engine import WindowEngine
+from db_pool import RETRY_AFTER, ConnectionPool, PoolTimeout, PoolUnavailable
+from response_cache import make_etag
+from responses import json_response
+import metrics
+from deals import (
+    BENCHMARK_SOURCE, DEALS_STREAM_CONCURRENCY, NDJSON_MIMETYPE, PRODUCTS_JSON_PATH, SSE_MIMETYPE,
+    TRIM_PCT, WINDOW_DAYS, ListingRequest, api_query_ids_for, batch_body, batch_plan, batch_queries,
+    cache_batch_bodies, cache_deals_body, cached_bodies, config_error, db_config, deals_cache,
+    deals_plan, load_catalog, run_plan, run_version, stream_event, stream_queries, stream_split,
+    stream_targets, summary_event, valid_identifier, wants_sse
 )
 
-db_config = {
-    "host": os.environ.get("MYSQL_HOST", "localhost"),
-    "port": int(os.environ.get("MYSQL_PORT", 3306)),
-    "user": os.environ.get("MYSQL_USER", "root"),
-    "password": os.environ.get("MYSQL_PASSWORD", ""),
-    "database": os.environ.get("MYSQL_DATABASE", ""),
-}
+app = Flask(__name__)
+# Enable CORS for all routes; the client reads ETags and honours Retry-After
+CORS(app, expose_headers=["ETag", "Server-Timing", "Retry-After"])
 
 try:
-    connection_pool = pooling.MySQLConnectionPool(
-        pool_name="mypool",
-        pool_size=16,
-        pool_reset_session=True,
-        **db_config
-    )
+    connection_pool = ConnectionPool(db_config)
     print("Connection pool created successfully")
 
 except mysql.connector.Error as e:
     print(f"Error creating connection pool: {e}")
     connection_pool = None
 
+def db_connection():
+    """Context manager checking out a pooled connection; raises PoolTimeout or PoolUnavailable"""
+    if connection_pool is None:
+        raise PoolUnavailable("No connection pool")
+    return connection_pool.connection()
+
 def get_db_connection():
-    """Get a connection from the pool"""
+    """Get a connection from the pool, or None"""
     if connection_pool:
         try:
             return connection_pool.get_connection()
-        except mysql.connector.Error as e:
+        except (PoolTimeout, PoolUnavailable) as e:
             print(f"Error getting connection from pool: {e}")
             return None
     return None
 
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request(response):
+    """Count the request for /metrics once its last byte is sent (streamed bodies included)"""
+    start = g.get('request_start')
+    if start is not None:
+        method = request.method
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        status = response.status_code
+        response.call_on_close(
+            lambda: metrics.observe_request(method, route, status, time.perf_counter() - start)
+        )
+    return response
+
+def fetchall(cursor, step):
+    """Run a plan's statement (see deals.Fetch) and fetch (columns, rows), timed for /metrics"""
+    start = time.perf_counter()
+    cursor.execute(step.sql, step.params)
+    rows = cursor.fetchall()
+    metrics.observe_sql(step.statement, time.perf_counter() - start, len(rows))
+    return [desc[0] for desc in cursor.description or ()], rows
+
+def pool_busy_response():
+    """503 telling the client when to retry, for when no pooled connection freed up in time"""
+    return jsonify({"error": "Database is busy, please retry"}), 503, {"Retry-After": str(RETRY_AFTER)}
+
+window_engine = None
+if connection_pool and BENCHMARK_SOURCE == "engine":
+    _engine_table = os.environ.get("MYSQL_TABLE", "")
+    if valid_identifier(_engine_table):
+        window_engine = WindowEngine(
+            get_db_connection,
+            _engine_table,
+            WINDOW_DAYS,
+            TRIM_PCT,
+            poll_interval=float(os.environ.get("WINDOW_ENGINE_POLL_SECONDS", 30)),
+        )
+        window_engine.start()
+
+def query_deals(cursor, plan):
+    """Run a deals.py plan on a pooled connection's cursor"""
+    return run_plan(plan, partial(fetchall, cursor))
+
+def deals_response(body, version, cache_status, timings=None):
+    """Send a deals body with an ETag tied to the run version (304 if the client has it)"""
+    return json_response(body, etag=make_etag(version, body), timings=timings, headers={'X-Cache': cache_status})
+
 @app.route('/products', methods=['GET'])
 def get_products():
     """
-    GET endpoint that returns products with only name and category fields.
-    """
-    with open(PRODUCTS_JSON_PATH, 'r') as f:
-        data = json.load(f)
+    GET endpoint that returns products with only name, category and query
+    fields, optionally only those of ?category=<name>.
     
-    products = data.get('products', [])
-    filtered_products = []
-    for product in products:
-        filtered_products.append({
-            "name": product.get("name"),
-            "category": product.get("category"),
-            "query": product.get("query"),
-        })
+    The body is serialized once per change of products.json (see
+    pricing-engine/catalog.py) and carries ETag / Last-Modified, so
+    conditional requests get 304.
+    """
+    try:
+        catalog = load_catalog(PRODUCTS_JSON_PATH)
+    except (OSError, ValueError) as e:
+        return jsonify({"error": f"Failed to load products: {str(e)}"}), 500
     
-    return jsonify(filtered_products)
+    body, etag = catalog.body(request.args.get('category'))
+    return json_response(body, etag=etag, last_modified=catalog.last_modified)
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    GET endpoint with request, SQL, cache and pool metrics in the Prometheus
+    text exposition format (see metrics.py).
+    """
+    stats = connection_pool.stats.snapshot() if connection_pool is not None else None
+    body = metrics.render(metrics.cache_families(deals_cache) + metrics.pool_families(stats))
+    return Response(body, content_type=metrics.CONTENT_TYPE)
+
+@app.route('/pool', methods=['GET'])
+def get_pool_stats():
+    """
+    GET endpoint with the connection pool's counters (see db_pool.PoolStats):
+    size, in_use, waiting, acquired, timeouts, errors, wait_seconds (total
+    time spent waiting for a connection) and max_wait_seconds.
+    """
+    if connection_pool is None:
+        return jsonify({"error": "No connection pool"}), 500
+    return jsonify(connection_pool.stats.snapshot())
 
 @app.route('/deals', methods=['POST'])
 def get_deals():
     """
     POST endpoint that returns deals filtered by search term.
     
+    Request:
+    {
+        "query": <query text>,
+        "fields": [<listing field>, ...],   optional, default all (deals.LISTING_FIELDS)
+        "page_size": <1..DEALS_PAGE_MAX>,   optional, default 15
+        "cursor": <next_cursor of the previous page>   optional
+    }
+    Only the requested fields are selected in SQL. Listings come cheapest
+    first, ordered by (price, id), and each page after the first is read
+    from the previous page's next_cursor.
+    
     Response schema:
     {
         "benchmark": {
@@ -86,164 +162,212 @@ def get_deals():
             "window_days": 7,
             "computed_at": <ISO timestamp>
         },
-        "listings": [<listing objects>]
+        "listings": [<listing objects>],
+        "next_cursor": <cursor of the next page, null on the last one>
     }
-    """
     
-    # Get connection from pool
-    conn = get_db_connection()
-    
-    if not conn:
-        return jsonify({"error": "Failed to connect to database"}), 500
-    
-    cursor = conn.cursor()
+    Responses are cached per query until the next ingestion run (see
+    response_cache.py) and carry an ETag; a request whose If-None-Match
+    matches gets 304 with no body.
+    """
     
+    # Whitelist validation - table names can't be parameterized
+    error = config_error()
+    if error:
+        return jsonify({"error": error}), 500
     table_name = os.environ.get("MYSQL_TABLE", "")
     
-    # Validate table name (whitelist approach - table names can't be parameterized)
-    # Only allow alphanumeric characters and underscores
-    if not table_name or not table_name.replace('_', '').isalnum():
-        return jsonify({"error": "Invalid table name"}), 500
-    
     data = request.get_json()
     api_query_text = data.get('query')
     
     if not api_query_text:
         return jsonify({"error": "API query text is required"}), 400
     
-    api_query_id = hashlib.sha256(api_query_text.encode("utf-8")).hexdigest()
-    
-    # Configuration for benchmark computation
-    WINDOW_DAYS = 7
-    TRIM_PCT = 15  # Percentage trimmed from bottom tail
-
-    # Query to get the trimmed median benchmark value
-    benchmark_query = f"""
-    WITH ranked_prices AS (
-      SELECT 
-        price,
-        PERCENT_RANK() OVER (ORDER BY price) as price_percentile
-      FROM {table_name}
-      WHERE fetched_at >= DATE_SUB(NOW(), INTERVAL {WINDOW_DAYS} DAY)
-        AND api_query_id = %s
-    ),
-    trimmed_prices AS (
-      SELECT price
-      FROM ranked_prices
-      WHERE price_percentile > {TRIM_PCT / 100}
-    )
-    SELECT AVG(price) as trimmed_median
-    FROM (
-      SELECT 
-        price,
-        ROW_NUMBER() OVER (ORDER BY price) as row_num,
-        COUNT(*) OVER () as total_count
-      FROM trimmed_prices
-    ) ranked
-    WHERE row_num IN (FLOOR((total_count + 1) / 2), CEIL((total_count + 1) / 2))
-    """
+    try:
+        listing = ListingRequest.parse(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    api_query_id = api_query_ids_for([api_query_text])[api_query_text]
+    
+    version = run_version.current()
+    cached = deals_cache.get(listing.cache_key(api_query_id), version)
+    if cached is not None:
+        return deals_response(cached, version, "HIT")
+    
+    # Hold a pooled connection only for the queries
+    db_start = time.perf_counter()
+    try:
+        with db_connection() as conn, closing(conn.cursor()) as cursor:
+            page = query_deals(cursor, deals_plan(table_name, api_query_id, listing, window_engine))
+    except PoolTimeout:
+        return pool_busy_response()
+    except PoolUnavailable:
+        return jsonify({"error": "Failed to connect to database"}), 500
+    except mysql.connector.Error as e:
+        return jsonify({"error": f"Database query failed: {str(e)}"}), 500
+    db_sec = time.perf_counter() - db_start
+    
+    # Build response with benchmark and listings
+    serialize_start = time.perf_counter()
+    body = cache_deals_body(api_query_id, listing, version, page)
+    serialize_sec = time.perf_counter() - serialize_start
+    
+    return deals_response(body, version, "MISS", {"db": db_sec, "serialize": serialize_sec})
 
-    # Query to get the deals/listings
-    deals_query = f"""
-    WITH ranked_prices AS (
-      SELECT 
-        *,
-        PERCENT_RANK() OVER (PARTITION BY api_query_id ORDER BY price) as price_percentile
-      FROM {table_name}
-      WHERE fetched_at >= DATE_SUB(NOW(), INTERVAL {WINDOW_DAYS} DAY)
-    ),
-    trimmed_prices AS (
-      SELECT *
-      FROM ranked_prices
-      WHERE price_percentile > {TRIM_PCT / 100}
-    ),
-    trimmed_medians AS (
-      SELECT 
-        api_query_id,
-        AVG(price) as trimmed_median
-      FROM (
-        SELECT 
-          api_query_id,
-          price,
-          ROW_NUMBER() OVER (PARTITION BY api_query_id ORDER BY price) as row_num,
-          COUNT(*) OVER (PARTITION BY api_query_id) as total_count
-        FROM trimmed_prices
-      ) ranked
-      WHERE row_num IN (FLOOR((total_count + 1) / 2), CEIL((total_count + 1) / 2))
-      GROUP BY api_query_id
-    ),
-    filtered_deals AS (
-      SELECT e.*
-      FROM {table_name} e
-      INNER JOIN trimmed_medians m ON e.api_query_id = m.api_query_id
-      WHERE e.price < 0.80 * m.trimmed_median
-        AND e.price > 0.35 * m.trimmed_median
-        AND e.fetched_at >= DATE_SUB(NOW(), INTERVAL {WINDOW_DAYS} DAY)
-        AND e.api_query_id = %s
-    ),
-    deduplicated_deals AS (
-      SELECT 
-        *,
-        ROW_NUMBER() OVER (PARTITION BY listing_url ORDER BY price ASC, fetched_at DESC) as rn
-      FROM filtered_deals
-    )
-    SELECT *
-    FROM deduplicated_deals
-    WHERE rn = 1
-    ORDER BY price ASC
-    LIMIT 15
+@app.route('/deals/batch', methods=['POST'])
+def get_deals_batch():
+    """
+    POST endpoint that serves /deals for many queries in one request.
+    
+    Request: {"queries": [<query text>, ...], "fields": [...], "page_size": n}
+    with fields and page_size as for /deals, applied to every query.
+    
+    Benchmarks for every query are read in one lookup (and any missing ones
+    computed in one partitioned pass), then the deals of all queries come
+    from a single scan partitioned by api_query_id.
+    
+    Response schema:
+    {
+        "results": [
+            {"query": <query text>, "benchmark": {...}, "listings": [...], "next_cursor": ...},
+            ...
+        ]
+    }
+    with one entry per requested query, in request order, each shaped like
+    the first page of its /deals response (next_cursor included). Queries
+    share the /deals response cache, so only the ones not cached for the
+    current run version touch the database.
     """
+    # Same whitelist validation as /deals
+    error = config_error()
+    if error:
+        return jsonify({"error": error}), 500
+    table_name = os.environ.get("MYSQL_TABLE", "")
     
+    data = request.get_json(silent=True) or {}
     try:
-        # Get benchmark value
-        cursor.execute(benchmark_query, (api_query_id,))
-        benchmark_result = cursor.fetchone()
-        benchmark_value = float(benchmark_result[0]) if benchmark_result and benchmark_result[0] else None
-        
-        # Get listings
-        cursor.execute(deals_query, (api_query_id,))
-        results = cursor.fetchall()
-        
-        columns = [desc[0] for desc in cursor.description]
-        
-        listings = []
-        for row in results:
-            listing = dict(zip(columns, row))
-            listings.append(listing)
-        
-        for listing in listings:
-            listing.pop('api_query_id', None) 
-            listing.pop('ebay_item_id', None)
-            listing.pop('rn', None)
-            listing.pop('price_percentile', None)
-            
-            # Compute discount percentage from category median
-            if benchmark_value and listing.get('price'):
-                listing['discount_pct'] = round((1 - float(listing['price']) / benchmark_value) * 100, 1)
-            else:
-                listing['discount_pct'] = None
-        
-        # Build response with benchmark and listings
-        response = {
-            "benchmark": {
-                "value": benchmark_value,
-                "currency": "USD",
-                "median_type": "trimmed_median",
-                "trim_pct": TRIM_PCT,
-                "window_days": WINDOW_DAYS,
-                "computed_at": datetime.utcnow().isoformat() + "Z"
-            },
-            "listings": listings
-        }
-        
-        return jsonify(response)
+        queries = batch_queries(data)
+        listing = ListingRequest.parse(data, allow_cursor=False)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    ids_by_query = api_query_ids_for(queries)
+    
+    # api_query_id -> serialized /deals body
+    version = run_version.current()
+    bodies = cached_bodies(ids_by_query.values(), listing, version)
     
+    def batch_response(cache_status, timings=None):
+        return deals_response(batch_body(queries, ids_by_query, bodies), version, cache_status, timings)
+    
+    api_query_ids = [i for i in dict.fromkeys(ids_by_query.values()) if i not in bodies]
+    if not api_query_ids:
+        return batch_response("HIT")
+    
+    db_start = time.perf_counter()
+    try:
+        with db_connection() as conn, closing(conn.cursor()) as cursor:
+            batch = query_deals(cursor, batch_plan(table_name, api_query_ids, listing, window_engine))
+    except PoolTimeout:
+        return pool_busy_response()
+    except PoolUnavailable:
+        return jsonify({"error": "Failed to connect to database"}), 500
     except mysql.connector.Error as e:
         return jsonify({"error": f"Database query failed: {str(e)}"}), 500
+    db_sec = time.perf_counter() - db_start
+    
+    serialize_start = time.perf_counter()
+    cache_batch_bodies(bodies, api_query_ids, listing, version, batch)
+    serialize_sec = time.perf_counter() - serialize_start
     
-    finally:
-        cursor.close()
-        conn.close()
+    return batch_response("MISS", {"db": db_sec, "serialize": serialize_sec})
+
+def compute_deals_body(table_name, api_query_id, listing, version):
+    """
+    (body, error) of one /deals/stream query, computed on its own pooled
+    connection and cached like a /deals response.
+    """
+    try:
+        with db_connection() as conn, closing(conn.cursor()) as cursor:
+            page = query_deals(cursor, deals_plan(table_name, api_query_id, listing, window_engine))
+    except PoolTimeout as e:
+        return None, f"Database is busy: {str(e)}"
+    except PoolUnavailable:
+        return None, "Failed to connect to database"
+    except mysql.connector.Error as e:
+        return None, f"Database query failed: {str(e)}"
+    
+    return cache_deals_body(api_query_id, listing, version, page), None
+
+@app.route('/deals/stream', methods=['POST'])
+def stream_deals():
+    """
+    POST endpoint that streams /deals results for many products, each as
+    soon as it is ready.
+    
+    Request: {"queries": [<query text>, ...], "fields": [...], "page_size": n}
+    with every field optional: queries defaults to all catalog products,
+    fields and page_size are as for /deals.
+    
+    The response is NDJSON, or Server-Sent Events when the client accepts
+    text/event-stream, with one event per line / SSE event:
+        {"type": "result", "name": ..., "query": ..., "benchmark": {...}, "listings": [...], "next_cursor": ...}
+        {"type": "error", "name": ..., "query": ..., "error": <message>}
+    in completion order: cached queries first, then the others as they
+    finish, DEALS_STREAM_CONCURRENCY at a time. The last event is
+        {"type": "summary", "total": <queries>, "errors": ["<name>: <message>", ...]}
+    with errors shaped like the client's fetchDealsForProducts errors.
+    """
+    # Same whitelist validation as /deals
+    error = config_error()
+    if error:
+        return jsonify({"error": error}), 500
+    table_name = os.environ.get("MYSQL_TABLE", "")
+    
+    data = request.get_json(silent=True) or {}
+    try:
+        listing = ListingRequest.parse(data, allow_cursor=False)
+        queries = stream_queries(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    try:
+        catalog = load_catalog(PRODUCTS_JSON_PATH)
+    except (OSError, ValueError) as e:
+        if queries is None:
+            return jsonify({"error": f"Failed to load products: {str(e)}"}), 500
+        catalog = None
+    
+    targets = stream_targets(queries, catalog)
+    sse = wants_sse(request.headers.get('Accept'))
+    version = run_version.current()
+    
+    def generate():
+        errors = []
+        cached_events, pending = stream_split(targets, listing, version, sse)
+        yield from cached_events
+        
+        executor = ThreadPoolExecutor(max_workers=DEALS_STREAM_CONCURRENCY)
+        try:
+            futures = {
+                executor.submit(compute_deals_body, table_name, api_query_id, listing, version): (name, query)
+                for name, query, api_query_id in pending
+            }
+            for future in as_completed(futures):
+                name, query = futures[future]
+                body, error = future.result()
+                yield stream_event(name, query, body, error, errors, sse)
+            yield summary_event(len(targets), errors, sse)
+        finally:
+            # Also reached when the client disconnects mid-stream
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    return Response(
+        generate(),
+        mimetype=SSE_MIMETYPE if sse else NDJSON_MIMETYPE,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
\ No newline at end of file
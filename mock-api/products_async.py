@@ -0,0 +1,383 @@
+"""
+ASGI serving mode: the routes and response schemas of products.py, served
+by Starlette from an aiomysql pool. A request waiting on MySQL only holds a
+pool connection, not a worker thread, so a few worker processes keep many
+/deals queries in flight.
+
+    uvicorn products_async:app --port 5000 --workers 2
+
+Each worker opens at most MYSQL_ASYNC_POOL_SIZE connections (default 32).
+As in the Flask app (see db_pool.py), a request waits at most
+MYSQL_POOL_ACQUIRE_TIMEOUT seconds for one and then gets 503 + Retry-After.
+Queries, caching, ETags and compression are shared with the Flask app
+through deals.py and responses.py; see benchmarks/bench_serving.py for a
+side-by-side throughput comparison.
+"""
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from functools import partial
+
+import aiomysql
+import mysql.connector
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Match, Route
+
+from window_engine import WindowEngine
+from db_pool import ACQUIRE_TIMEOUT, RETRY_AFTER, PoolStats, PoolTimeout, PoolUnavailable
+from response_cache import make_etag
+from responses import render
+import metrics
+from deals import (
+    BENCHMARK_SOURCE, DEALS_STREAM_CONCURRENCY, NDJSON_MIMETYPE, PRODUCTS_JSON_PATH, SSE_MIMETYPE,
+    TRIM_PCT, WINDOW_DAYS, ListingRequest, api_query_ids_for, batch_body, batch_plan, batch_queries,
+    cache_batch_bodies, cache_deals_body, cached_bodies, config_error, db_config, deals_cache,
+    deals_plan, load_catalog, run_plan_async, run_version, stream_event, stream_queries, stream_split,
+    stream_targets, summary_event, valid_identifier, wants_sse
+)
+
+POOL_SIZE = int(os.environ.get("MYSQL_ASYNC_POOL_SIZE", 32))
+
+connection_pool = None
+pool_stats = PoolStats(POOL_SIZE)
+window_engine = None
+
+@asynccontextmanager
+async def lifespan(app):
+    global connection_pool, window_engine
+    try:
+        connection_pool = await aiomysql.create_pool(
+            minsize=1,
+            maxsize=POOL_SIZE,
+            host=db_config["host"],
+            port=db_config["port"],
+            user=db_config["user"],
+            password=db_config["password"],
+            db=db_config["database"],
+            # Every query sees the latest committed ingestion run
+            autocommit=True,
+        )
+        print("Connection pool created successfully")
+    except (aiomysql.Error, OSError) as e:
+        print(f"Error creating connection pool: {e}")
+        connection_pool = None
+
+    if connection_pool and BENCHMARK_SOURCE == "engine":
+        _engine_table = os.environ.get("MYSQL_TABLE", "")
+        if valid_identifier(_engine_table):
+            # The engine polls from its own thread, so it keeps a blocking driver
+            window_engine = WindowEngine(
+                lambda: mysql.connector.connect(**db_config),
+                _engine_table,
+                WINDOW_DAYS,
+                TRIM_PCT,
+                poll_interval=float(os.environ.get("WINDOW_ENGINE_POLL_SECONDS", 30)),
+            )
+            # Seeding reads the whole window, so it runs off the event loop
+            await asyncio.to_thread(window_engine.start)
+
+    yield
+
+    if connection_pool:
+        connection_pool.close()
+        await connection_pool.wait_closed()
+
+def error_response(message, status):
+    return JSONResponse({"error": message}, status_code=status)
+
+def json_response(request, body, etag=None, last_modified=None, timings=None, headers=None):
+    status, body, response_headers = render(
+        body, request.headers, request.method, etag, last_modified, timings, headers, route=request.url.path
+    )
+    return Response(body, status_code=status, headers=response_headers)
+
+def deals_response(request, body, version, cache_status, timings=None):
+    """Send a deals body with an ETag tied to the run version (304 if the client has it)"""
+    return json_response(
+        request, body, etag=make_etag(version, body), timings=timings, headers={'X-Cache': cache_status}
+    )
+
+async def request_json(request):
+    try:
+        data = await request.json()
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+def pool_busy_response():
+    return JSONResponse(
+        {"error": "Database is busy, please retry"}, status_code=503, headers={"Retry-After": str(RETRY_AFTER)}
+    )
+
+@asynccontextmanager
+async def db_connection():
+    """Check out a pooled connection for the block; raises PoolTimeout or PoolUnavailable"""
+    if connection_pool is None:
+        raise PoolUnavailable("No connection pool")
+    started = pool_stats.wait_started()
+    try:
+        conn = await asyncio.wait_for(connection_pool.acquire(), ACQUIRE_TIMEOUT)
+    except asyncio.TimeoutError:
+        pool_stats.timed_out(started)
+        raise PoolTimeout(f"No database connection free within {ACQUIRE_TIMEOUT:g}s") from None
+    except (aiomysql.Error, OSError) as e:
+        pool_stats.failed(started)
+        print(f"Error getting connection from pool: {e}")
+        raise PoolUnavailable(str(e)) from e
+    pool_stats.checked_out(started)
+    try:
+        yield conn
+    finally:
+        connection_pool.release(conn)
+        pool_stats.checked_in()
+
+async def fetchall(cursor, step):
+    """fetchall of products.py on an aiomysql cursor."""
+    start = time.perf_counter()
+    await cursor.execute(step.sql, step.params)
+    rows = await cursor.fetchall()
+    metrics.observe_sql(step.statement, time.perf_counter() - start, len(rows))
+    return [desc[0] for desc in cursor.description or ()], rows
+
+async def query_deals(cursor, plan):
+    """Run a deals.py plan on a pooled connection's aiomysql cursor"""
+    return await run_plan_async(plan, partial(fetchall, cursor))
+
+async def get_products(request):
+    """GET /products, as in products.py."""
+    try:
+        catalog = load_catalog(PRODUCTS_JSON_PATH)
+    except (OSError, ValueError) as e:
+        return error_response(f"Failed to load products: {str(e)}", 500)
+
+    body, etag = catalog.body(request.query_params.get('category'))
+    return json_response(request, body, etag=etag, last_modified=catalog.last_modified)
+
+async def get_metrics(request):
+    """GET /metrics, as in products.py (for this worker)."""
+    stats = pool_stats.snapshot() if connection_pool is not None else None
+    body = metrics.render(metrics.cache_families(deals_cache) + metrics.pool_families(stats))
+    return Response(body, headers={"Content-Type": metrics.CONTENT_TYPE})
+
+async def get_pool_stats(request):
+    """GET /pool, as in products.py (for this worker's aiomysql pool)."""
+    if connection_pool is None:
+        return error_response("No connection pool", 500)
+    return JSONResponse(pool_stats.snapshot())
+
+async def get_deals(request):
+    """POST /deals, as in products.py."""
+    error = config_error()
+    if error:
+        return error_response(error, 500)
+    table_name = os.environ.get("MYSQL_TABLE", "")
+
+    data = await request_json(request)
+    api_query_text = data.get('query')
+
+    if not api_query_text:
+        return error_response("API query text is required", 400)
+
+    try:
+        listing = ListingRequest.parse(data)
+    except ValueError as e:
+        return error_response(str(e), 400)
+
+    api_query_id = api_query_ids_for([api_query_text])[api_query_text]
+
+    version = run_version.current()
+    cached = deals_cache.get(listing.cache_key(api_query_id), version)
+    if cached is not None:
+        return deals_response(request, cached, version, "HIT")
+
+    db_start = time.perf_counter()
+    try:
+        async with db_connection() as conn, conn.cursor() as cursor:
+            page = await query_deals(cursor, deals_plan(table_name, api_query_id, listing, window_engine))
+    except PoolTimeout:
+        return pool_busy_response()
+    except PoolUnavailable:
+        return error_response("Failed to connect to database", 500)
+    except aiomysql.Error as e:
+        return error_response(f"Database query failed: {str(e)}", 500)
+    db_sec = time.perf_counter() - db_start
+
+    serialize_start = time.perf_counter()
+    body = cache_deals_body(api_query_id, listing, version, page)
+    serialize_sec = time.perf_counter() - serialize_start
+
+    return deals_response(request, body, version, "MISS", {"db": db_sec, "serialize": serialize_sec})
+
+async def get_deals_batch(request):
+    """POST /deals/batch, as in products.py."""
+    error = config_error()
+    if error:
+        return error_response(error, 500)
+    table_name = os.environ.get("MYSQL_TABLE", "")
+
+    data = await request_json(request)
+    try:
+        queries = batch_queries(data)
+        listing = ListingRequest.parse(data, allow_cursor=False)
+    except ValueError as e:
+        return error_response(str(e), 400)
+
+    ids_by_query = api_query_ids_for(queries)
+
+    # api_query_id -> serialized /deals body
+    version = run_version.current()
+    bodies = cached_bodies(ids_by_query.values(), listing, version)
+
+    def batch_response(cache_status, timings=None):
+        return deals_response(request, batch_body(queries, ids_by_query, bodies), version, cache_status, timings)
+
+    api_query_ids = [i for i in dict.fromkeys(ids_by_query.values()) if i not in bodies]
+    if not api_query_ids:
+        return batch_response("HIT")
+
+    db_start = time.perf_counter()
+    try:
+        async with db_connection() as conn, conn.cursor() as cursor:
+            batch = await query_deals(cursor, batch_plan(table_name, api_query_ids, listing, window_engine))
+    except PoolTimeout:
+        return pool_busy_response()
+    except PoolUnavailable:
+        return error_response("Failed to connect to database", 500)
+    except aiomysql.Error as e:
+        return error_response(f"Database query failed: {str(e)}", 500)
+    db_sec = time.perf_counter() - db_start
+
+    serialize_start = time.perf_counter()
+    cache_batch_bodies(bodies, api_query_ids, listing, version, batch)
+    serialize_sec = time.perf_counter() - serialize_start
+
+    return batch_response("MISS", {"db": db_sec, "serialize": serialize_sec})
+
+async def compute_deals_body(table_name, api_query_id, listing, version):
+    """compute_deals_body of products.py: (body, error) of one stream query."""
+    try:
+        async with db_connection() as conn, conn.cursor() as cursor:
+            page = await query_deals(cursor, deals_plan(table_name, api_query_id, listing, window_engine))
+    except PoolTimeout as e:
+        return None, f"Database is busy: {str(e)}"
+    except PoolUnavailable:
+        return None, "Failed to connect to database"
+    except aiomysql.Error as e:
+        return None, f"Database query failed: {str(e)}"
+
+    return cache_deals_body(api_query_id, listing, version, page), None
+
+async def stream_deals(request):
+    """POST /deals/stream, as in products.py."""
+    error = config_error()
+    if error:
+        return error_response(error, 500)
+    table_name = os.environ.get("MYSQL_TABLE", "")
+
+    data = await request_json(request)
+    try:
+        listing = ListingRequest.parse(data, allow_cursor=False)
+        queries = stream_queries(data)
+    except ValueError as e:
+        return error_response(str(e), 400)
+
+    try:
+        catalog = load_catalog(PRODUCTS_JSON_PATH)
+    except (OSError, ValueError) as e:
+        if queries is None:
+            return error_response(f"Failed to load products: {str(e)}", 500)
+        catalog = None
+
+    targets = stream_targets(queries, catalog)
+    sse = wants_sse(request.headers.get('Accept'))
+    version = run_version.current()
+
+    async def generate():
+        errors = []
+        cached_events, pending = stream_split(targets, listing, version, sse)
+        for event in cached_events:
+            yield event
+
+        limit = asyncio.Semaphore(DEALS_STREAM_CONCURRENCY)
+
+        async def compute(name, query, api_query_id):
+            async with limit:
+                body, error = await compute_deals_body(table_name, api_query_id, listing, version)
+            return name, query, body, error
+
+        tasks = [asyncio.ensure_future(compute(*target)) for target in pending]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                name, query, body, error = await next_done
+                yield stream_event(name, query, body, error, errors, sse)
+            yield summary_event(len(targets), errors, sse)
+        finally:
+            # Also reached when the client disconnects mid-stream
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(
+        generate(),
+        media_type=SSE_MIMETYPE if sse else NDJSON_MIMETYPE,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+class RequestMetrics:
+    """ASGI middleware recording each HTTP request for /metrics once its last byte is sent"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_and_record(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_record)
+        finally:
+            metrics.observe_request(scope["method"], route_of(scope), status[0], time.perf_counter() - start)
+
+def route_of(scope):
+    """Path template of the route matching `scope`, as Flask's url_rule.rule"""
+    for route in app.routes:
+        if route.matches(scope)[0] == Match.FULL:
+            return route.path
+    return "unmatched"
+
+app = Starlette(
+    routes=[
+        Route('/products', get_products, methods=['GET']),
+        Route('/metrics', get_metrics, methods=['GET']),
+        Route('/pool', get_pool_stats, methods=['GET']),
+        Route('/deals', get_deals, methods=['POST']),
+        Route('/deals/batch', get_deals_batch, methods=['POST']),
+        Route('/deals/stream', stream_deals, methods=['POST']),
+    ],
+    middleware=[
+        Middleware(RequestMetrics),
+        # Same CORS policy as the Flask app; the client reads ETags
+        Middleware(
+            CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"],
+            expose_headers=["ETag", "Server-Timing", "Retry-After"]
+        ),
+    ],
+    lifespan=lifespan,
+)
+
+if __name__ == '__main__':
+    import uvicorn
+
+    uvicorn.run(app, port=5000)
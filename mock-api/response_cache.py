@@ -0,0 +1,103 @@
+"""
+Response cache for /deals, invalidated by ingestion runs.
+
+/deals results only change when the pricing engine (or spool_loader.py)
+commits a run, and each of those rewrites a run-version marker file (see
+bump_run_version in pricing-engine/listings_db.py). Serialized /deals
+bodies are stored per api_query_id together with the version they were built
+under, so a new version makes every entry stale without a flush; a TTL bounds
+how long an entry lives anyway (the window keeps sliding between runs), and
+the cache holds at most max_entries, evicting the least recently used.
+
+Without a marker file the version is None and entries expire by TTL only.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+
+class RunVersion:
+    """Current token in the run-version marker, re-read only when the file changes."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._stat: Optional[Tuple[int, int]] = None
+        self._version: Optional[str] = None
+
+    def current(self) -> Optional[str]:
+        if not self.path:
+            return None
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        key = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            if key != self._stat:
+                try:
+                    with open(self.path, "r") as f:
+                        self._version = f.read().strip() or None
+                except OSError:
+                    return None
+                self._stat = key
+            return self._version
+
+
+def make_etag(version: Optional[str], body: bytes) -> Optional[str]:
+    """Entity tag for a response body served under `version` (None without a version)."""
+    if version is None:
+        return None
+    digest = hashlib.sha256(version.encode("utf-8") + b"\0" + body)
+    return digest.hexdigest()[:32]
+
+
+class DealsCache:
+    """Thread-safe LRU of api_query_id -> response body, with a TTL and a run version."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # api_query_id -> (version, expires_at, body)
+        self._entries: "OrderedDict[str, Tuple[Optional[str], float, bytes]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl > 0
+
+    def get(self, key: str, version: Optional[str]) -> Optional[bytes]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            entry_version, expires_at, body = entry
+            if entry_version != version or expires_at <= time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, key: str, version: Optional[str], body: bytes) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (version, time.monotonic() + self.ttl, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
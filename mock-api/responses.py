@@ -0,0 +1,190 @@
+"""
+JSON response layer for the API routes.
+
+Bodies are built as bytes instead of going through jsonify: query rows are
+serialized straight from cursor tuples by encode_rows (no per-row dict), and
+other values by dumps, which uses orjson when it is installed. Both keep
+Flask's conventions for the types MySQL returns: Decimal as a string and
+datetime/date as an HTTP date.
+
+render negotiates br (when the brotli package is installed) or gzip from
+Accept-Encoding for bodies of at least RESPONSE_COMPRESS_MIN_BYTES, answers
+If-None-Match / If-Modified-Since with 304, and reports where the time went
+in a Server-Timing header (db, serialize, compress), also recorded per
+route for /metrics. It only needs the request headers, so the Flask app
+(json_response) and the ASGI app (products_async.py) share it.
+"""
+import gzip
+import json
+import os
+import time
+from datetime import date
+from decimal import Decimal
+from json.encoder import encode_basestring_ascii
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from flask import Response, request
+from werkzeug.http import http_date, parse_accept_header, parse_date, parse_etags, quote_etag
+
+import metrics
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to the json module
+    orjson = None
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.environ.get("RESPONSE_COMPRESS_MIN_BYTES", 1024))
+GZIP_LEVEL = int(os.environ.get("RESPONSE_GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(os.environ.get("RESPONSE_BROTLI_QUALITY", 5))
+
+# Suffix that keeps ETags distinct per content coding
+ENCODING_ETAG_SUFFIX = {"br": "-br", "gzip": "-gz"}
+
+
+def _default(o: Any) -> Any:
+    if isinstance(o, date):
+        return http_date(o)
+    if isinstance(o, Decimal):
+        return str(o)
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+else:
+    def dumps(obj: Any) -> bytes:
+        return json.dumps(obj, default=_default, separators=(",", ":")).encode("utf-8")
+
+
+def _encode_value(v: Any) -> str:
+    t = type(v)
+    if t is str:
+        return encode_basestring_ascii(v)
+    if v is None:
+        return "null"
+    if t is Decimal:
+        return '"' + str(v) + '"'
+    if t is int:
+        return int.__repr__(v)
+    if t is float:
+        return json.dumps(v)
+    return dumps(v).decode("utf-8")
+
+
+def encode_rows(
+    columns: Sequence[str],
+    rows: Iterable[Sequence[Any]],
+    drop: Iterable[str] = (),
+    extra: Sequence[Tuple[str, Callable[[Sequence[Any]], Any]]] = ()
+) -> bytes:
+    """
+    JSON array with one object per row, keyed by `columns`, without the
+    `drop` columns and with an (name, fn(row)) entry for each of `extra`.
+    """
+    drop = set(drop)
+    fields = [
+        (encode_basestring_ascii(name) + ":", i)
+        for i, name in enumerate(columns) if name not in drop
+    ]
+    extra_fields = [(encode_basestring_ascii(name) + ":", fn) for name, fn in extra]
+
+    parts: List[str] = []
+    for row in rows:
+        members = [key + _encode_value(row[i]) for key, i in fields]
+        members.extend(key + _encode_value(fn(row)) for key, fn in extra_fields)
+        parts.append("{" + ",".join(members) + "}")
+    return ("[" + ",".join(parts) + "]").encode("utf-8")
+
+
+def negotiate_encoding(accept_encoding: Optional[str], body_size: int) -> Optional[str]:
+    if body_size < COMPRESS_MIN_BYTES:
+        return None
+    accepted = parse_accept_header(accept_encoding)
+    if brotli is not None and accepted.quality("br") > 0:
+        return "br"
+    if accepted.quality("gzip") > 0:
+        return "gzip"
+    return None
+
+
+def _not_modified(request_headers: Mapping[str, str], method: str, etag: Optional[str], last_modified) -> bool:
+    if_none_match = request_headers.get("If-None-Match")
+    if etag is not None and if_none_match:
+        return parse_etags(if_none_match).contains(etag)
+    if_modified_since = parse_date(request_headers.get("If-Modified-Since"))
+    if last_modified is not None and method in ("GET", "HEAD") and if_modified_since:
+        return last_modified <= if_modified_since
+    return False
+
+
+def render(
+    body: bytes,
+    request_headers: Mapping[str, str],
+    method: str,
+    etag: Optional[str] = None,
+    last_modified=None,
+    timings: Optional[Dict[str, float]] = None,
+    headers: Optional[Dict[str, str]] = None,
+    status: int = 200,
+    route: Optional[str] = None
+) -> Tuple[int, bytes, Dict[str, str]]:
+    """
+    (status, body, headers) for a serialized JSON `body`: conditional on
+    `etag` / `last_modified`, compressed when worthwhile, with Server-Timing
+    built from `timings` (name -> seconds). The timings are recorded as
+    `route`'s stages when given.
+    """
+    timings = dict(timings or {})
+    encoding = negotiate_encoding(request_headers.get("Accept-Encoding"), len(body)) if status == 200 else None
+    if etag is not None and encoding is not None:
+        etag += ENCODING_ETAG_SUFFIX[encoding]
+
+    response_headers = {"Vary": "Accept-Encoding"}
+    if status == 200 and _not_modified(request_headers, method, etag, last_modified):
+        status, body = 304, b""
+    else:
+        if encoding is not None:
+            start = time.perf_counter()
+            if encoding == "br":
+                body = brotli.compress(body, quality=BROTLI_QUALITY)
+            else:
+                body = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+            timings["compress"] = time.perf_counter() - start
+            response_headers["Content-Encoding"] = encoding
+        response_headers["Content-Type"] = "application/json"
+
+    if etag is not None:
+        response_headers["ETag"] = quote_etag(etag)
+    if last_modified is not None:
+        response_headers["Last-Modified"] = http_date(last_modified)
+    response_headers.update(headers or {})
+    if timings:
+        if route is not None:
+            metrics.observe_stages(route, timings)
+        response_headers["Server-Timing"] = ", ".join(
+            f"{name};dur={seconds * 1000:.2f}" for name, seconds in timings.items()
+        )
+    return status, body, response_headers
+
+
+def json_response(
+    body: bytes,
+    etag: Optional[str] = None,
+    last_modified=None,
+    timings: Optional[Dict[str, float]] = None,
+    headers: Optional[Dict[str, str]] = None,
+    status: int = 200
+):
+    """render() for the current Flask request, as a Flask Response."""
+    route = request.url_rule.rule if request.url_rule is not None else None
+    status, body, response_headers = render(
+        body, request.headers, request.method, etag, last_modified, timings, headers, status, route
+    )
+    return Response(body, status=status, headers=response_headers)
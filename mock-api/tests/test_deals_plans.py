@@ -0,0 +1,169 @@
+"""
+The /deals plans of deals.py, run by both drivers (run_plan for the Flask
+app, run_plan_async for the ASGI app) on a scripted fetch: benchmark source
+selection, the SQL fallback, error handling and batch assembly.
+
+    python -m pytest mock-api/tests
+"""
+import asyncio
+import sys
+import threading
+from datetime import datetime
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("dotenv")
+pytest.importorskip("werkzeug")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import deals  # noqa: E402
+from deals import ER_NO_SUCH_TABLE, ListingRequest, batch_plan, deals_plan  # noqa: E402
+
+COMPUTED_AT = datetime(2026, 10, 1, 12, 0, 0)
+
+
+class DriverError(Exception):
+    """A driver error as mysql.connector and aiomysql raise them"""
+
+    def __init__(self, errno, msg):
+        super().__init__(errno, msg)
+        self.errno = errno
+
+
+class FakeEngine:
+    ready = True
+
+    def __init__(self, medians):
+        self.medians = medians
+        self.threads = set()
+
+    def trimmed_median(self, api_query_id):
+        self.threads.add(threading.get_ident())
+        return self.medians.get(api_query_id)
+
+
+class ScriptedFetch:
+    """fetch answering each statement name from `answers` (an exception is raised), recording the calls"""
+
+    def __init__(self, answers):
+        self.answers = answers
+        self.statements = []
+
+    def __call__(self, step):
+        self.statements.append(step.statement)
+        answer = self.answers[step.statement]
+        if isinstance(answer, Exception):
+            raise answer
+        return answer(step.params) if callable(answer) else answer
+
+
+def run_sync(plan, fetch):
+    return deals.run_plan(plan, fetch)
+
+
+def run_async(plan, fetch):
+    async def fetch_async(step):
+        return fetch(step)
+    return asyncio.run(deals.run_plan_async(plan, fetch_async))
+
+
+drivers = pytest.mark.parametrize("run", [run_sync, run_async], ids=["sync", "async"])
+
+DEAL_COLUMNS = ["id", "price"]
+DEALS = (DEAL_COLUMNS, [(1, Decimal("40.00")), (2, Decimal("41.00"))])
+
+
+@pytest.fixture
+def source(monkeypatch):
+    def set_source(name):
+        monkeypatch.setattr(deals, "BENCHMARK_SOURCE", name)
+    return set_source
+
+
+@drivers
+def test_table_source_reads_the_stored_benchmark(run, source):
+    source("table")
+    fetch = ScriptedFetch({
+        "table_benchmark_query": ([], [(Decimal("100.000000"), COMPUTED_AT)]),
+        "deals_query": DEALS,
+    })
+    page = run(deals_plan("listings", "q", ListingRequest()), fetch)
+    assert page == (DEAL_COLUMNS, DEALS[1], 100.0, COMPUTED_AT)
+    assert fetch.statements == ["table_benchmark_query", "deals_query"]
+
+
+@drivers
+@pytest.mark.parametrize("stored", [[], DriverError(ER_NO_SUCH_TABLE, "Table doesn't exist")])
+def test_table_source_falls_back_to_sql(run, source, stored):
+    source("table")
+    fetch = ScriptedFetch({
+        "table_benchmark_query": stored if isinstance(stored, Exception) else ([], stored),
+        "benchmark_query": ([], [(Decimal("90.5"),)]),
+        "deals_query": DEALS,
+    })
+    page = run(deals_plan("listings", "q", ListingRequest()), fetch)
+    assert page == (DEAL_COLUMNS, DEALS[1], 90.5, None)
+    assert fetch.statements == ["table_benchmark_query", "benchmark_query", "deals_query"]
+
+
+@drivers
+def test_other_errors_propagate(run, source):
+    source("table")
+    fetch = ScriptedFetch({"table_benchmark_query": DriverError(2013, "Lost connection")})
+    with pytest.raises(DriverError, match="Lost connection"):
+        run(deals_plan("listings", "q", ListingRequest()), fetch)
+
+
+@drivers
+def test_no_benchmark_means_no_deals(run, source):
+    source("sql")
+    fetch = ScriptedFetch({"benchmark_query": ([], [])})
+    page = run(deals_plan("listings", "q", ListingRequest()), fetch)
+    assert page == ([], [], None, None)
+    assert fetch.statements == ["benchmark_query"]
+
+
+@drivers
+def test_engine_source_skips_the_benchmark_query(run, source):
+    source("engine")
+    engine = FakeEngine({"q": 80.0})
+    fetch = ScriptedFetch({"deals_query": lambda params: (DEAL_COLUMNS, [(3, Decimal(str(params[0])))])})
+    page = run(deals_plan("listings", "q", ListingRequest(), engine), fetch)
+    assert page == (DEAL_COLUMNS, [(3, Decimal("80.0"))], 80.0, None)
+    assert fetch.statements == ["deals_query"]
+
+
+def test_async_driver_reads_the_engine_off_the_event_loop(source):
+    source("engine")
+    engine = FakeEngine({"q": 80.0})
+    fetch = ScriptedFetch({"deals_query": DEALS})
+    loop_threads = set()
+
+    async def fetch_async(step):
+        loop_threads.add(threading.get_ident())
+        return fetch(step)
+
+    asyncio.run(deals.run_plan_async(deals_plan("listings", "q", ListingRequest(), engine), fetch_async))
+    assert engine.threads and not engine.threads & loop_threads
+
+
+@drivers
+def test_batch_plan_fills_missing_benchmarks_and_groups_deals(run, source):
+    source("table")
+    fetch = ScriptedFetch({
+        "table_benchmarks_query": ([], [("a", Decimal("100"), COMPUTED_AT)]),
+        "batch_benchmarks_query": lambda params: ([], [("b", Decimal("50"))] if "b" in params else []),
+        "batch_deals_query": (
+            ["id", "api_query_id"], [(1, "a"), (2, "b"), (3, "a")]
+        ),
+    })
+    benchmarks, columns, listings_by_id = run(
+        batch_plan("listings", ["a", "b", "c"], ListingRequest(page_size=5)), fetch
+    )
+    assert benchmarks == {"a": (Decimal("100"), COMPUTED_AT), "b": (Decimal("50"), None), "c": (None, None)}
+    assert columns == ["id", "api_query_id"]
+    assert listings_by_id == {"a": [(1, "a"), (3, "a")], "b": [(2, "b")], "c": []}
+    assert fetch.statements == ["table_benchmarks_query", "batch_benchmarks_query", "batch_deals_query"]
@@ -0,0 +1,231 @@
+"""
+WindowEngine against a sort-based reference of the SQL benchmark it replaces
+(refresh_query_benchmarks in pricing-engine/listings_db.py): PERCENT_RANK()
+trim of the bottom tail, then the AVG of the ROW_NUMBER() middle rows, over
+rows whose last_seen_at is within the window.
+
+    python -m pytest mock-api/tests
+"""
+import math
+import random
+import sys
+from datetime import datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from window_engine import IndexableSkipList, WindowEngine, trimmed_median  # noqa: E402
+
+WINDOW_DAYS = 7
+TRIM_PCT = 15
+START = datetime(2026, 10, 1, 12, 0, 0)
+
+
+def sql_trimmed_median(prices, trim_pct):
+    """The benchmark query on a list of prices, by sorting"""
+    ordered = sorted(prices)
+    n = len(ordered)
+    if n == 0:
+        return None
+    # PERCENT_RANK() = (rank - 1) / (n - 1), rank counting lower prices; 0 for one row
+    lower = {}
+    for i, price in enumerate(ordered):
+        lower.setdefault(price, i)
+    kept = [p for p in ordered if (lower[p] / (n - 1) if n > 1 else 0) > trim_pct / 100]
+    m = len(kept)
+    if m == 0:
+        return None
+    # ROW_NUMBER() IN (FLOOR((m + 1) / 2), CEIL((m + 1) / 2)), 1-based
+    rows = {math.floor((m + 1) / 2), math.ceil((m + 1) / 2)}
+    picked = [kept[r - 1] for r in sorted(rows)]
+    return sum(picked) / len(picked)
+
+
+class FakeTable:
+    """ebay_listings as id -> (api_query_id, price, last_seen_at), with a settable NOW()"""
+
+    def __init__(self):
+        self.rows = {}
+        self.now = START
+
+    def connect(self):
+        return FakeConnection(self)
+
+    def window(self, api_query_id):
+        cutoff = self.now - timedelta(days=WINDOW_DAYS)
+        return [
+            price for qid, price, last_seen_at in self.rows.values()
+            if qid == api_query_id and last_seen_at >= cutoff
+        ]
+
+
+class FakeConnection:
+    def __init__(self, table):
+        self.table = table
+
+    def cursor(self):
+        return FakeCursor(self.table)
+
+    def close(self):
+        pass
+
+
+class FakeCursor:
+    def __init__(self, table):
+        self.table = table
+        self.result = []
+
+    def execute(self, sql, params=None):
+        if sql.startswith("SELECT NOW()"):
+            self.result = [(self.table.now,)]
+        else:
+            (since,) = params
+            self.result = [
+                (row_id, qid, price, last_seen_at)
+                for row_id, (qid, price, last_seen_at) in self.table.rows.items()
+                if last_seen_at >= since
+            ]
+
+    def fetchone(self):
+        return self.result[0]
+
+    def fetchall(self):
+        return self.result
+
+    def close(self):
+        pass
+
+
+def make_engine(table, trim_pct=TRIM_PCT):
+    engine = WindowEngine(table.connect, "ebay_listings", WINDOW_DAYS, trim_pct)
+    # Expiry between polls follows the fake database clock
+    engine._now = lambda: table.now
+    return engine
+
+
+def assert_matches_sql(engine, table, query_ids, trim_pct=TRIM_PCT):
+    for qid in query_ids:
+        assert engine.trimmed_median(qid) == sql_trimmed_median(table.window(qid), trim_pct), qid
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_skiplist_matches_sorted_list(seed):
+    rng = random.Random(seed)
+    skiplist = IndexableSkipList(seed=seed)
+    reference = []
+    for _ in range(2000):
+        if reference and rng.random() < 0.4:
+            value = rng.choice(reference)
+            skiplist.remove(value)
+            reference.remove(value)
+        else:
+            value = rng.randint(0, 50)
+            skiplist.insert(value)
+            reference.append(value)
+        reference.sort()
+        assert len(skiplist) == len(reference)
+    assert [skiplist[i] for i in range(len(skiplist))] == reference
+    for value in range(-1, 52):
+        assert skiplist.bisect_right(value) == sum(1 for v in reference if v <= value)
+    with pytest.raises(KeyError):
+        skiplist.remove(1000)
+
+
+@pytest.mark.parametrize("trim_pct", [0, 15, 33.3, 50, 99])
+@pytest.mark.parametrize("seed", range(10))
+def test_trimmed_median_with_duplicate_prices(trim_pct, seed):
+    rng = random.Random(seed)
+    for size in (1, 2, 3, 5, 7, 20, 101):
+        # A handful of distinct prices, so runs of ties straddle the trim cut
+        prices = [Decimal(rng.choice(["9.99", "10.00", "10.00", "12.50", "12.50", "40.00"])) for _ in range(size)]
+        skiplist = IndexableSkipList(seed=seed)
+        for price in prices:
+            skiplist.insert(price)
+        assert trimmed_median(skiplist, trim_pct) == sql_trimmed_median(prices, trim_pct), prices
+
+
+def test_tie_run_at_the_cut_is_dropped_together():
+    # PERCENT_RANK of every 10.00 is 0, of 20.00 is 4/9; with a 50% trim the
+    # 20.00 run straddles the cut and goes as a whole
+    prices = [Decimal(p) for p in ["10.00"] * 4 + ["20.00"] * 3 + ["30.00", "40.00", "50.00"]]
+    skiplist = IndexableSkipList()
+    for price in prices:
+        skiplist.insert(price)
+    assert trimmed_median(skiplist, 50) == sql_trimmed_median(prices, 50) == Decimal("40.00")
+
+
+@pytest.mark.parametrize("trim_pct", [0, 15, 50])
+@pytest.mark.parametrize("seed", range(5))
+def test_engine_matches_sql_over_time(trim_pct, seed):
+    rng = random.Random(seed)
+    table = FakeTable()
+    engine = make_engine(table, trim_pct)
+    query_ids = [f"q{i}" for i in range(4)]
+    next_id = 1
+    # Two weeks of hourly-ish ingestion runs: new rows, re-sightings that move
+    # last_seen_at forward (delta ingest), and rows ageing out of the window
+    for _ in range(120):
+        table.now += timedelta(minutes=rng.randint(30, 300))
+        for _ in range(rng.randint(0, 15)):
+            qid = rng.choice(query_ids)
+            price = Decimal(rng.choice(["95.00", "99.99", "100.00", "100.00", "120.00", "150.00", "80.50"]))
+            table.rows[next_id] = (qid, price, table.now)
+            next_id += 1
+        for row_id in rng.sample(sorted(table.rows), min(len(table.rows), rng.randint(0, 5))):
+            qid, price, _ = table.rows[row_id]
+            table.rows[row_id] = (qid, price, table.now)
+        engine.poll()
+        assert_matches_sql(engine, table, query_ids + ["unknown"], trim_pct)
+
+
+def test_resighted_row_stays_in_the_window():
+    table = FakeTable()
+    engine = make_engine(table)
+    prices = ["50.00", "60.00", "70.00", "80.00", "90.00", "100.00"]
+    for row_id, price in enumerate(prices, start=1):
+        table.rows[row_id] = ("q", Decimal(price), table.now)
+    engine.poll()
+    assert_matches_sql(engine, table, ["q"])
+
+    # Rows 1-3 are seen again a day later; the rest are not
+    table.now += timedelta(days=1)
+    for row_id in (1, 2, 3):
+        qid, price, _ = table.rows[row_id]
+        table.rows[row_id] = (qid, price, table.now)
+    engine.poll()
+    assert_matches_sql(engine, table, ["q"])
+
+    # Past the first sighting's expiry: only the re-sighted rows remain
+    table.now += timedelta(days=WINDOW_DAYS - 1, seconds=1)
+    assert sorted(table.window("q")) == [Decimal("50.00"), Decimal("60.00"), Decimal("70.00")]
+    assert_matches_sql(engine, table, ["q"])
+    engine.poll()
+    assert_matches_sql(engine, table, ["q"])
+
+    # A poll that returns the same sighting again changes nothing
+    assert engine.poll() == 0
+
+
+def test_expiry_at_the_cutoff():
+    table = FakeTable()
+    engine = make_engine(table)
+    cutoff = table.now - timedelta(days=WINDOW_DAYS)
+    table.rows[1] = ("q", Decimal("10.00"), cutoff - timedelta(microseconds=1))
+    for row_id, price in enumerate(["20.00", "30.00", "40.00", "50.00"], start=2):
+        table.rows[row_id] = ("q", Decimal(price), cutoff)
+    table.rows[6] = ("q", Decimal("60.00"), table.now)
+    engine.poll()
+
+    # last_seen_at >= cutoff is in the window, like the SQL
+    assert len(table.window("q")) == 5
+    assert_matches_sql(engine, table, ["q"])
+
+    # One microsecond later the rows stamped exactly at the cutoff age out,
+    # without another poll
+    table.now += timedelta(microseconds=1)
+    assert table.window("q") == [Decimal("60.00")]
+    assert engine.trimmed_median("q") is None
+    assert_matches_sql(engine, table, ["q"])
@@ -0,0 +1,277 @@
+"""
+In-process sliding-window benchmark engine.
+
+Keeps the prices observed in the last WINDOW_DAYS for every api_query_id in
+an indexable skip list, so the trimmed median /deals needs is answered in
+O(log n) instead of re-ranking the whole window in SQL on every request.
+
+The engine is seeded from ebay_listings at startup and then polls for rows
+whose last_seen_at moved forward (new observations, and rows the delta
+ingest mode carried forward). Rows leave the window when their last_seen_at
+falls behind NOW() - WINDOW_DAYS, using the database clock like the SQL.
+
+The median matches the SQL benchmark exactly: rows whose PERCENT_RANK() is
+not above TRIM_PCT are dropped (bottom tail only, ties dropped together),
+and the result is the AVG of the middle one or two remaining prices.
+"""
+import heapq
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+SKIPLIST_MAX_LEVELS = 32
+
+
+class _Node:
+    __slots__ = ("value", "next", "width")
+
+    def __init__(self, value: Any, levels: int):
+        self.value = value
+        self.next: List[Optional["_Node"]] = [None] * levels
+        self.width: List[int] = [1] * levels
+
+
+class IndexableSkipList:
+    """
+    Sorted multiset with O(log n) expected insert, remove, positional access
+    and rank lookups. Each forward link stores how many items it skips.
+    """
+
+    def __init__(self, seed: Optional[int] = None):
+        self.head = _Node(None, SKIPLIST_MAX_LEVELS)
+        self.size = 0
+        self._rng = random.Random(seed)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _random_levels(self) -> int:
+        levels = 1
+        while levels < SKIPLIST_MAX_LEVELS and self._rng.random() < 0.5:
+            levels += 1
+        return levels
+
+    def insert(self, value: Any) -> None:
+        chain: List[_Node] = [None] * SKIPLIST_MAX_LEVELS
+        steps_at_level = [0] * SKIPLIST_MAX_LEVELS
+        node = self.head
+        for level in reversed(range(SKIPLIST_MAX_LEVELS)):
+            while node.next[level] is not None and node.next[level].value <= value:
+                steps_at_level[level] += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+
+        levels = self._random_levels()
+        new = _Node(value, levels)
+        steps = 0
+        for level in range(levels):
+            prev = chain[level]
+            new.next[level] = prev.next[level]
+            prev.next[level] = new
+            new.width[level] = prev.width[level] - steps
+            prev.width[level] = steps + 1
+            steps += steps_at_level[level]
+        for level in range(levels, SKIPLIST_MAX_LEVELS):
+            chain[level].width[level] += 1
+        self.size += 1
+
+    def remove(self, value: Any) -> None:
+        chain: List[_Node] = [None] * SKIPLIST_MAX_LEVELS
+        node = self.head
+        for level in reversed(range(SKIPLIST_MAX_LEVELS)):
+            while node.next[level] is not None and node.next[level].value < value:
+                node = node.next[level]
+            chain[level] = node
+
+        target = chain[0].next[0]
+        if target is None or target.value != value:
+            raise KeyError(value)
+
+        for level in range(len(target.next)):
+            prev = chain[level]
+            prev.width[level] += target.width[level] - 1
+            prev.next[level] = target.next[level]
+        for level in range(len(target.next), SKIPLIST_MAX_LEVELS):
+            chain[level].width[level] -= 1
+        self.size -= 1
+
+    def __getitem__(self, index: int) -> Any:
+        if not 0 <= index < self.size:
+            raise IndexError(index)
+        node = self.head
+        remaining = index + 1
+        for level in reversed(range(SKIPLIST_MAX_LEVELS)):
+            while node.next[level] is not None and node.width[level] <= remaining:
+                remaining -= node.width[level]
+                node = node.next[level]
+        return node.value
+
+    def bisect_right(self, value: Any) -> int:
+        """Number of items <= value."""
+        node = self.head
+        rank = 0
+        for level in reversed(range(SKIPLIST_MAX_LEVELS)):
+            while node.next[level] is not None and node.next[level].value <= value:
+                rank += node.width[level]
+                node = node.next[level]
+        return rank
+
+
+def trimmed_median(prices: IndexableSkipList, trim_pct: float) -> Optional[Decimal]:
+    """
+    The /deals benchmark over `prices`, with the SQL's semantics:
+    keep rows with PERCENT_RANK() = (#lower prices) / (n - 1) > trim_pct / 100,
+    then AVG the rows numbered FLOOR((m + 1) / 2) and CEIL((m + 1) / 2).
+    """
+    n = len(prices)
+    if n < 2:
+        # PERCENT_RANK() of a single row is 0, which the trim always drops
+        return None
+
+    # First rank whose PERCENT_RANK clears the threshold, using the same
+    # floating-point comparison as the SQL
+    cut = trim_pct / 100
+    start = int(cut * (n - 1))
+    while start < n and start / (n - 1) <= cut:
+        start += 1
+    while start > 0 and (start - 1) / (n - 1) > cut:
+        start -= 1
+    if start >= n:
+        return None
+
+    # A row ranks by its first tie, so a run of equal prices straddling the
+    # cut is dropped as a whole
+    if start > 0 and prices[start] == prices[start - 1]:
+        start = prices.bisect_right(prices[start])
+        if start >= n:
+            return None
+
+    m = n - start
+    lo = prices[start + (m - 1) // 2]
+    hi = prices[start + m // 2]
+    return (lo + hi) / 2
+
+
+class WindowEngine:
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        table_name: str,
+        window_days: int,
+        trim_pct: float,
+        poll_interval: float = 30.0,
+        poll_overlap: float = 600.0
+    ):
+        self.connect = connect
+        self.table_name = table_name
+        self.window = timedelta(days=window_days)
+        self.trim_pct = trim_pct
+        self.poll_interval = poll_interval
+        # Rows are stamped with the run's start time but commit later, so each
+        # poll re-reads this many seconds behind the watermark
+        self.poll_overlap = timedelta(seconds=poll_overlap)
+
+        self._lock = threading.Lock()
+        self._prices: Dict[str, IndexableSkipList] = {}
+        # id -> (api_query_id, price, last_seen_at)
+        self._rows: Dict[int, Tuple[str, Decimal, datetime]] = {}
+        self._expiry: List[Tuple[datetime, int]] = []
+        self._watermark: Optional[datetime] = None
+        # Database NOW() minus local time, so expiry follows the DB clock
+        self._clock_offset = timedelta(0)
+        self._thread: Optional[threading.Thread] = None
+        self.ready = False
+
+    def start(self) -> None:
+        """Seed from the table and keep polling in a daemon thread."""
+        try:
+            self.poll()
+        except Exception as e:
+            print(f"Window engine seed failed, retrying in background: {e}")
+        self._thread = threading.Thread(target=self._poll_loop, name="window-engine", daemon=True)
+        self._thread.start()
+
+    def _poll_loop(self) -> None:
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"Window engine poll failed: {e}")
+
+    def _now(self) -> datetime:
+        return datetime.now() + self._clock_offset
+
+    def poll(self) -> int:
+        """Apply rows seen since the last poll; returns how many changed."""
+        conn = self.connect()
+        if conn is None:
+            raise RuntimeError("no database connection")
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT NOW()")
+            db_now = cursor.fetchone()[0]
+            since = db_now - self.window
+            if self._watermark is not None:
+                since = max(self._watermark - self.poll_overlap, since)
+            cursor.execute(
+                f"SELECT id, api_query_id, price, last_seen_at FROM {self.table_name} "
+                f"WHERE last_seen_at >= %s",
+                (since,)
+            )
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
+
+        changed = 0
+        with self._lock:
+            self._clock_offset = db_now - datetime.now()
+            for row_id, api_query_id, price, last_seen_at in rows:
+                if self._observe(row_id, api_query_id, price, last_seen_at):
+                    changed += 1
+                if self._watermark is None or last_seen_at > self._watermark:
+                    self._watermark = last_seen_at
+            if self._watermark is None:
+                self._watermark = db_now - self.window
+            self._expire(db_now - self.window)
+            self.ready = True
+        return changed
+
+    def _observe(self, row_id: int, api_query_id: str, price: Decimal, last_seen_at: datetime) -> bool:
+        known = self._rows.get(row_id)
+        if known is not None:
+            if last_seen_at <= known[2]:
+                return False
+            # Same row seen again: only its expiry moves
+            self._rows[row_id] = (known[0], known[1], last_seen_at)
+        else:
+            self._rows[row_id] = (api_query_id, price, last_seen_at)
+            self._prices.setdefault(api_query_id, IndexableSkipList()).insert(price)
+        heapq.heappush(self._expiry, (last_seen_at, row_id))
+        return True
+
+    def _expire(self, cutoff: datetime) -> None:
+        while self._expiry and self._expiry[0][0] < cutoff:
+            last_seen_at, row_id = heapq.heappop(self._expiry)
+            known = self._rows.get(row_id)
+            if known is None or known[2] != last_seen_at:
+                # Superseded by a later sighting
+                continue
+            api_query_id, price, _ = known
+            del self._rows[row_id]
+            prices = self._prices[api_query_id]
+            prices.remove(price)
+            if not len(prices):
+                del self._prices[api_query_id]
+
+    def trimmed_median(self, api_query_id: str) -> Optional[Decimal]:
+        with self._lock:
+            self._expire(self._now() - self.window)
+            prices = self._prices.get(api_query_id)
+            if prices is None:
+                return None
+            return trimmed_median(prices, self.trim_pct)
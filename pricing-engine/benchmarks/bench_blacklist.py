@@ -0,0 +1,97 @@
+"""
+Micro-benchmark: title blacklist matching, substring scan vs. compiled matcher.
+
+Reports titles/sec for blacklists of 10, 100 and 1,000 terms over synthetic
+eBay-style titles, and checks that both matchers flag the same titles.
+
+    python benchmarks/bench_blacklist.py [--titles 20000] [--seed 7]
+"""
+import argparse
+import random
+import string
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from blacklist import compile_blacklist  # noqa: E402
+
+BLACKLIST_SIZES = (10, 100, 1000)
+
+
+def make_vocabulary(rng: random.Random, size: int = 5000) -> List[str]:
+    return [
+        "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 9)))
+        for _ in range(size)
+    ]
+
+
+def make_titles(rng: random.Random, vocab: List[str], count: int) -> List[str]:
+    # eBay titles are capped at 80 characters, roughly 10-12 words
+    return [" ".join(rng.choice(vocab) for _ in range(rng.randint(6, 12))) for _ in range(count)]
+
+
+def make_blacklist(rng: random.Random, vocab: List[str], size: int) -> Tuple[str, ...]:
+    terms = {}
+    while len(terms) < size:
+        term = rng.choice(vocab)
+        if rng.random() < 0.3:
+            term += " " + rng.choice(vocab)
+        terms[term] = None
+    return tuple(terms)
+
+
+def titles_per_sec(fn: Callable[[str], bool], titles: List[str]) -> Tuple[float, int]:
+    start = time.perf_counter()
+    hits = sum(1 for t in titles if fn(t))
+    return len(titles) / (time.perf_counter() - start), hits
+
+
+def run(title_count: int, seed: int) -> List[dict]:
+    rng = random.Random(seed)
+    vocab = make_vocabulary(rng)
+    titles = make_titles(rng, vocab, title_count)
+
+    results = []
+    for size in BLACKLIST_SIZES:
+        terms = make_blacklist(rng, vocab, size)
+
+        compile_start = time.perf_counter()
+        pattern = compile_blacklist(terms)
+        compile_ms = (time.perf_counter() - compile_start) * 1000
+
+        naive_rate, naive_hits = titles_per_sec(lambda t: any(bad in t for bad in terms), titles)
+        compiled_rate, compiled_hits = titles_per_sec(lambda t: pattern.search(t) is not None, titles)
+        if naive_hits != compiled_hits:
+            raise AssertionError(f"matchers disagree at {size} terms: {naive_hits} vs {compiled_hits}")
+
+        results.append({
+            "terms": size,
+            "titles": title_count,
+            "hits": compiled_hits,
+            "compile_ms": round(compile_ms, 2),
+            "substring_titles_per_sec": round(naive_rate),
+            "compiled_titles_per_sec": round(compiled_rate),
+            "speedup": round(compiled_rate / naive_rate, 2),
+        })
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--titles", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    print(f"{'terms':>6} {'substring/s':>12} {'compiled/s':>12} {'speedup':>8} {'compile_ms':>11}")
+    for r in run(args.titles, args.seed):
+        print(
+            f"{r['terms']:>6} {r['substring_titles_per_sec']:>12,} {r['compiled_titles_per_sec']:>12,} "
+            f"{r['speedup']:>7.2f}x {r['compile_ms']:>11.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Memory benchmark: raw itemSummary dicts vs. ListingRecord in the ingestion path.
+
+Runs one product's fetch -> filter -> rows -> score sequence over synthetic
+Browse pages (see synthetic.py), once the way it worked before ListingRecord
+(filtered raw dicts kept for the product's lifetime and re-parsed by
+listing_row and scoring) and once with the current code, and reports
+tracemalloc's retained and peak sizes per 10k items. Rows and deals are
+checked to be identical.
+
+    python benchmarks/bench_listing_memory.py [--sizes 10000,100000] [--seed 42]
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+# Placeholders so fetch_data's ebay_auth import succeeds; nothing calls eBay
+os.environ.setdefault("CLIENT_ID", "benchmark")
+os.environ.setdefault("CLIENT_SECRET", "benchmark")
+os.environ.setdefault("EBAY_TOKEN_BACKGROUND_REFRESH", "false")
+
+import fetch_data  # noqa: E402
+from synthetic import DEFAULT_BLACKLIST, make_item  # noqa: E402
+
+DEFAULT_SIZES = (10000, 100000)
+PAGE_SIZE = 200
+DISCOUNT_THRESHOLD = 0.15
+TRIM_FRACTION = 0.15
+
+
+def pages(count: int, seed: int) -> Iterator[Dict[str, Any]]:
+    """Items as browse_search_pages yields them: one page alive at a time."""
+    rng = random.Random(seed)
+    for offset in range(0, count, PAGE_SIZE):
+        page = [make_item(rng, n) for n in range(offset, min(offset + PAGE_SIZE, count))]
+        yield from page
+
+
+def legacy_listing_row(item: Dict[str, Any]) -> Tuple:
+    """listing_row as it was before ListingRecord, reading the raw dict."""
+    price_data = item.get("price") or {}
+    cond_description = item.get("condition")
+    if cond_description:
+        cond_description = cond_description[:255]
+    return (
+        "EBAY_US", "MacBook Pro", "macbook pro", "0" * 64, "t", "t",
+        item.get("itemId", "")[:64],
+        (item.get("title") or "")[:512],
+        fetch_data.condition_bucket(item)[:64],
+        cond_description,
+        (item.get("itemWebUrl") or "")[:2048],
+        fetch_data.parse_money(price_data),
+        price_data.get("currency", "USD")[:3],
+    )
+
+
+def legacy_score_deals(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """score_deals_python as it was before ListingRecord, reading the raw dicts."""
+    groups: Dict[str, List[Tuple[Dict[str, Any], float]]] = {}
+    for it in items:
+        groups.setdefault(fetch_data.condition_bucket(it), []).append((it, fetch_data.total_price(it)))
+
+    deals = []
+    for cond, cond_items in groups.items():
+        med = fetch_data.trimmed_median([t for _, t in cond_items], TRIM_FRACTION)
+        if med is None or med <= 0:
+            continue
+        for it, t in cond_items:
+            disc = (med - t) / med
+            if disc >= DISCOUNT_THRESHOLD:
+                deals.append({
+                    "condition": cond,
+                    "bucket_median": fetch_data.round2(med),
+                    "discount_pct": fetch_data.round2(disc),
+                    "total": t,
+                    "title": it.get("title"),
+                    "itemId": it.get("itemId"),
+                    "url": it.get("itemWebUrl"),
+                    "item_condition": it.get("condition"),
+                    "buyingOptions": it.get("buyingOptions"),
+                    "price": it.get("price"),
+                })
+    deals.sort(key=lambda d: d["discount_pct"], reverse=True)
+    return deals
+
+
+def run_legacy(count: int, seed: int) -> Tuple[List[Any], List[Tuple], List[Dict[str, Any]]]:
+    junk = fetch_data.compile_blacklist(tuple(DEFAULT_BLACKLIST), False)
+    items = list(fetch_data.filter_items(pages(count, seed), junk))
+    rows = [legacy_listing_row(it) for it in items]
+    return items, rows, legacy_score_deals(items)
+
+
+def run_records(count: int, seed: int) -> Tuple[List[Any], List[Tuple], List[Dict[str, Any]]]:
+    fetch_data.browse_search_pages = lambda *args, **kwargs: pages(count, seed)
+    items = fetch_data.fetch_keyword_items("macbook pro", "EBAY_US", limit=count, blacklist=DEFAULT_BLACKLIST)
+    rows = [fetch_data.listing_row(rec, "EBAY_US", "MacBook Pro", "macbook pro", "0" * 64, "t") for rec in items]
+    return items, rows, fetch_data.score_deals_python(items, DISCOUNT_THRESHOLD, TRIM_FRACTION)
+
+
+def measure(fn: Callable[[int, int], Tuple], count: int, seed: int) -> Tuple[int, int, Tuple]:
+    """(bytes held by the filtered item list, peak bytes of the whole run, output)."""
+    gc.collect()
+    tracemalloc.start()
+    out = fn(count, seed)
+    _, peak = tracemalloc.get_traced_memory()
+    items, rows, deals = out
+    with_items, _ = tracemalloc.get_traced_memory()
+    out = (None, rows, deals)
+    del items
+    gc.collect()
+    without_items, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return with_items - without_items, peak, out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES))
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    print(f"{'items':>9} {'path':>8} {'held_kib_10k':>13} {'peak_kib_10k':>13}")
+    for size in sizes:
+        held = {}
+        for name, fn in (("dicts", run_legacy), ("records", run_records)):
+            held_bytes, peak_bytes, (_, rows, deals) = measure(fn, size, args.seed)
+            held[name] = (rows, deals)
+            per_10k = 10000 / size / 1024
+            print(f"{size:>9,} {name:>8} {held_bytes * per_10k:>13,.0f} {peak_bytes * per_10k:>13,.0f}")
+        if held["dicts"] != held["records"]:
+            raise AssertionError(f"rows or deals differ at {size:,} items")
+
+
+if __name__ == "__main__":
+    main()
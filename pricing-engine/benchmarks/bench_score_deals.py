@@ -0,0 +1,86 @@
+"""
+Micro-benchmark: score_deals, dict-of-lists path vs. NumPy columnar path.
+
+Scores synthetic items (see synthetic.py) with both implementations, checks
+that they return exactly the same deals, and reports items/sec. Needs numpy.
+
+    python benchmarks/bench_score_deals.py [--sizes 10000,100000,1000000] [--seed 42]
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+# Placeholders so fetch_data's ebay_auth import succeeds; nothing calls eBay
+os.environ.setdefault("CLIENT_ID", "benchmark")
+os.environ.setdefault("CLIENT_SECRET", "benchmark")
+os.environ.setdefault("EBAY_TOKEN_BACKGROUND_REFRESH", "false")
+
+import fetch_data  # noqa: E402
+from synthetic import make_items  # noqa: E402
+
+DEFAULT_SIZES = (10000, 100000, 1000000)
+DISCOUNT_THRESHOLD = 0.15
+TRIM_FRACTION = 0.15
+
+
+def best_of(fn: Callable[[], Any], repeat: int) -> Tuple[float, Any]:
+    best = float("inf")
+    out = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, out
+
+
+def run(sizes: List[int], seed: int) -> List[Dict[str, Any]]:
+    results = []
+    for size in sizes:
+        items = [fetch_data.ListingRecord.from_item(it) for it in make_items(size, seed=seed)]
+        repeat = 3 if size <= 100000 else 1
+
+        python_sec, python_deals = best_of(
+            lambda: fetch_data.score_deals_python(items, DISCOUNT_THRESHOLD, TRIM_FRACTION), repeat
+        )
+        columnar_sec, columnar_deals = best_of(
+            lambda: fetch_data.score_deals_columnar(items, DISCOUNT_THRESHOLD, TRIM_FRACTION), repeat
+        )
+        if python_deals != columnar_deals:
+            raise AssertionError(f"score_deals paths disagree at {size:,} items")
+
+        results.append({
+            "items": size,
+            "deals": len(columnar_deals),
+            "python_items_per_sec": round(size / python_sec),
+            "columnar_items_per_sec": round(size / columnar_sec),
+            "speedup": round(python_sec / columnar_sec, 2),
+        })
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES))
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if fetch_data.np is None:
+        sys.exit("numpy is not installed")
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    print(f"{'items':>9} {'deals':>8} {'python/s':>12} {'columnar/s':>12} {'speedup':>8}")
+    for r in run(sizes, args.seed):
+        print(
+            f"{r['items']:>9,} {r['deals']:>8,} {r['python_items_per_sec']:>12,} "
+            f"{r['columnar_items_per_sec']:>12,} {r['speedup']:>7.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
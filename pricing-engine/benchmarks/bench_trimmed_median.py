@@ -0,0 +1,168 @@
+"""
+Micro-benchmark: trimmed_median, full sort vs. selection, and KLL sketch accuracy.
+
+Part 1 times the previous sort-then-slice trimmed_median against the
+selection-based trimmed_median (and trimmed_median_array when numpy is
+installed), and checks all of them return identical values.
+
+Part 2 feeds the same prices through KLLSketch in several shards, merges
+them, and compares the approximate trimmed median with the exact one. It
+fails if the rank error exceeds the bound documented in quantile_sketch.
+
+    python benchmarks/bench_trimmed_median.py [--sizes 10000,100000,1000000]
+        [--sketch-size 1000000] [--sketch-runs 5] [--k 200] [--seed 11]
+"""
+import argparse
+import bisect
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Placeholders so fetch_data's ebay_auth import succeeds; nothing calls eBay
+os.environ.setdefault("CLIENT_ID", "benchmark")
+os.environ.setdefault("CLIENT_SECRET", "benchmark")
+os.environ.setdefault("EBAY_TOKEN_BACKGROUND_REFRESH", "false")
+
+import fetch_data  # noqa: E402
+from quantile_sketch import KLLSketch  # noqa: E402
+
+DEFAULT_SIZES = (10000, 100000, 1000000)
+TRIM_FRACTION = 0.15
+SHARDS = 4
+# quantile_sketch documents rank error within about 1.7 / k at the 99th percentile
+RANK_ERROR_PER_K = 1.7
+
+
+def sort_trimmed_median(values: List[float], trim_fraction: float) -> Optional[float]:
+    """trimmed_median as it was before selection: sort, slice, statistics.median."""
+    vals = sorted(v for v in values if v is not None)
+    n = len(vals)
+    if n == 0:
+        return None
+    if n < 5:
+        return statistics.median(vals)
+
+    k = int(n * trim_fraction)
+    trimmed = vals[k: max(n - k, k + 1)]
+    if not trimmed:
+        return statistics.median(vals)
+    return statistics.median(trimmed)
+
+
+def make_prices(rng: random.Random, count: int) -> List[float]:
+    # Listing totals: log-normal around ~$700 with cent resolution
+    return [round(rng.lognormvariate(6.5, 0.35), 2) for _ in range(count)]
+
+
+def best_of(fn: Callable[[], Any], repeat: int) -> Tuple[float, Any]:
+    best = float("inf")
+    out = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, out
+
+
+def run_exact(sizes: List[int], seed: int) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    results = []
+    for size in sizes:
+        values = make_prices(rng, size)
+        repeat = 5 if size <= 100000 else 2
+
+        sort_sec, expected = best_of(lambda: sort_trimmed_median(values, TRIM_FRACTION), repeat)
+        select_sec, got = best_of(lambda: fetch_data.trimmed_median(values, TRIM_FRACTION), repeat)
+        if got != expected:
+            raise AssertionError(f"trimmed_median disagrees at {size:,} values: {got} vs {expected}")
+
+        row = {
+            "values": size,
+            "sort_ms": sort_sec * 1000,
+            "select_ms": select_sec * 1000,
+            "array_ms": None,
+        }
+        if fetch_data.np is not None:
+            arr = fetch_data.np.array(values, dtype=fetch_data.np.float64)
+            array_sec, got = best_of(lambda: fetch_data.trimmed_median_array(arr, TRIM_FRACTION), repeat)
+            if got != expected:
+                raise AssertionError(f"trimmed_median_array disagrees at {size:,} values: {got} vs {expected}")
+            row["array_ms"] = array_sec * 1000
+        results.append(row)
+    return results
+
+
+def run_sketch(size: int, runs: int, k: int, seed: int) -> List[Dict[str, Any]]:
+    results = []
+    for run in range(runs):
+        rng = random.Random(seed + run)
+        values = make_prices(rng, size)
+
+        start = time.perf_counter()
+        shards = [KLLSketch(k=k, seed=seed * 100 + run * SHARDS + i) for i in range(SHARDS)]
+        for i, v in enumerate(values):
+            shards[i % SHARDS].update(v)
+        sketch = shards[0]
+        for other in shards[1:]:
+            sketch.merge(other)
+        estimate = sketch.trimmed_median(TRIM_FRACTION)
+        sketch_sec = time.perf_counter() - start
+
+        exact = fetch_data.trimmed_median(values, TRIM_FRACTION)
+        ordered = sorted(values)
+        target = bisect.bisect_left(ordered, exact)
+        # Distance in ranks from the exact answer, counting ties as a match
+        lo = bisect.bisect_left(ordered, estimate)
+        hi = bisect.bisect_right(ordered, estimate)
+        rank_error = 0 if lo <= target < hi else min(abs(lo - target), abs(hi - 1 - target))
+
+        results.append({
+            "run": run,
+            "values": size,
+            "retained": sketch.retained(),
+            "exact": exact,
+            "estimate": estimate,
+            "rank_error": rank_error / size,
+            "value_error": abs(estimate - exact) / exact,
+            "sketch_sec": sketch_sec,
+        })
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES))
+    parser.add_argument("--sketch-size", type=int, default=1000000)
+    parser.add_argument("--sketch-runs", type=int, default=5)
+    parser.add_argument("--k", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    print(f"{'values':>10} {'sort_ms':>10} {'select_ms':>10} {'array_ms':>10}")
+    for r in run_exact(sizes, args.seed):
+        array_ms = f"{r['array_ms']:>10.2f}" if r["array_ms"] is not None else f"{'-':>10}"
+        print(f"{r['values']:>10,} {r['sort_ms']:>10.2f} {r['select_ms']:>10.2f} {array_ms}")
+
+    bound = RANK_ERROR_PER_K / args.k
+    print(f"\nKLL k={args.k}, {SHARDS} merged shards, documented rank error bound {bound:.2%}")
+    print(f"{'run':>4} {'values':>10} {'retained':>9} {'exact':>10} {'estimate':>10} {'rank_err':>9} {'value_err':>10}")
+    worst = 0.0
+    for r in run_sketch(args.sketch_size, args.sketch_runs, args.k, args.seed):
+        worst = max(worst, r["rank_error"])
+        print(
+            f"{r['run']:>4} {r['values']:>10,} {r['retained']:>9,} {r['exact']:>10.2f} "
+            f"{r['estimate']:>10.2f} {r['rank_error']:>8.3%} {r['value_error']:>9.3%}"
+        )
+    if worst > bound:
+        raise AssertionError(f"sketch rank error {worst:.3%} exceeds the documented {bound:.2%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""
+Before/after EXPLAIN ANALYZE of the /deals access paths on synthetic data.
+
+Creates a scratch database, applies migrations up to the baseline schema,
+loads a multi-million-row ebay_listings table shaped like full-mode
+ingestion (every run re-observes most listings of every query), and runs
+EXPLAIN ANALYZE on the queries behind /deals:
+
+  benchmark   per-query trimmed median (products.py SQL fallback)
+  refresh     refresh_query_benchmarks' batch window scan, all queries
+  deals       the /deals listing query, deduplicated by listing URL or key
+  poll        window_engine.py's incremental poll
+
+It then applies the remaining migrations (indexes, listing_key,
+partitioning), runs ANALYZE TABLE and explains the same queries again. The
+plans and timings are written to benchmarks/results as a text report.
+
+Needs a MySQL 8.0.23+ server and the MYSQL_* settings from the root .env;
+the user must be allowed to create and drop the scratch database.
+
+    python benchmarks/explain_deals.py [--rows 3000000] [--queries 40]
+        [--days 60] [--database ebay_explain_scratch] [--keep]
+"""
+import argparse
+import logging
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent))
+sys.path.insert(0, str(BENCH_DIR))
+sys.path.insert(0, str(BENCH_DIR.parent.parent / "migrations"))
+
+import mysql.connector  # noqa: E402
+
+import migrate  # noqa: E402
+from run_benchmarks import RESULTS_DIR, git_commit  # noqa: E402
+from listings_db import write_listing_rows  # noqa: E402
+from synthetic import TITLE_WORDS  # noqa: E402
+
+TABLE = "ebay_listings"
+BASELINE_VERSION = 1
+RUNS_PER_DAY = 4
+WINDOW_DAYS = 7
+TRIM_PCT = 15
+DEALS_LIMIT = 15
+LOAD_BATCH = 2000
+
+
+def synthetic_rows(total: int, queries: int, days: int, seed: int):
+    """
+    Yield ebay_listings rows in LISTING_COLUMNS order, oldest run first. Each
+    query has a pool of listings; every run observes a random subset of it.
+    """
+    rng = random.Random(seed)
+    runs = days * RUNS_PER_DAY
+    per_run = max(1, total // (queries * runs))
+    pool_size = per_run * 2
+    now = datetime.now().replace(microsecond=0)
+
+    pools = []
+    for q in range(queries):
+        api_query_text = f"synthetic query {q}"
+        api_query_id = f"{q:064x}"
+        base_price = rng.uniform(150, 2500)
+        listings = []
+        for i in range(pool_size):
+            item_id = f"v1|{200000000000 + q * pool_size + i}|0"
+            title = " ".join(rng.sample(TITLE_WORDS, 8)).title()[:80]
+            # Real itemWebUrls carry long tracking query strings
+            url = (
+                f"https://www.ebay.com/itm/{200000000000 + q * pool_size + i}"
+                f"?_skw={api_query_text.replace(' ', '+')}&hash=item{rng.getrandbits(40):x}"
+                f"&amdata=enc%3A{rng.getrandbits(256):064x}"
+            )
+            price = round(max(1.0, rng.gauss(base_price, base_price * 0.25)), 2)
+            listings.append((item_id, title, url, price))
+        pools.append((api_query_text, api_query_id, listings))
+
+    for run in range(runs):
+        fetched_at = now - timedelta(hours=(runs - run) * 24 // RUNS_PER_DAY)
+        for api_query_text, api_query_id, listings in pools:
+            for item_id, title, url, price in rng.sample(listings, per_run):
+                yield (
+                    "EBAY_US", api_query_text[:64], api_query_text, api_query_id,
+                    fetched_at, fetched_at, item_id, title,
+                    "USED" if rng.random() < 0.4 else "NEW", None, url,
+                    round(price * rng.uniform(0.97, 1.03), 2), "USD",
+                )
+
+
+def load(conn, rows) -> int:
+    written = 0
+    batches = 0
+    batch: List[Tuple] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= LOAD_BATCH:
+            written += write_listing_rows(conn, TABLE, batch, "explain", mode="batch", batch_size=LOAD_BATCH)[0]
+            batch = []
+            batches += 1
+            if batches % 250 == 0:
+                print(f"  {written:,} rows")
+    if batch:
+        written += write_listing_rows(conn, TABLE, batch, "explain", mode="batch", batch_size=LOAD_BATCH)[0]
+    return written
+
+
+def explained_queries(dedup_key: str, query_ids: List[str]) -> Dict[str, Tuple[str, Tuple]]:
+    placeholders = ", ".join(["%s"] * len(query_ids))
+    return {
+        "benchmark": (
+            f"""
+            WITH ranked_prices AS (
+              SELECT price, PERCENT_RANK() OVER (ORDER BY price) AS price_percentile
+              FROM {TABLE}
+              WHERE last_seen_at >= DATE_SUB(NOW(), INTERVAL {WINDOW_DAYS} DAY)
+                AND api_query_id = %s
+            ),
+            trimmed_prices AS (
+              SELECT price FROM ranked_prices WHERE price_percentile > {TRIM_PCT / 100}
+            )
+            SELECT AVG(price) AS trimmed_median
+            FROM (
+              SELECT price,
+                ROW_NUMBER() OVER (ORDER BY price) AS row_num,
+                COUNT(*) OVER () AS total_count
+              FROM trimmed_prices
+            ) ranked
+            WHERE row_num IN (FLOOR((total_count + 1) / 2), CEIL((total_count + 1) / 2))
+            """,
+            (query_ids[0],),
+        ),
+        "refresh": (
+            f"""
+            SELECT api_query_id, COUNT(*), MIN(price), MAX(price)
+            FROM (
+              SELECT api_query_id, price,
+                PERCENT_RANK() OVER (PARTITION BY api_query_id ORDER BY price) AS price_percentile
+              FROM {TABLE}
+              WHERE last_seen_at >= DATE_SUB(NOW(), INTERVAL {WINDOW_DAYS} DAY)
+                AND api_query_id IN ({placeholders})
+            ) windowed
+            WHERE price_percentile > {TRIM_PCT / 100}
+            GROUP BY api_query_id
+            """,
+            tuple(query_ids),
+        ),
+        "deals": (
+            f"""
+            WITH filtered_deals AS (
+              SELECT e.*{', e.listing_key' if dedup_key == 'listing_key' else ''}
+              FROM {TABLE} e
+              CROSS JOIN (SELECT %s AS trimmed_median) b
+              WHERE e.price < 0.80 * b.trimmed_median
+                AND e.price > 0.35 * b.trimmed_median
+                AND e.last_seen_at >= DATE_SUB(NOW(), INTERVAL {WINDOW_DAYS} DAY)
+                AND e.api_query_id = %s
+            ),
+            deduplicated_deals AS (
+              SELECT *,
+                ROW_NUMBER() OVER (PARTITION BY {dedup_key} ORDER BY price ASC, fetched_at DESC) AS rn
+              FROM filtered_deals
+            )
+            SELECT * FROM deduplicated_deals WHERE rn = 1 ORDER BY price ASC LIMIT {DEALS_LIMIT}
+            """,
+            None,
+        ),
+        "poll": (
+            f"SELECT id, api_query_id, price, last_seen_at FROM {TABLE} "
+            f"WHERE last_seen_at >= DATE_SUB(NOW(), INTERVAL 12 HOUR)",
+            (),
+        ),
+    }
+
+
+def explain_all(conn, dedup_key: str, query_ids: List[str]) -> Dict[str, Tuple[str, float]]:
+    cursor = conn.cursor(buffered=True)
+    try:
+        queries = explained_queries(dedup_key, query_ids)
+
+        # The deals query needs the query's real benchmark to filter on
+        sql, params = queries["benchmark"]
+        cursor.execute(sql, params)
+        median = cursor.fetchone()[0] or 0
+        queries["deals"] = (queries["deals"][0], (median, query_ids[0]))
+
+        plans = {}
+        for name, (sql, params) in queries.items():
+            start = time.perf_counter()
+            cursor.execute("EXPLAIN ANALYZE " + sql, params)
+            plan = "\n".join(row[0] for row in cursor.fetchall())
+            plans[name] = (plan, time.perf_counter() - start)
+        return plans
+    finally:
+        cursor.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=3000000)
+    parser.add_argument("--queries", type=int, default=40)
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--database", default="ebay_explain_scratch")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch database afterwards")
+    parser.add_argument("--output", help="report path (default: benchmarks/results/<time>-<commit>-explain.txt)")
+    args = parser.parse_args()
+
+    # One DB_WRITE line per batch would drown the output
+    logging.disable(logging.INFO)
+    started = datetime.now(timezone.utc)
+    db_config = migrate.db_config_from_env()
+    if args.database == db_config.get("database"):
+        sys.exit("Refusing to use MYSQL_DATABASE as the scratch database")
+    if not args.database.replace('_', '').isalnum():
+        sys.exit("Invalid scratch database name")
+
+    server_config = {k: v for k, v in db_config.items() if k != "database"}
+    admin = mysql.connector.connect(**server_config)
+    cursor = admin.cursor()
+    cursor.execute(f"DROP DATABASE IF EXISTS {args.database}")
+    cursor.execute(f"CREATE DATABASE {args.database}")
+    cursor.close()
+
+    conn = mysql.connector.connect(**server_config, database=args.database)
+    try:
+        migrate.migrate(conn, target=BASELINE_VERSION)
+
+        print(f"loading ~{args.rows:,} rows into {args.database}.{TABLE}")
+        start = time.perf_counter()
+        rows = load(conn, synthetic_rows(args.rows, args.queries, args.days, args.seed))
+        print(f"loaded {rows:,} rows in {time.perf_counter() - start:.0f}s")
+        query_ids = [f"{q:064x}" for q in range(args.queries)]
+
+        cursor = conn.cursor(buffered=True)
+        cursor.execute(f"ANALYZE TABLE {TABLE}")
+        cursor.fetchall()
+        before = explain_all(conn, "listing_url", query_ids)
+
+        start = time.perf_counter()
+        migrate.migrate(conn)
+        migrate_sec = time.perf_counter() - start
+        cursor.execute(f"ANALYZE TABLE {TABLE}")
+        cursor.fetchall()
+        cursor.close()
+        after = explain_all(conn, "listing_key", query_ids)
+    finally:
+        conn.close()
+        if not args.keep:
+            cursor = admin.cursor()
+            cursor.execute(f"DROP DATABASE IF EXISTS {args.database}")
+            cursor.close()
+        admin.close()
+
+    commit = git_commit()
+    lines = [
+        f"commit {commit}, {rows:,} rows, {args.queries} queries over {args.days} days",
+        f"migrations 0002+ applied in {migrate_sec:.1f}s",
+        "",
+        f"{'query':<12} {'before_ms':>10} {'after_ms':>10}",
+    ]
+    for name in before:
+        lines.append(f"{name:<12} {before[name][1] * 1000:>10.1f} {after[name][1] * 1000:>10.1f}")
+    for name in before:
+        for label, plans in (("before", before), ("after", after)):
+            lines += ["", f"== {name} ({label}) ==", plans[name][0]]
+    report = "\n".join(lines) + "\n"
+    print("\n" + "\n".join(lines[:4 + len(before)]))
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{started:%Y%m%dT%H%M%S}-{commit}-explain.txt"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(report)
+    print(f"\nreport written to {output}")
+
+
+if __name__ == "__main__":
+    main()
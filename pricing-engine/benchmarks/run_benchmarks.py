@@ -0,0 +1,268 @@
+"""
+Offline benchmark suite for the pricing engine hot paths.
+
+Runs fetch_keyword_items filtering, score_deals, trimmed_median, round2,
+save_deals_csv and insert_listings_to_db over synthetic itemSummaries
+(see synthetic.py), with no network and no MySQL: Browse pages come from
+the generator and the DB is an in-process stand-in that applies the
+uq_one_observation check. Results are written as JSON so runs from two
+commits can be compared.
+
+    python benchmarks/run_benchmarks.py                        # 1k and 100k items
+    python benchmarks/run_benchmarks.py --sizes 1000,100000,1000000
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/<old>.json
+
+1M items need several GB of RAM, since the raw dicts are held in memory
+like a real run would.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+ENGINE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ENGINE_DIR))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+# fetch_data pulls in ebay_auth, which refuses to import without credentials.
+# Nothing here talks to eBay, so placeholders are enough.
+os.environ.setdefault("CLIENT_ID", "benchmark")
+os.environ.setdefault("CLIENT_SECRET", "benchmark")
+os.environ.setdefault("MYSQL_TABLE", "ebay_listings")
+os.environ.setdefault("EBAY_TOKEN_BACKGROUND_REFRESH", "false")
+
+import fetch_data  # noqa: E402
+from listings_db import LISTING_COLUMNS  # noqa: E402
+from synthetic import DEFAULT_BLACKLIST, make_items  # noqa: E402
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+DEFAULT_SIZES = (1000, 100000)
+
+
+class StandInCursor:
+    def __init__(self, db: "StandInDB"):
+        self.db = db
+        self.rowcount = 0
+
+    def execute(self, sql: str, params: Optional[List[Any]] = None) -> None:
+        self.rowcount = self.db.insert(params or [])
+
+    def close(self) -> None:
+        pass
+
+
+class StandInDB:
+    """Keeps rows in memory and enforces uq_one_observation like the real table."""
+
+    _KEY = (
+        LISTING_COLUMNS.index("api_query_id"),
+        LISTING_COLUMNS.index("fetched_at"),
+        LISTING_COLUMNS.index("ebay_item_id"),
+    )
+
+    def __init__(self):
+        self.rows: List[tuple] = []
+        self.keys = set()
+
+    def insert(self, params: List[Any]) -> int:
+        width = len(LISTING_COLUMNS)
+        inserted = 0
+        for start in range(0, len(params), width):
+            row = tuple(params[start:start + width])
+            key = tuple(row[i] for i in self._KEY)
+            if key in self.keys:
+                continue
+            self.keys.add(key)
+            self.rows.append(row)
+            inserted += 1
+        return inserted
+
+    # Connection / pool interface used by insert_listings_to_db
+    def get_connection(self) -> "StandInDB":
+        return self
+
+    def cursor(self) -> StandInCursor:
+        return StandInCursor(self)
+
+    def commit(self) -> None:
+        pass
+
+    def rollback(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+def repeats_for(size: int) -> int:
+    if size <= 10000:
+        return 5
+    if size <= 100000:
+        return 3
+    return 1
+
+
+def measure(name: str, size: int, fn: Callable[[], Any], repeat: int) -> Dict[str, Any]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    median = statistics.median(samples)
+    return {
+        "name": name,
+        "size": size,
+        "repeat": repeat,
+        "median_sec": median,
+        "min_sec": min(samples),
+        "items_per_sec": size / median if median > 0 else None,
+    }
+
+
+def run_suite(sizes: List[int], seed: int) -> List[Dict[str, Any]]:
+    results: List[Dict[str, Any]] = []
+    for size in sizes:
+        print(f"-- {size:,} items", flush=True)
+        items = make_items(size, seed=seed)
+        repeat = repeats_for(size)
+
+        fetch_data.browse_search_pages = lambda *args, **kwargs: iter(items)
+        filtered = fetch_data.fetch_keyword_items(
+            "macbook pro", "EBAY_US", limit=size, blacklist=DEFAULT_BLACKLIST
+        )
+        totals = [rec.total for rec in filtered]
+        deals = fetch_data.score_deals(filtered, discount_threshold=0.15, trim_fraction=0.15)
+
+        cases: List[tuple] = [
+            ("fetch_keyword_items", lambda: fetch_data.fetch_keyword_items(
+                "macbook pro", "EBAY_US", limit=size, blacklist=DEFAULT_BLACKLIST
+            )),
+            ("score_deals", lambda: fetch_data.score_deals(filtered, discount_threshold=0.15, trim_fraction=0.15)),
+            ("trimmed_median", lambda: fetch_data.trimmed_median(totals, 0.15)),
+            ("round2", lambda: [fetch_data.round2(v) for v in totals]),
+        ]
+
+        csv_dir = tempfile.mkdtemp(prefix="bench_csv_")
+        csv_path = os.path.join(csv_dir, "deals.csv")
+
+        def save_csv() -> None:
+            if os.path.exists(csv_path):
+                os.unlink(csv_path)
+            fetch_data.save_deals_csv(deals, csv_path)
+
+        cases.append(("save_deals_csv", save_csv))
+
+        def insert() -> None:
+            db = StandInDB()
+            fetch_data.get_pool = lambda *args, **kwargs: db
+            fetch_data.insert_listings_to_db(
+                filtered,
+                marketplace_id="EBAY_US",
+                query_name="MacBook Pro",
+                api_query_text="macbook pro",
+                db_config={},
+            )
+
+        cases.append(("insert_listings_to_db", insert))
+
+        for name, fn in cases:
+            result = measure(name, size, fn, repeat)
+            result["input_items"] = {
+                "fetch_keyword_items": size,
+                "save_deals_csv": len(deals),
+            }.get(name, len(filtered))
+            results.append(result)
+            print(f"   {name:<24} {result['median_sec'] * 1000:>12.2f} ms", flush=True)
+
+        if os.path.exists(csv_path):
+            os.unlink(csv_path)
+        os.rmdir(csv_dir)
+    return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ENGINE_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(current: Dict[str, Any], baseline_path: str, threshold: float) -> bool:
+    """Print per-case ratios against a baseline; True if any case regressed."""
+    with open(baseline_path, "r") as f:
+        baseline = json.load(f)
+    base = {(r["name"], r["size"]): r for r in baseline["results"]}
+
+    print(f"\ncompared with {baseline['meta']['commit']} ({baseline_path})")
+    print(f"{'case':<24} {'size':>9} {'base ms':>11} {'now ms':>11} {'ratio':>7}")
+    regressed = False
+    for r in current["results"]:
+        old = base.get((r["name"], r["size"]))
+        if not old:
+            continue
+        ratio = r["median_sec"] / old["median_sec"] if old["median_sec"] else float("inf")
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            regressed = True
+        print(
+            f"{r['name']:<24} {r['size']:>9,} {old['median_sec'] * 1000:>11.2f} "
+            f"{r['median_sec'] * 1000:>11.2f} {ratio:>6.2f}x{flag}"
+        )
+    return regressed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Pricing engine offline benchmarks")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="comma-separated item counts (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="results JSON path (default: benchmarks/results/<time>-<commit>.json)")
+    parser.add_argument("--compare", help="baseline results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="slowdown ratio above which --compare reports a regression (default: %(default)s)")
+    args = parser.parse_args()
+
+    # DB_WRITE lines for every benchmark call would drown the output
+    logging.disable(logging.INFO)
+    fetch_data.SPOOL_DIR = ""
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    commit = git_commit()
+    started = datetime.now(timezone.utc)
+
+    report = {
+        "meta": {
+            "commit": commit,
+            "started_at": started.isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sizes": sizes,
+            "seed": args.seed,
+        },
+        "results": run_suite(sizes, args.seed),
+    }
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{started:%Y%m%dT%H%M%S}-{commit}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nresults written to {output}")
+
+    if args.compare and compare(report, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Synthetic Browse API `itemSummaries` for offline benchmarks.
+
+Items carry every field the pricing engine reads (price, shippingOptions,
+buyingOptions, condition, title, itemId, itemWebUrl) plus the image, seller
+and category blobs a real response includes, so memory and parsing costs
+are representative. Generation is deterministic for a given seed.
+"""
+import random
+from typing import Any, Dict, Iterator, List
+
+CONDITIONS = (
+    "New",
+    "New",
+    "Open box",
+    "Used",
+    "Used",
+    "Pre-Owned",
+    "Certified - Refurbished",
+    "For parts or not working",
+)
+
+BUYING_OPTIONS = (
+    ["FIXED_PRICE"],
+    ["FIXED_PRICE"],
+    ["FIXED_PRICE", "BEST_OFFER"],
+    ["AUCTION"],
+    ["AUCTION", "FIXED_PRICE"],
+)
+
+TITLE_WORDS = (
+    "apple", "macbook", "pro", "air", "m1", "m2", "14", "16", "inch", "512gb",
+    "1tb", "16gb", "ram", "space", "gray", "silver", "laptop", "excellent",
+    "condition", "bundle", "charger", "original", "box", "sealed", "fast",
+    "ship", "great", "battery", "unlocked", "2021", "2022", "2023",
+)
+
+# Words from a typical default blacklist, mixed into some titles
+JUNK_WORDS = ("for parts", "broken", "read description", "box only", "case", "cracked")
+
+DEFAULT_BLACKLIST = list(JUNK_WORDS)
+
+
+def make_item(rng: random.Random, n: int, base_price: float = 900.0) -> Dict[str, Any]:
+    price = max(1.0, rng.gauss(base_price, base_price * 0.25))
+    shipping = 0.0 if rng.random() < 0.6 else round(rng.uniform(5, 40), 2)
+
+    words = rng.sample(TITLE_WORDS, rng.randint(6, 11))
+    if rng.random() < 0.08:
+        words.insert(rng.randrange(len(words) + 1), rng.choice(JUNK_WORDS))
+    title = " ".join(words).title()[:80]
+
+    item_id = f"v1|{100000000000 + n}|0"
+    return {
+        "itemId": item_id,
+        "title": title,
+        "leafCategoryIds": ["111422"],
+        "categories": [
+            {"categoryId": "111422", "categoryName": "Apple Laptops"},
+            {"categoryId": "58058", "categoryName": "Computers/Tablets & Networking"},
+        ],
+        "image": {"imageUrl": f"https://i.ebayimg.com/images/g/{n:08x}/s-l225.jpg"},
+        "price": {"value": f"{price:.2f}", "currency": "USD"},
+        "itemHref": f"https://api.ebay.com/buy/browse/v1/item/{item_id}",
+        "seller": {
+            "username": f"seller_{n % 5000}",
+            "feedbackPercentage": f"{rng.uniform(95, 100):.1f}",
+            "feedbackScore": rng.randint(0, 50000),
+        },
+        "condition": rng.choice(CONDITIONS),
+        "conditionId": "3000",
+        "thumbnailImages": [{"imageUrl": f"https://i.ebayimg.com/images/g/{n:08x}/s-l1600.jpg"}],
+        "shippingOptions": (
+            [{"shippingCostType": "FIXED", "shippingCost": {"value": f"{shipping:.2f}", "currency": "USD"}}]
+            if rng.random() < 0.95 else []
+        ),
+        "buyingOptions": list(rng.choice(BUYING_OPTIONS)),
+        "itemWebUrl": f"https://www.ebay.com/itm/{100000000000 + n}?hash=item{n:x}:g:AbCdEfGhIjKlMnOp",
+        "itemLocation": {"postalCode": "9****", "country": "US"},
+        "adultOnly": False,
+        "legacyItemId": str(100000000000 + n),
+        "availableCoupons": False,
+        "itemCreationDate": "2024-01-01T00:00:00.000Z",
+        "topRatedBuyingExperience": rng.random() < 0.3,
+        "priorityListing": False,
+        "listingMarketplaceId": "EBAY_US",
+    }
+
+
+def iter_items(count: int, seed: int = 42) -> Iterator[Dict[str, Any]]:
+    rng = random.Random(seed)
+    for n in range(count):
+        yield make_item(rng, n)
+
+
+def make_items(count: int, seed: int = 42) -> List[Dict[str, Any]]:
+    return list(iter_items(count, seed))
+
+
+def make_search_page(items: List[Dict[str, Any]], offset: int, limit: int) -> Dict[str, Any]:
+    """A Browse search response body for one page of `items`."""
+    return {
+        "href": "https://api.ebay.com/buy/browse/v1/item_summary/search",
+        "total": len(items),
+        "limit": limit,
+        "offset": offset,
+        "itemSummaries": items[offset:offset + limit],
+    }
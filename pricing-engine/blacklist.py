@@ -0,0 +1,68 @@
+"""
+Compiled blacklist matching for listing titles.
+
+A blacklist is compiled once into a single regex whose alternation is
+factored as a character trie ("for parts" and "for repair" share the
+"for " prefix), so the regex engine walks each title once instead of
+running one substring scan per term. Compiled matchers are cached by their
+term tuple, so products that share the default blacklist share one matcher.
+"""
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, Optional, Pattern, Tuple
+
+
+def _trie_pattern(node: Dict[str, dict]) -> str:
+    is_end = "" in node
+    children = [(ch, child) for ch, child in sorted(node.items()) if ch != ""]
+    if not children:
+        return ""
+
+    leaves = [ch for ch, child in children if not child.keys() - {""}]
+    if len(leaves) == len(children) and len(leaves) > 1:
+        # All children end here: a character class is cheaper than an alternation
+        body = "[" + "".join(re.escape(ch) for ch in leaves) + "]"
+    else:
+        branches = [re.escape(ch) + _trie_pattern(child) for ch, child in children]
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+
+    if is_end:
+        return body + "?" if len(body) == 1 or body[0] in "[(" else "(?:" + body + ")?"
+    return body
+
+
+def trie_regex(terms: Iterable[str]) -> str:
+    """Regex source matching any of `terms`, with shared prefixes factored out."""
+    trie: Dict[str, dict] = {}
+    for term in terms:
+        if not term:
+            continue
+        node = trie
+        for ch in term:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+    return _trie_pattern(trie)
+
+
+@lru_cache(maxsize=128)
+def compile_blacklist(terms: Tuple[str, ...], word_boundary: bool = False) -> Optional[Pattern[str]]:
+    """
+    Compile lowercase blacklist `terms` into one pattern, or None if empty.
+    Empty terms are skipped; as a substring they would match every title.
+
+    With `word_boundary` a term only matches when it is not glued to other
+    word characters, so "case" no longer matches "showcase".
+    """
+    source = trie_regex(terms)
+    if not source:
+        return None
+    if word_boundary:
+        source = r"(?<!\w)(?:" + source + r")(?!\w)"
+    return re.compile(source)
+
+
+def matches_blacklist(title: str, terms: Tuple[str, ...], word_boundary: bool = False) -> bool:
+    pattern = compile_blacklist(terms, word_boundary)
+    if pattern is None:
+        return False
+    return pattern.search((title or "").lower()) is not None
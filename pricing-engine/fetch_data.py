@@ -4,14 +4,34 @@ import json
 import logging
 import os
 import time
-import statistics
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from decimal import Decimal, ROUND_HALF_UP
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Pattern, Tuple
 
 import mysql.connector
-import requests
+try:
+    import numpy as np
+except ImportError:  # optional: score_deals falls back to the pure-Python path
+    np = None
 from ebay_auth import get_token_cached  
+from blacklist import compile_blacklist, matches_blacklist
+from catalog import load_catalog
+from http_client import http_stats, max_requests_per_host, request as http_request
+from listings_db import (
+    INGEST_MODE as DB_INGEST_MODE,
+    LISTING_COLUMNS,
+    db_config_from_env,
+    refresh_benchmarks_for_ids,
+    WRITE_MODE as DB_WRITE_MODE,
+    bump_run_version,
+    get_pool,
+    table_name_from_env,
+    write_listing_rows,
+    write_listing_rows_delta,
+)
+from pipeline import Pipeline
+from spool import get_spool, listing_record
 
 from dotenv import load_dotenv
 from pathlib import Path
@@ -35,9 +55,32 @@ logger = logging.getLogger(__name__)
 
 BROWSE_BASE = "https://api.ebay.com/buy/browse/v1"
 
+# Run mode: "sequential" processes products one by one, "concurrent" fans them
+# out over a thread pool of FETCH_WORKERS threads, "pipeline" streams them
+# through fetch -> filter -> persist -> score stages (see build_pipeline).
+RUN_MODE = os.environ.get("FETCH_RUN_MODE", "sequential").lower()
+FETCH_WORKERS = max(1, int(os.environ.get("FETCH_WORKERS", 4)))
+# Pipeline mode: items travel between stages in chunks of this size, through
+# queues holding at most PIPELINE_QUEUE_SIZE chunks
+PIPELINE_CHUNK_SIZE = max(1, int(os.environ.get("PIPELINE_CHUNK_SIZE", 200)))
+PIPELINE_QUEUE_SIZE = max(1, int(os.environ.get("PIPELINE_QUEUE_SIZE", 8)))
+# When set, listings are appended to a local spool in this directory instead
+# of being written to MySQL; spool_loader.py drains it
+SPOOL_DIR = os.environ.get("DB_SPOOL_DIR", "")
+# Parallel page requests per product when a query spans several pages
+PAGE_WORKERS = max(1, int(os.environ.get("FETCH_PAGE_WORKERS", 4)))
+
+# Browse API caps `limit` at 200 per page and `offset + limit` at 10,000,
+# and requires `offset` to be a multiple of `limit`.
+BROWSE_MAX_PAGE_SIZE = 200
+BROWSE_MAX_RESULTS = 10000
+# score_deals switches to the NumPy path (when numpy is installed) from this
+# many items; below it the array setup costs more than it saves
+SCORE_COLUMNAR_MIN_ITEMS = max(0, int(os.environ.get("SCORE_COLUMNAR_MIN_ITEMS", 2000)))
+
 def load_config(path: str = "products.json") -> Dict[str, Any]:
-    with open(path, "r") as f:
-        return json.load(f)
+    """Parsed and validated products.json (shared, treat as read-only)."""
+    return load_catalog(path).config
 
 def build_blacklist(cfg: Dict[str, Any], product: Dict[str, Any]) -> List[str]:
     base = [s.lower() for s in cfg.get("default", {}).get("blacklist", [])]
@@ -72,12 +115,79 @@ def browse_search(q: str, marketplace_id: str, limit: int = 50, offset: int = 0)
     url = f"{BROWSE_BASE}/item_summary/search"
     params = {"q": q, "limit": limit, "offset": offset}
 
-    r = requests.get(url, headers=make_headers(marketplace_id), params=params, timeout=30)
+    r = http_request("GET", url, headers=make_headers(marketplace_id), params=params)
     if not r.ok:
         raise RuntimeError(f"Browse search failed: {r.status_code} {r.text}")
     return r.json()
 
 
+def plan_page_offsets(limit: int, page_size: int, max_pages: int) -> List[int]:
+    """Offsets needed to cover `limit` items, capped by the page budget and API window."""
+    page_size = max(1, min(page_size, BROWSE_MAX_PAGE_SIZE))
+    wanted = min(limit, page_size * max(1, max_pages), BROWSE_MAX_RESULTS)
+    return list(range(0, wanted, page_size))
+
+def browse_search_pages(
+    q: str,
+    marketplace_id: str,
+    limit: int,
+    page_size: int = BROWSE_MAX_PAGE_SIZE,
+    max_pages: int = 1
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yield up to `limit` raw itemSummaries for `q`.
+
+    All page offsets are planned up front and requested in parallel, but items
+    are yielded in page order as soon as each page lands, so callers can start
+    filtering page 1 while later pages are still in flight. Pages beyond the
+    reported `total` are cancelled, and items repeated across pages (offset
+    paging over a live result set can shift) are yielded once.
+    """
+    page_size = max(1, min(page_size, limit, BROWSE_MAX_PAGE_SIZE))
+    offsets = plan_page_offsets(limit, page_size, max_pages)
+    if not offsets:
+        return
+
+    pool = ThreadPoolExecutor(
+        max_workers=min(PAGE_WORKERS, len(offsets)),
+        thread_name_prefix="page"
+    )
+    futures = [
+        (offset, pool.submit(browse_search, q, marketplace_id, page_size, offset))
+        for offset in offsets
+    ]
+
+    remaining = min(limit, len(offsets) * page_size)
+    seen_ids = set()
+    try:
+        for index, (offset, future) in enumerate(futures):
+            data = future.result()
+            # The future would keep the whole page alive until the last page
+            # is done; callers keep only what they extract from each item
+            futures[index] = (offset, None)
+
+            total = data.get("total")
+            if total is not None:
+                for later_offset, later in futures:
+                    if later is not None and later_offset >= int(total):
+                        later.cancel()
+
+            for it in data.get("itemSummaries", []) or []:
+                item_id = it.get("itemId")
+                if item_id is not None:
+                    if item_id in seen_ids:
+                        continue
+                    seen_ids.add(item_id)
+                yield it
+                remaining -= 1
+                if remaining <= 0:
+                    return
+
+            if total is not None and offset + page_size >= int(total):
+                return
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
 def parse_money(m: Optional[Dict[str, Any]]) -> float:
     if not m:
         return 0.0
@@ -101,6 +211,8 @@ def is_fixed_price(item: Dict[str, Any]) -> bool:
     opts = item.get("buyingOptions") or []
     return "FIXED_PRICE" in opts
 
+CONDITION_BUCKETS = ("NEW", "USED", "OTHER")
+
 def condition_bucket(item: Dict[str, Any]) -> str:
     c = (item.get("condition") or "").lower()
     if "new" in c:
@@ -109,61 +221,224 @@ def condition_bucket(item: Dict[str, Any]) -> str:
         return "USED"
     return "OTHER"
 
-def looks_junk(title: str, blacklist: List[str]) -> bool:
-    t = (title or "").lower()
-    return any(bad in t for bad in blacklist)
+class ListingRecord:
+    """
+    The fields of an itemSummary the engine uses after filtering, extracted
+    once so the raw dict (images, seller, categories...) can be dropped.
+    `price` is the parsed item price and `total` adds the first shipping
+    option; `price_money` and `buying_options` are the original values the
+    deals CSV reports.
+    """
+    __slots__ = (
+        "item_id", "title", "url", "condition", "bucket",
+        "price", "currency", "total", "price_money", "buying_options",
+    )
+
+    def __init__(
+        self,
+        item_id: Optional[str],
+        title: Optional[str],
+        url: Optional[str],
+        condition: Optional[str],
+        bucket: str,
+        price: float,
+        currency: str,
+        total: float,
+        price_money: Optional[Dict[str, Any]],
+        buying_options: Optional[List[str]]
+    ):
+        self.item_id = item_id
+        self.title = title
+        self.url = url
+        self.condition = condition
+        self.bucket = bucket
+        self.price = price
+        self.currency = currency
+        self.total = total
+        self.price_money = price_money
+        self.buying_options = buying_options
+
+    @classmethod
+    def from_item(cls, item: Dict[str, Any]) -> "ListingRecord":
+        price_money = item.get("price")
+        return cls(
+            item_id=item.get("itemId"),
+            title=item.get("title"),
+            url=item.get("itemWebUrl"),
+            condition=item.get("condition"),
+            bucket=condition_bucket(item),
+            price=parse_money(price_money),
+            currency=(price_money or {}).get("currency", "USD"),
+            total=total_price(item),
+            price_money=price_money,
+            buying_options=item.get("buyingOptions"),
+        )
 
+def looks_junk(title: str, blacklist: List[str], word_boundary: bool = False) -> bool:
+    return matches_blacklist(title, tuple(blacklist), word_boundary)
+
+
+def trim_ranks(n: int, trim_fraction: float) -> Tuple[int, int]:
+    """
+    0-based ranks of the order statistics whose mean is the trimmed median of
+    n values: the middle of the sorted slice [k, max(n - k, k + 1)). Equal
+    ranks when that slice has odd length.
+    """
+    if n < 5:
+        lo, hi = 0, n
+    else:
+        k = int(n * trim_fraction)
+        lo, hi = k, max(n - k, k + 1)
+    m = hi - lo
+    return lo + (m - 1) // 2, lo + m // 2
+
+def _select(vals: List[float], i: int, pair: bool = False) -> Tuple[float, float]:
+    """
+    The i-th smallest of vals (and the (i+1)-th when pair is set), by
+    quickselect with a three-way partition. Falls back to a sort after
+    2*log2(n) rounds without converging, so the worst case stays O(n log n).
+    """
+    budget = 2 * max(1, len(vals).bit_length())
+    while budget:
+        budget -= 1
+        p = sorted((vals[0], vals[len(vals) // 2], vals[-1]))[1]
+        lower = [v for v in vals if v < p]
+        equal = sum(1 for v in vals if v == p)
+        upper_start = len(lower) + equal
+
+        if i < len(lower):
+            if pair and i + 1 == len(lower):
+                return max(lower), p
+            vals = lower
+        elif i < upper_start:
+            if not pair or i + 1 < upper_start:
+                return p, p
+            return p, min(v for v in vals if v > p)
+        else:
+            vals = [v for v in vals if v > p]
+            i -= upper_start
+
+    vals = sorted(vals)
+    return vals[i], (vals[i + 1] if pair else vals[i])
 
 def trimmed_median(values: List[float], trim_fraction: float) -> Optional[float]:
-    vals = sorted(v for v in values if v is not None)
+    vals = [v for v in values if v is not None]
     n = len(vals)
     if n == 0:
         return None
-    if n < 5:
-        return statistics.median(vals)
 
-    k = int(n * trim_fraction)
-    trimmed = vals[k: max(n - k, k + 1)]
-    if not trimmed:
-        return statistics.median(vals)
-    return statistics.median(trimmed)
+    # Only one or two order statistics are needed, so select them in O(n)
+    # rather than sorting everything
+    lo, hi = trim_ranks(n, trim_fraction)
+    a, b = _select(vals, lo, pair=hi != lo)
+    if hi == lo:
+        return a
+    return (a + b) / 2
+
+def trimmed_median_array(values: "np.ndarray", trim_fraction: float) -> Optional[float]:
+    """trimmed_median for a float64 array, via numpy.partition (introselect)."""
+    n = len(values)
+    if n == 0:
+        return None
+    lo, hi = trim_ranks(n, trim_fraction)
+    part = np.partition(values, (lo, hi) if hi != lo else lo)
+    if hi == lo:
+        return float(part[lo])
+    return (float(part[lo]) + float(part[hi])) / 2
 
 def round2(val: float) -> float:
     return float(Decimal(str(val)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP))
 
 def score_deals(
-    items: List[Dict[str, Any]],
+    items: List[ListingRecord],
+    discount_threshold: float,
+    trim_fraction: float
+) -> List[Dict[str, Any]]:
+    if np is not None and len(items) >= SCORE_COLUMNAR_MIN_ITEMS:
+        return score_deals_columnar(items, discount_threshold, trim_fraction)
+    return score_deals_python(items, discount_threshold, trim_fraction)
+
+def deal_record(rec: ListingRecord, bucket_median: float, discount_pct: float) -> Dict[str, Any]:
+    return {
+        "condition": rec.bucket,
+        "bucket_median": bucket_median,
+        "discount_pct": discount_pct,
+        "total": rec.total,
+        "title": rec.title,
+        "itemId": rec.item_id,
+        "url": rec.url,
+        "item_condition": rec.condition,
+        "buyingOptions": rec.buying_options,
+        "price": rec.price_money,
+    }
+
+def score_deals_python(
+    items: List[ListingRecord],
     discount_threshold: float,
     trim_fraction: float
 ) -> List[Dict[str, Any]]:
-    condition_groups: Dict[str, List[Dict[str, Any]]] = {}
-    for it in items:
-        condition_groups.setdefault(condition_bucket(it), []).append(it)
+    condition_groups: Dict[str, List[ListingRecord]] = {}
+    for rec in items:
+        condition_groups.setdefault(rec.bucket, []).append(rec)
 
     deals: List[Dict[str, Any]] = []
 
-    for cond, cond_items in condition_groups.items():
-        totals = [total_price(it) for it in cond_items]
-        med = trimmed_median(totals, trim_fraction)
+    for cond_items in condition_groups.values():
+        med = trimmed_median([rec.total for rec in cond_items], trim_fraction)
         if med is None or med <= 0:
             continue
 
-        for it in cond_items:
-            t = total_price(it)
-            disc = (med - t) / med
+        for rec in cond_items:
+            disc = (med - rec.total) / med
             if disc >= discount_threshold:
-                deals.append({
-                    "condition": cond,
-                    "bucket_median": round2(med),
-                    "discount_pct": round2(disc),
-                    "total": t,
-                    "title": it.get("title"),
-                    "itemId": it.get("itemId"),
-                    "url": it.get("itemWebUrl"),
-                    "item_condition": it.get("condition"),
-                    "buyingOptions": it.get("buyingOptions"),
-                    "price": it.get("price"),
-                })
+                deals.append(deal_record(rec, round2(med), round2(disc)))
+
+    deals.sort(key=lambda d: d["discount_pct"], reverse=True)
+    return deals
+
+def score_deals_columnar(
+    items: List[ListingRecord],
+    discount_threshold: float,
+    trim_fraction: float
+) -> List[Dict[str, Any]]:
+    """
+    NumPy version of score_deals_python with identical output.
+
+    Totals and condition codes are extracted once into arrays; bucket medians
+    and discounts are computed on the arrays, and deal dicts are built only
+    for rows that pass discount_threshold.
+    """
+    n = len(items)
+    if n == 0:
+        return []
+
+    bucket_codes = {b: i for i, b in enumerate(CONDITION_BUCKETS)}
+    totals = np.fromiter((rec.total for rec in items), dtype=np.float64, count=n)
+    codes = np.fromiter((bucket_codes[rec.bucket] for rec in items), dtype=np.int8, count=n)
+
+    medians = np.full(len(CONDITION_BUCKETS), np.nan)
+    for code in range(len(CONDITION_BUCKETS)):
+        med = trimmed_median_array(totals[codes == code], trim_fraction)
+        if med is not None and med > 0:
+            medians[code] = med
+
+    item_medians = medians[codes]
+    with np.errstate(invalid="ignore"):
+        discounts = (item_medians - totals) / item_medians
+        passing = np.flatnonzero(discounts >= discount_threshold)
+
+    # Emit in the same order as the dict-of-lists version (buckets in order of
+    # first appearance, items in input order) so the stable sort below breaks
+    # discount_pct ties identically
+    first_seen = np.full(len(CONDITION_BUCKETS), n)
+    np.minimum.at(first_seen, codes, np.arange(n))
+    passing = passing[np.argsort(first_seen[codes[passing]], kind="stable")]
+
+    rounded_medians = {code: round2(float(medians[code])) for code in np.unique(codes[passing]).tolist()}
+    deals = [
+        deal_record(items[i], rounded_medians[code], round2(float(discounts[i])))
+        for i, code in zip(passing.tolist(), codes[passing].tolist())
+    ]
 
     deals.sort(key=lambda d: d["discount_pct"], reverse=True)
     return deals
@@ -174,19 +449,40 @@ def fetch_keyword_items(
     limit: int,
     blacklist: List[str],
     min_price: float = 1.0,
-    conditions: Optional[List[str]] = None
-) -> List[Dict[str, Any]]:
-    data = browse_search(keyword, marketplace_id=marketplace_id, limit=limit)
-    raw = data.get("itemSummaries", []) or []
+    conditions: Optional[List[str]] = None,
+    page_size: int = BROWSE_MAX_PAGE_SIZE,
+    max_pages: int = 1,
+    word_boundary: bool = False
+) -> List[ListingRecord]:
+    # Compiled once per distinct blacklist and shared across products
+    junk_pattern = compile_blacklist(tuple(blacklist), word_boundary)
+
+    raw = browse_search_pages(
+        keyword,
+        marketplace_id=marketplace_id,
+        limit=limit,
+        page_size=page_size,
+        max_pages=max_pages
+    )
+
+    return [
+        ListingRecord.from_item(it)
+        for it in filter_items(raw, junk_pattern, min_price=min_price, conditions=conditions)
+    ]
 
-    cleaned: List[Dict[str, Any]] = []
+def filter_items(
+    raw: Iterable[Dict[str, Any]],
+    junk_pattern: Optional[Pattern[str]],
+    min_price: float = 1.0,
+    conditions: Optional[List[str]] = None
+) -> Iterator[Dict[str, Any]]:
     for it in raw:
         title = it.get("title") or ""
         if not title:
             continue
         if not is_fixed_price(it):
             continue
-        if looks_junk(title, blacklist):
+        if junk_pattern is not None and junk_pattern.search(title.lower()):
             continue
         if parse_money(it.get("price")) < min_price:
             continue
@@ -196,20 +492,50 @@ def fetch_keyword_items(
             if item_condition not in conditions:
                 continue
 
-        cleaned.append(it)
+        yield it
 
-    return cleaned
+def utc_timestamp() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+def listing_row(
+    rec: ListingRecord,
+    marketplace_id: str,
+    query_name: str,
+    api_query_text: str,
+    api_query_id: str,
+    fetched_at: str
+) -> Tuple:
+    """Normalize one listing into an ebay_listings row (LISTING_COLUMNS order)."""
+    cond_description = rec.condition
+    if cond_description:
+        cond_description = cond_description[:255]  
+
+    return (
+        marketplace_id,
+        query_name[:64], 
+        api_query_text[:255],
+        api_query_id,
+        fetched_at,
+        fetched_at,
+        (rec.item_id or "")[:64],  
+        (rec.title or "")[:512],
+        rec.bucket[:64],
+        cond_description,
+        (rec.url or "")[:2048],
+        rec.price,
+        rec.currency[:3],
+    )
 
 def insert_listings_to_db(
-    items: List[Dict[str, Any]],
+    items: List[ListingRecord],
     marketplace_id: str,
     query_name: str,
     api_query_text: str,
-    db_config: Dict[str, Any]
+    db_config: Dict[str, Any],
+    fetched_at: Optional[str] = None
 ) -> int:
     operation_start = time.perf_counter()
     records_attempted = len(items)
-    records_failed = 0
     
     if not items:
         logger.info(
@@ -221,7 +547,7 @@ def insert_listings_to_db(
     
     api_query_id = hashlib.sha256(api_query_text.encode("utf-8")).hexdigest()
     
-    fetched_at = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    fetched_at = fetched_at or utc_timestamp()
     table_name = os.environ.get("MYSQL_TABLE", "")
     
     if not table_name or not table_name.replace('_', '').isalnum():
@@ -231,85 +557,46 @@ def insert_listings_to_db(
         )
         raise ValueError("Invalid table name configuration")
     
-    insert_sql = f"""
-        INSERT INTO  {table_name} (
-            marketplace_id,
-            query_name,
-            api_query_text,
-            api_query_id,
-            fetched_at,
-            ebay_item_id,
-            title,
-            condition_category,
-            condition_description,
-            listing_url,
-            price,
-            currency
-        ) VALUES (
-            %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
+    rows = [
+        listing_row(rec, marketplace_id, query_name, api_query_text, api_query_id, fetched_at)
+        for rec in items
+    ]
+    
+    if SPOOL_DIR:
+        segment = get_spool(SPOOL_DIR).append(
+            listing_record(LISTING_COLUMNS, rows, query_name, api_query_id)
         )
-        ON DUPLICATE KEY UPDATE id=id
-    """
+        duration_ms = (time.perf_counter() - operation_start) * 1000
+        logger.info(
+            "DB_WRITE | query=%s | table=%s | marketplace=%s | mode=spool | "
+            "records_attempted=%d | records_spooled=%d | segment=%s | duration_ms=%.2f | status=SPOOLED",
+            query_name, table_name, marketplace_id,
+            records_attempted, len(rows), segment, duration_ms
+        )
+        return len(rows)
     
-    rows_inserted = 0
     conn = None
-    cursor = None
     
     try:
-        conn = mysql.connector.connect(**db_config)
-        cursor = conn.cursor()
-        
-        for item in items:
-            ebay_item_id = item.get("itemId", "")
-            title = (item.get("title") or "")[:512]
-            
-            cond_category = condition_bucket(item)
-            cond_description = item.get("condition")
-            if cond_description:
-                cond_description = cond_description[:255]  
-            
-            listing_url = (item.get("itemWebUrl") or "")[:2048]  
-            
-            price_data = item.get("price") or {}
-            price = parse_money(price_data)
-            currency = price_data.get("currency", "USD")[:3]
-            
-            row_data = (
-                marketplace_id,
-                query_name[:64], 
-                api_query_text[:255],
-                api_query_id,
-                fetched_at,
-                ebay_item_id[:64],  
-                title,
-                cond_category[:64],
-                cond_description,
-                listing_url,
-                price,
-                currency,
+        # One connection per concurrent worker, reused for the whole run
+        pool_size = FETCH_WORKERS if RUN_MODE == "concurrent" else 1
+        conn = get_pool(db_config, pool_size=pool_size).get_connection()
+        if DB_INGEST_MODE == "delta":
+            rows_inserted, records_failed, records_unchanged = write_listing_rows_delta(
+                conn, table_name, rows, query_name
             )
-            
-            try:
-                cursor.execute(insert_sql, row_data)
-                if cursor.rowcount > 0:
-                    rows_inserted += 1
-            except mysql.connector.Error as e:
-                records_failed += 1
-                logger.warning(
-                    "DB_WRITE_ITEM | query=%s | ebay_item_id=%s | status=FAILED | error=%s",
-                    query_name, ebay_item_id, str(e)
-                )
-        
-        conn.commit()
+        else:
+            rows_inserted, records_failed = write_listing_rows(conn, table_name, rows, query_name)
+            records_unchanged = 0
         
         duration_ms = (time.perf_counter() - operation_start) * 1000
         logger.info(
-            "DB_WRITE | query=%s | table=%s | marketplace=%s | "
+            "DB_WRITE | query=%s | table=%s | marketplace=%s | mode=%s | ingest=%s | "
             "records_attempted=%d | records_written=%d | records_failed=%d | "
-            "records_skipped=%d | duration_ms=%.2f | status=SUCCESS",
-            query_name, table_name, marketplace_id,
-            records_attempted, rows_inserted, records_failed,
-            records_attempted - rows_inserted - records_failed, duration_ms
+            "records_unchanged=%d | records_skipped=%d | duration_ms=%.2f | status=SUCCESS",
+            query_name, table_name, marketplace_id, DB_WRITE_MODE, DB_INGEST_MODE,
+            records_attempted, rows_inserted, records_failed, records_unchanged,
+            records_attempted - rows_inserted - records_failed - records_unchanged, duration_ms
         )
         
     except mysql.connector.Error as e:
@@ -319,18 +606,21 @@ def insert_listings_to_db(
             "duration_ms=%.2f | status=FAILED | error=%s",
             query_name, table_name, records_attempted, duration_ms, str(e)
         )
-        if conn:
-            conn.rollback()
         raise
     finally:
-        if cursor:
-            cursor.close()
         if conn:
+            # Returns the connection to the run-wide pool
             conn.close()
     
     return rows_inserted
 
 
+def refresh_benchmarks(queries: List[str], db_config: Dict[str, Any]) -> None:
+    """Upsert query_benchmarks for the queries this run ingested."""
+    api_query_ids = [hashlib.sha256(q.encode("utf-8")).hexdigest() for q in queries]
+    refresh_benchmarks_for_ids(db_config, table_name_from_env(), api_query_ids)
+
+
 def print_deals(name: str, keyword: str, deals: List[Dict[str, Any]], discount_threshold: float, top_n: int = 10):
     print("\n" + "=" * 90)
     print(f"{name} (query: '{keyword}') — deals (≥ {int(discount_threshold * 100)}% below trimmed median)")
@@ -380,71 +670,277 @@ def save_deals_csv(deals: List[Dict[str, Any]], path: str) -> None:
                     row[key] = val
             writer.writerow(row)
 
+def product_settings(cfg: Dict[str, Any], product: Dict[str, Any]) -> Dict[str, Any]:
+    """Resolve a product's fetch/score settings against the config defaults."""
+    cfg_default = cfg.get("default", {})
+    limit = int(get_with_default(product, cfg_default, "limit", 100))
+    page_size = int(get_with_default(product, cfg_default, "page_size", BROWSE_MAX_PAGE_SIZE))
+    max_pages = int(get_with_default(product, cfg_default, "max_pages", 5))
+    word_boundary = bool(get_with_default(product, cfg_default, "blacklist_word_boundary", False))
+
+    return {
+        "name": product.get("name", product.get("query", "Unnamed")),
+        "query": product["query"],
+        "limit": limit,
+        "discount_threshold": float(get_with_default(product, cfg_default, "discount_threshold", 0.15)),
+        "trim_fraction": float(get_with_default(product, cfg_default, "trim_fraction", 0.15)),
+        "min_price": float(get_with_default(product, cfg_default, "min_price", 1.0)),
+        "conditions": get_with_default(product, cfg_default, "conditions", None),
+        "page_size": page_size,
+        "max_pages": max_pages,
+        "word_boundary": word_boundary,
+        "blacklist": build_blacklist(cfg, product),
+    }
+
+def log_fetch_start(settings: Dict[str, Any]) -> None:
+    limit = settings["limit"]
+    logger.info(
+        "FETCH_START | query=%s | limit=%d | pages_planned=%d",
+        settings["name"], limit,
+        len(plan_page_offsets(limit, min(settings["page_size"], limit), settings["max_pages"]))
+    )
+
+def process_product(
+    cfg: Dict[str, Any],
+    product: Dict[str, Any],
+    marketplace_id: str,
+    db_config: Dict[str, Any]
+) -> Dict[str, Any]:
+    """Fetch, store and score a single product; safe to run from worker threads."""
+    settings = product_settings(cfg, product)
+    name = settings["name"]
+    query = settings["query"]
+
+    log_fetch_start(settings)
+
+    items = fetch_keyword_items(
+        keyword=query,
+        marketplace_id=marketplace_id,
+        limit=settings["limit"],
+        blacklist=settings["blacklist"],
+        min_price=settings["min_price"],
+        conditions=settings["conditions"],
+        page_size=settings["page_size"],
+        max_pages=settings["max_pages"],
+        word_boundary=settings["word_boundary"]
+    )
+
+    logger.info("FETCH_COMPLETE | query=%s | items_fetched=%d", name, len(items))
+
+    records_written = insert_listings_to_db(
+        items,
+        marketplace_id=marketplace_id,
+        query_name=name,
+        api_query_text=query,
+        db_config=db_config
+    )
+
+    deals = score_deals(
+        items,
+        discount_threshold=settings["discount_threshold"],
+        trim_fraction=settings["trim_fraction"]
+    )
+
+    return {
+        "name": name,
+        "query": query,
+        "items_fetched": len(items),
+        "records_written": records_written,
+        "discount_threshold": settings["discount_threshold"],
+        "deals": deals,
+    }
+
+def run_products(
+    cfg: Dict[str, Any],
+    marketplace_id: str,
+    db_config: Dict[str, Any],
+    mode: str = "sequential",
+    workers: int = 1
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yield per-product results in products.json order.
+
+    In "concurrent" mode products are processed on a thread pool, but results
+    are still yielded in config order so callers see the same sequence (and the
+    same first error) as a sequential run.
+    """
+    products = cfg.get("products", [])
+
+    if mode != "concurrent" or workers <= 1:
+        for product in products:
+            yield process_product(cfg, product, marketplace_id, db_config)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="product") as pool:
+        futures = [
+            pool.submit(process_product, cfg, product, marketplace_id, db_config)
+            for product in products
+        ]
+        try:
+            for future in futures:
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+def build_pipeline(
+    cfg: Dict[str, Any],
+    marketplace_id: str,
+    db_config: Dict[str, Any]
+) -> Pipeline:
+    """
+    Streaming run: fetch -> filter -> persist -> score, joined by bounded queues.
+
+    FETCH_WORKERS products are fetched at once, each emitting raw items in
+    chunks of PIPELINE_CHUNK_SIZE as pages arrive, so filtering and DB writes
+    for one product overlap the HTTP fetches of the next. Filter, persist and
+    score run on one worker each, which keeps each product's chunks in order
+    and ahead of its "end" marker. The source takes products.json entries and
+    the score stage emits the same result dicts as process_product, in
+    completion order. Only the score stage holds a product's full item list,
+    because the trimmed median needs every price.
+    """
+
+    def fetch(product: Dict[str, Any]) -> Iterator[Tuple[str, Dict[str, Any], Any]]:
+        settings = product_settings(cfg, product)
+        ctx = {
+            "settings": settings,
+            "fetched_at": utc_timestamp(),
+            "items_fetched": 0,
+            "records_written": 0,
+            "items": [],
+            "junk_pattern": compile_blacklist(tuple(settings["blacklist"]), settings["word_boundary"]),
+        }
+        log_fetch_start(settings)
+
+        chunk: List[Dict[str, Any]] = []
+        for it in browse_search_pages(
+            settings["query"],
+            marketplace_id=marketplace_id,
+            limit=settings["limit"],
+            page_size=settings["page_size"],
+            max_pages=settings["max_pages"]
+        ):
+            chunk.append(it)
+            if len(chunk) >= PIPELINE_CHUNK_SIZE:
+                yield ("chunk", ctx, chunk)
+                chunk = []
+        if chunk:
+            yield ("chunk", ctx, chunk)
+        yield ("end", ctx, None)
+
+    def filter_chunk(msg: Tuple[str, Dict[str, Any], Any]) -> Iterator[Tuple[str, Dict[str, Any], Any]]:
+        kind, ctx, raw = msg
+        settings = ctx["settings"]
+        if kind == "end":
+            logger.info("FETCH_COMPLETE | query=%s | items_fetched=%d", settings["name"], ctx["items_fetched"])
+            yield msg
+            return
+
+        cleaned = [
+            ListingRecord.from_item(it)
+            for it in filter_items(
+                raw,
+                ctx["junk_pattern"],
+                min_price=settings["min_price"],
+                conditions=settings["conditions"]
+            )
+        ]
+        ctx["items_fetched"] += len(cleaned)
+        if cleaned:
+            yield ("chunk", ctx, cleaned)
+
+    def persist(msg: Tuple[str, Dict[str, Any], Any]) -> Iterator[Tuple[str, Dict[str, Any], Any]]:
+        kind, ctx, items = msg
+        if kind == "chunk":
+            settings = ctx["settings"]
+            ctx["records_written"] += insert_listings_to_db(
+                items,
+                marketplace_id=marketplace_id,
+                query_name=settings["name"],
+                api_query_text=settings["query"],
+                db_config=db_config,
+                fetched_at=ctx["fetched_at"]
+            )
+        yield msg
+
+    def score(msg: Tuple[str, Dict[str, Any], Any]) -> Iterator[Dict[str, Any]]:
+        kind, ctx, items = msg
+        if kind == "chunk":
+            ctx["items"].extend(items)
+            return
+
+        settings = ctx["settings"]
+        deals = score_deals(
+            ctx.pop("items"),
+            discount_threshold=settings["discount_threshold"],
+            trim_fraction=settings["trim_fraction"]
+        )
+        yield {
+            "name": settings["name"],
+            "query": settings["query"],
+            "items_fetched": ctx["items_fetched"],
+            "records_written": ctx["records_written"],
+            "discount_threshold": settings["discount_threshold"],
+            "deals": deals,
+        }
+
+    return (
+        Pipeline(queue_size=PIPELINE_QUEUE_SIZE)
+        .add_stage("fetch", fetch, workers=FETCH_WORKERS)
+        .add_stage("filter", filter_chunk)
+        .add_stage("persist", persist)
+        .add_stage("score", score)
+    )
+
 if __name__ == "__main__":    
     BASE_DIR = Path(__file__).resolve().parent
     cfg = load_config(str(BASE_DIR / "products.json"))
 
     marketplace_id = cfg.get("marketplace_id", "EBAY_US")
-    cfg_default = cfg.get("default", {})
+    db_config = db_config_from_env()
 
     run_start = time.time()
     total_products = len(cfg.get("products", []))
     total_items_fetched = 0
     total_records_written = 0
     total_deals_found = 0
+    ingested_queries: List[str] = []
     
     logger.info(
-        "RUN_START | products_count=%d | marketplace=%s",
-        total_products, marketplace_id
+        "RUN_START | products_count=%d | marketplace=%s | mode=%s | workers=%d | "
+        "max_per_host=%d | db_write_mode=%s | db_ingest_mode=%s | spool_dir=%s",
+        total_products, marketplace_id, RUN_MODE, FETCH_WORKERS, max_requests_per_host(),
+        DB_WRITE_MODE, DB_INGEST_MODE, SPOOL_DIR or "none"
     )
 
-    for product in cfg.get("products", []):
-        name = product.get("name", product.get("query", "Unnamed"))
-        query = product["query"]
-
-        limit = int(get_with_default(product, cfg_default, "limit", 100))
-        discount_threshold = float(get_with_default(product, cfg_default, "discount_threshold", 0.15))
-        trim_fraction = float(get_with_default(product, cfg_default, "trim_fraction", 0.15))
-        min_price = float(get_with_default(product, cfg_default, "min_price", 1.0))
-        conditions = get_with_default(product, cfg_default, "conditions", None)
+    pipeline = None
+    if RUN_MODE == "pipeline":
+        pipeline = build_pipeline(cfg, marketplace_id, db_config)
+        results = pipeline.run(cfg.get("products", []))
+    else:
+        results = run_products(cfg, marketplace_id, db_config, mode=RUN_MODE, workers=FETCH_WORKERS)
 
-        blacklist = build_blacklist(cfg, product)
-        
-        logger.info("FETCH_START | query=%s | limit=%d", name, limit)
-        
-        items = fetch_keyword_items(
-            keyword=query,
-            marketplace_id=marketplace_id,
-            limit=limit,
-            blacklist=blacklist,
-            min_price=min_price,
-            conditions=conditions
-        )
-        
-        total_items_fetched += len(items)
-        logger.info("FETCH_COMPLETE | query=%s | items_fetched=%d", name, len(items))
-        
-        db_config = {
-            "host": os.environ.get("MYSQL_HOST", "localhost"),
-            "port": int(os.environ.get("MYSQL_PORT", 3306)),
-            "user": os.environ.get("MYSQL_USER", "root"),
-            "password": os.environ.get("MYSQL_PASSWORD", ""),
-            "database": os.environ.get("MYSQL_DATABASE", ""),
-        }
+    for result in results:
+        total_items_fetched += result["items_fetched"]
+        total_records_written += result["records_written"]
+        ingested_queries.append(result["query"])
 
-        records_written = insert_listings_to_db(
-            items, 
-            marketplace_id=marketplace_id, 
-            query_name=name, 
-            api_query_text=query, 
-            db_config=db_config
-        )
-        total_records_written += records_written
-        
-        deals = score_deals(items, discount_threshold=discount_threshold, trim_fraction=trim_fraction)
+        deals = result["deals"]
         total_deals_found += len(deals)
+        # CSV writes stay on the main thread (in products.json order, or
+        # completion order in pipeline mode)
         save_deals_csv(deals, f"logs/deals.csv") # add _{name} to csv to have separate files for each product - keeping one massive file for now
-        # print_deals(name, query, deals, discount_threshold, top_n=10)
+        # print_deals(result["name"], result["query"], deals, result["discount_threshold"], top_n=10)
+
+    if SPOOL_DIR:
+        sealed = get_spool(SPOOL_DIR).seal()
+        logger.info("SPOOL_SEAL | dir=%s | segment=%s", SPOOL_DIR, sealed.name if sealed else "none")
+    else:
+        # With a spool, spool_loader.py refreshes benchmarks and bumps the run
+        # version once rows are loaded
+        refresh_benchmarks(ingested_queries, db_config)
+        bump_run_version()
 
     run_duration = time.time() - run_start
     logger.info(
@@ -453,3 +949,21 @@ if __name__ == "__main__":
         total_products, total_items_fetched, total_records_written, 
         total_deals_found, run_duration
     )
+
+    http_totals = http_stats()
+    logger.info(
+        "HTTP_SUMMARY | requests=%d | connections_opened=%d | connect_ms=%.2f | transfer_ms=%.2f",
+        http_totals["requests"], http_totals["connections_opened"],
+        http_totals["connect_ms"], http_totals["transfer_ms"]
+    )
+
+    if pipeline is not None:
+        for m in pipeline.metrics():
+            logger.info(
+                "PIPELINE_STAGE | stage=%s | workers=%d | items_in=%d | items_out=%d | "
+                "busy_sec=%.3f | starved_sec=%.3f | blocked_sec=%.3f | "
+                "queue_capacity=%d | queue_max_depth=%d | queue_avg_depth=%.2f",
+                m["stage"], m["workers"], m["items_in"], m["items_out"],
+                m["busy_sec"], m["starved_sec"], m["blocked_sec"],
+                m["queue_capacity"], m["queue_max_depth"], m["queue_avg_depth"]
+            )
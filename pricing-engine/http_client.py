@@ -0,0 +1,179 @@
+"""
+Shared HTTP client for the Browse and OAuth calls.
+
+A single pooled requests.Session per process keeps TLS connections to
+api.ebay.com alive between requests, so only the first call to a host pays
+the TCP + TLS handshake. Every request is timed and logged with its latency
+split into connect time (0 when a pooled connection was reused) and transfer
+time (request write, server wait and body download).
+
+Settings are read from the environment when the session is first built:
+    HTTP_POOL_SIZE         connections kept per host (default 10)
+    HTTP_KEEP_ALIVE        reuse connections between requests (default true)
+    HTTP_CONNECT_TIMEOUT   seconds to establish a connection (default 5)
+    HTTP_READ_TIMEOUT      seconds to wait for response data (default 30)
+    FETCH_MAX_PER_HOST     in-flight requests allowed per host (default 4)
+"""
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+logger = logging.getLogger(__name__)
+
+_timing = threading.local()
+
+
+class _TimedConnectMixin:
+    """Adds the time spent in connect() (TCP + TLS) to the calling thread's counter."""
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _timing.connect_s = getattr(_timing, "connect_s", 0.0) + (time.perf_counter() - start)
+            _timing.connections = getattr(_timing, "connections", 0) + 1
+
+
+class TimedHTTPConnection(_TimedConnectMixin, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(_TimedConnectMixin, HTTPSConnection):
+    pass
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": TimedHTTPConnectionPool,
+            "https": TimedHTTPSConnectionPool,
+        }
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    val = os.environ.get(name)
+    if val is None:
+        return default
+    return val.strip().lower() not in ("0", "false", "no", "off")
+
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+_timeout = (5.0, 30.0)
+_max_per_host = 4
+
+_host_slots: Dict[str, threading.BoundedSemaphore] = {}
+_host_slots_lock = threading.Lock()
+
+_stats_lock = threading.Lock()
+_stats = {
+    "requests": 0,
+    "connections_opened": 0,
+    "connect_ms": 0.0,
+    "transfer_ms": 0.0,
+}
+
+
+def get_session() -> requests.Session:
+    """Return the process-wide session, building it on first use."""
+    global _session, _timeout, _max_per_host
+    if _session is not None:
+        return _session
+
+    with _session_lock:
+        if _session is None:
+            pool_size = max(1, int(os.environ.get("HTTP_POOL_SIZE", 10)))
+            _timeout = (
+                float(os.environ.get("HTTP_CONNECT_TIMEOUT", 5)),
+                float(os.environ.get("HTTP_READ_TIMEOUT", 30)),
+            )
+            _max_per_host = max(1, int(os.environ.get("FETCH_MAX_PER_HOST", 4)))
+
+            session = requests.Session()
+            adapter = TimedHTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            if not _env_bool("HTTP_KEEP_ALIVE", True):
+                session.headers["Connection"] = "close"
+            _session = session
+    return _session
+
+
+def max_requests_per_host() -> int:
+    get_session()
+    return _max_per_host
+
+
+@contextmanager
+def host_slot(url: str) -> Iterator[None]:
+    """Hold one of the FETCH_MAX_PER_HOST slots for the host of `url`."""
+    host = urlsplit(url).netloc
+    with _host_slots_lock:
+        slot = _host_slots.get(host)
+        if slot is None:
+            slot = threading.BoundedSemaphore(max_requests_per_host())
+            _host_slots[host] = slot
+    with slot:
+        yield
+
+
+def request(method: str, url: str, **kwargs: Any) -> requests.Response:
+    """
+    Send a request through the shared session and log its latency breakdown.
+
+    Accepts the same keyword arguments as requests.Session.request; `timeout`
+    defaults to (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT).
+    """
+    session = get_session()
+    kwargs.setdefault("timeout", _timeout)
+    parts = urlsplit(url)
+
+    with host_slot(url):
+        _timing.connect_s = 0.0
+        _timing.connections = 0
+        start = time.perf_counter()
+        r = session.request(method, url, **kwargs)
+        total_ms = (time.perf_counter() - start) * 1000
+
+    connect_ms = _timing.connect_s * 1000
+    transfer_ms = max(total_ms - connect_ms, 0.0)
+    opened = _timing.connections
+
+    with _stats_lock:
+        _stats["requests"] += 1
+        _stats["connections_opened"] += opened
+        _stats["connect_ms"] += connect_ms
+        _stats["transfer_ms"] += transfer_ms
+
+    logger.info(
+        "HTTP | method=%s | host=%s | path=%s | status=%d | connect_ms=%.2f | "
+        "transfer_ms=%.2f | total_ms=%.2f | reused=%s",
+        method, parts.netloc, parts.path, r.status_code, connect_ms,
+        transfer_ms, total_ms, "false" if opened else "true"
+    )
+    return r
+
+
+def http_stats() -> Dict[str, Any]:
+    """Snapshot of the totals accumulated since the process started."""
+    with _stats_lock:
+        return dict(_stats)
@@ -0,0 +1,193 @@
+"""
+Drain sealed spool segments into MySQL.
+
+Each segment is loaded with the same bulk write path as direct ingestion
+(DB_WRITE_MODE / DB_INGEST_MODE) and deleted only after its rows are
+committed. Re-loading a segment after a crash is harmless: rows collide on
+uq_one_observation and are skipped. A segment that fails to load because of
+the database is left in place and retried on the next pass.
+
+A line that cannot be decoded into a listing record (corrupt JSON, missing
+or malformed fields) is logged, skipped and written to `<segment>.bad` when
+the rest of the segment is loaded, so one bad line cannot stall the spool.
+
+    python spool_loader.py            # drain once and exit
+    python spool_loader.py --watch 60 # keep draining every 60 seconds
+"""
+import argparse
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import mysql.connector
+from dotenv import load_dotenv
+
+# listings_db reads DB_WRITE_MODE / DB_INGEST_MODE at import time
+load_dotenv(Path(__file__).resolve().parent / ".env")
+
+from listings_db import (  # noqa: E402
+    INGEST_MODE,
+    LISTING_COLUMNS,
+    WRITE_MODE,
+    bump_run_version,
+    db_config_from_env,
+    get_pool,
+    refresh_benchmarks_for_ids,
+    table_name_from_env,
+    write_listing_rows,
+    write_listing_rows_delta,
+)
+from spool import quarantine_path, read_segment_lines, sealed_segments  # noqa: E402
+
+LOG_DIR = Path(__file__).resolve().parent.parent / "logs"
+LOG_DIR.mkdir(exist_ok=True)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s | %(levelname)-8s | %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+    handlers=[
+        logging.FileHandler(LOG_DIR / "spool_loader.log"),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+
+def record_rows(raw: bytes) -> Tuple[str, str, List[tuple]]:
+    """
+    (query_name, api_query_id, rows in LISTING_COLUMNS order) of one segment
+    line; raises ValueError, KeyError, TypeError or IndexError if it is not
+    a well-formed listing record.
+    """
+    record = json.loads(raw)
+    columns = record["columns"]
+    if tuple(columns) == LISTING_COLUMNS:
+        rows = [tuple(r) for r in record["rows"]]
+    else:
+        # Segment written by an older column layout: reorder by name
+        index = {name: i for i, name in enumerate(columns)}
+        rows = [tuple(r[index[name]] for name in LISTING_COLUMNS) for r in record["rows"]]
+    if any(len(r) != len(LISTING_COLUMNS) for r in rows):
+        raise ValueError(f"rows must have {len(LISTING_COLUMNS)} columns")
+    query_name = record["query_name"]
+    api_query_id = record["api_query_id"]
+    if not isinstance(query_name, str) or not isinstance(api_query_id, str):
+        raise TypeError("query_name and api_query_id must be strings")
+    return query_name, api_query_id, rows
+
+
+def load_segment(
+    path: Path,
+    db_config: Dict[str, Any],
+    table_name: str,
+    loaded_query_ids: Optional[Set[str]] = None
+) -> Tuple[int, int, int, int]:
+    """
+    Load one sealed segment. Returns (rows_read, rows_written, rows_failed,
+    lines_bad); the api_query_ids it touched are added to loaded_query_ids.
+    Bad lines are written to the segment's quarantine file once every good
+    line is loaded.
+    """
+    rows_read = 0
+    rows_written = 0
+    rows_failed = 0
+    bad_lines: List[bytes] = []
+
+    conn = get_pool(db_config).get_connection()
+    try:
+        for lineno, raw in read_segment_lines(path):
+            try:
+                query_name, api_query_id, rows = record_rows(raw)
+            except (ValueError, KeyError, TypeError, IndexError) as e:
+                logger.error(
+                    "SPOOL_LINE | segment=%s | line=%d | status=BAD | error=%s: %s | action=QUARANTINE",
+                    path.name, lineno, type(e).__name__, str(e)
+                )
+                bad_lines.append(raw)
+                continue
+            if not rows:
+                continue
+
+            rows_read += len(rows)
+            if loaded_query_ids is not None:
+                loaded_query_ids.add(api_query_id)
+            if INGEST_MODE == "delta":
+                written, failed, _ = write_listing_rows_delta(conn, table_name, rows, query_name)
+            else:
+                written, failed = write_listing_rows(conn, table_name, rows, query_name)
+            rows_written += written
+            rows_failed += failed
+    finally:
+        conn.close()
+
+    if bad_lines:
+        # Written only now, so a retried segment does not duplicate them
+        with open(quarantine_path(path), "wb") as f:
+            f.writelines(bad_lines)
+            f.flush()
+            os.fsync(f.fileno())
+
+    return rows_read, rows_written, rows_failed, len(bad_lines)
+
+
+def drain(spool_dir: str, db_config: Dict[str, Any], table_name: str) -> int:
+    """Load every sealed segment in `spool_dir`; returns the number loaded."""
+    loaded = 0
+    loaded_query_ids: Set[str] = set()
+    for path in sealed_segments(spool_dir):
+        start = time.perf_counter()
+        try:
+            rows_read, rows_written, rows_failed, lines_bad = load_segment(
+                path, db_config, table_name, loaded_query_ids
+            )
+        except mysql.connector.Error as e:
+            logger.error(
+                "SPOOL_LOAD | segment=%s | status=FAILED | error=%s | action=RETRY_LATER",
+                path.name, str(e)
+            )
+            # Later segments would hit the same outage; stop this pass
+            break
+
+        os.unlink(path)
+        loaded += 1
+        logger.info(
+            "SPOOL_LOAD | segment=%s | mode=%s | ingest=%s | rows_read=%d | rows_written=%d | "
+            "rows_failed=%d | rows_skipped=%d | lines_bad=%d | duration_ms=%.2f | status=SUCCESS",
+            path.name, WRITE_MODE, INGEST_MODE, rows_read, rows_written, rows_failed,
+            rows_read - rows_written - rows_failed, lines_bad, (time.perf_counter() - start) * 1000
+        )
+        if lines_bad:
+            logger.warning(
+                "SPOOL_QUARANTINE | segment=%s | lines_bad=%d | file=%s",
+                path.name, lines_bad, quarantine_path(path).name
+            )
+
+    if loaded_query_ids:
+        refresh_benchmarks_for_ids(db_config, table_name, sorted(loaded_query_ids))
+    if loaded:
+        bump_run_version()
+    return loaded
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Drain the ingestion spool into MySQL")
+    parser.add_argument("--dir", default=os.environ.get("DB_SPOOL_DIR", ""), help="spool directory (default: DB_SPOOL_DIR)")
+    parser.add_argument("--watch", type=float, default=0, help="keep draining every N seconds")
+    args = parser.parse_args()
+
+    if not args.dir:
+        parser.error("no spool directory: pass --dir or set DB_SPOOL_DIR")
+
+    table_name = table_name_from_env()
+    db_config = db_config_from_env()
+
+    while True:
+        count = drain(args.dir, db_config, table_name)
+        logger.info("SPOOL_DRAIN | dir=%s | segments_loaded=%d", args.dir, count)
+        if not args.watch:
+            break
+        time.sleep(args.watch)
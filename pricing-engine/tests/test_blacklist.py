@@ -0,0 +1,104 @@
+"""
+Compiled blacklist matching against the substring test it replaced in
+looks_junk, plus the empty-term and word-boundary rules.
+
+    python -m pytest pricing-engine/tests
+"""
+import random
+import re
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from blacklist import compile_blacklist, matches_blacklist, trie_regex  # noqa: E402
+
+DEFAULT_TERMS = (
+    "for parts", "for repair", "parts only", "not working", "broken", "box only",
+    "empty box", "case", "cover", "read description", "as is", "as-is",
+)
+# Small alphabet, so random terms share prefixes, nest inside each other and
+# include characters that are special in a regex
+ALPHABET = "abc .-+*?()[]\\|^$é"
+
+
+def substring_match(title, terms):
+    """looks_junk before compilation"""
+    t = (title or "").lower()
+    return any(bad in t for bad in terms)
+
+
+def word_match(title, terms):
+    t = (title or "").lower()
+    return any(re.search(r"(?<!\w)" + re.escape(bad) + r"(?!\w)", t) for bad in terms if bad)
+
+
+def random_text(rng, low, high):
+    return "".join(rng.choice(ALPHABET) for _ in range(rng.randint(low, high)))
+
+
+@pytest.mark.parametrize("title", [
+    "Nintendo Switch OLED - For Parts",
+    "Nintendo Switch OLED console",
+    "Switch Lite case and cover bundle",
+    "Showcase edition",
+    "AS-IS not tested",
+    "",
+    None,
+])
+def test_default_terms_match_substring_test(title):
+    assert matches_blacklist(title, DEFAULT_TERMS) == substring_match(title, DEFAULT_TERMS)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_random_terms_match_substring_test(seed):
+    rng = random.Random(seed)
+    terms = tuple(sorted({random_text(rng, 1, 5) for _ in range(rng.randint(1, 40))}))
+    for _ in range(300):
+        title = random_text(rng, 0, 30)
+        assert matches_blacklist(title, terms) == substring_match(title, terms), (terms, title)
+
+
+def test_title_is_lowercased():
+    assert matches_blacklist("BROKEN Screen", ("broken",))
+
+
+def test_no_terms_match_nothing():
+    assert compile_blacklist(()) is None
+    assert not matches_blacklist("anything", ())
+
+
+def test_empty_term_is_skipped():
+    # A substring test treats "" as present in every title; the compiled
+    # blacklist ignores it instead
+    assert compile_blacklist(("",)) is None
+    assert trie_regex(["", "broken"]) == trie_regex(["broken"])
+    assert not matches_blacklist("working console", ("", "broken"))
+    assert matches_blacklist("broken console", ("", "broken"))
+
+
+@pytest.mark.parametrize("title, expected", [
+    ("Protective case", True),
+    ("case for switch", True),
+    ("(case)", True),
+    ("case-mate", True),
+    ("Showcase edition", False),
+    ("cases", False),
+    ("suitcase_handle", False),
+])
+def test_word_boundary(title, expected):
+    assert matches_blacklist(title, ("case",), word_boundary=True) == expected
+    assert matches_blacklist(title, ("case",)) == ("case" in title.lower())
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_word_boundary_matches_per_term_search(seed):
+    rng = random.Random(seed)
+    words = ["case", "cases", "showcase", "for", "parts", "for parts", "as-is", "is", "box"]
+    terms = tuple(sorted(set(rng.sample(words, rng.randint(1, len(words))))))
+    for _ in range(300):
+        # Separators include "" so words run into each other
+        title = "".join(rng.choice(words) + rng.choice(["", " ", "-", "(", "_"]) for _ in range(rng.randint(0, 6)))
+        assert matches_blacklist(title, terms, word_boundary=True) == word_match(title, terms), (terms, title)
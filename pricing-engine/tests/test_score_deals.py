@@ -0,0 +1,134 @@
+"""
+score_deals_columnar (NumPy) against score_deals_python: the same deals, in
+the same order, for any input. Skipped without numpy.
+
+    python -m pytest pricing-engine/tests
+"""
+import os
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("numpy")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Placeholders so fetch_data's ebay_auth import succeeds; nothing calls eBay
+os.environ.setdefault("CLIENT_ID", "test")
+os.environ.setdefault("CLIENT_SECRET", "test")
+os.environ.setdefault("EBAY_TOKEN_BACKGROUND_REFRESH", "false")
+
+import fetch_data  # noqa: E402
+from fetch_data import CONDITION_BUCKETS, ListingRecord  # noqa: E402
+
+DISCOUNT_THRESHOLD = 0.15
+TRIM_FRACTION = 0.15
+
+
+def record(i, total, bucket):
+    return ListingRecord(
+        item_id=f"v1|{i}|0",
+        title=f"Listing {i}",
+        url=f"https://www.ebay.com/itm/{i}",
+        condition=bucket.title(),
+        bucket=bucket,
+        price=total,
+        currency="USD",
+        total=total,
+        price_money={"value": f"{total:.2f}", "currency": "USD"},
+        buying_options=["FIXED_PRICE"],
+    )
+
+
+def records(totals, buckets):
+    return [record(i, total, bucket) for i, (total, bucket) in enumerate(zip(totals, buckets))]
+
+
+def assert_same(items, discount_threshold=DISCOUNT_THRESHOLD, trim_fraction=TRIM_FRACTION):
+    expected = fetch_data.score_deals_python(items, discount_threshold, trim_fraction)
+    assert fetch_data.score_deals_columnar(items, discount_threshold, trim_fraction) == expected
+    return expected
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("size", [1, 4, 5, 37, 2500])
+def test_random_items(seed, size):
+    rng = random.Random(seed * 10000 + size)
+    totals = [round(rng.lognormvariate(6.5, 0.4), 2) for _ in range(size)]
+    buckets = [rng.choice(CONDITION_BUCKETS) for _ in range(size)]
+    assert_same(records(totals, buckets))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_ties(seed):
+    # Few distinct totals: equal discounts across buckets, so the order of
+    # tied deals comes down to the stable sort of the emission order
+    rng = random.Random(seed)
+    totals = [rng.choice([50.0, 80.0, 100.0, 100.0, 120.0]) for _ in range(300)]
+    buckets = [rng.choice(CONDITION_BUCKETS) for _ in range(300)]
+    deals = assert_same(records(totals, buckets))
+    assert len({d["discount_pct"] for d in deals}) < len(deals)
+
+
+def test_all_equal_totals():
+    assert assert_same(records([99.99] * 50, ["USED"] * 50)) == []
+
+
+@pytest.mark.parametrize("totals", [
+    [0.0] * 10,
+    [0.0] * 9 + [100.0],
+    [-5.0, -1.0, 0.0, 10.0, 20.0, 30.0, 40.0],
+    [-50.0] * 6,
+    [-10.0, -20.0, 5.0, 100.0, 110.0, 120.0, 130.0, 140.0],
+])
+def test_zero_and_negative_totals(totals):
+    for buckets in (["NEW"] * len(totals), [CONDITION_BUCKETS[i % 3] for i in range(len(totals))]):
+        assert_same(records(totals, buckets))
+
+
+def test_non_positive_median_skips_bucket():
+    items = records([0.0] * 6 + [100.0, 40.0, 110.0, 120.0, 100.0], ["NEW"] * 6 + ["USED"] * 5)
+    deals = assert_same(items)
+    assert deals and {d["condition"] for d in deals} == {"USED"}
+
+
+@pytest.mark.parametrize("present", [(), ("NEW",), ("USED",), ("OTHER",), ("NEW", "OTHER")])
+def test_empty_condition_buckets(present):
+    rng = random.Random(len(present))
+    buckets = [rng.choice(present) for _ in range(200)] if present else []
+    totals = [round(rng.uniform(20, 200), 2) for _ in buckets]
+    deals = assert_same(records(totals, buckets))
+    assert {d["condition"] for d in deals} <= set(present)
+
+
+@pytest.mark.parametrize("discount_threshold", [-1.0, 0.0, 0.15, 0.5, 1.0])
+@pytest.mark.parametrize("trim_fraction", [0.0, 0.15, 0.45])
+def test_thresholds_and_trim(discount_threshold, trim_fraction):
+    rng = random.Random(7)
+    totals = [round(rng.uniform(1, 500), 2) for _ in range(400)]
+    buckets = [rng.choice(CONDITION_BUCKETS) for _ in range(400)]
+    assert_same(records(totals, buckets), discount_threshold, trim_fraction)
+
+
+@pytest.mark.parametrize("offset", [-1, 0, 1])
+def test_columnar_min_items_threshold(monkeypatch, offset):
+    monkeypatch.setattr(fetch_data, "SCORE_COLUMNAR_MIN_ITEMS", 100)
+    calls = []
+    columnar = fetch_data.score_deals_columnar
+
+    def spy(*args):
+        calls.append(args)
+        return columnar(*args)
+
+    monkeypatch.setattr(fetch_data, "score_deals_columnar", spy)
+    rng = random.Random(100 + offset)
+    count = 100 + offset
+    items = records(
+        [round(rng.uniform(20, 200), 2) for _ in range(count)],
+        [rng.choice(CONDITION_BUCKETS) for _ in range(count)],
+    )
+    deals = fetch_data.score_deals(items, DISCOUNT_THRESHOLD, TRIM_FRACTION)
+    assert len(calls) == (1 if count >= 100 else 0)
+    assert deals == fetch_data.score_deals_python(items, DISCOUNT_THRESHOLD, TRIM_FRACTION)
@@ -0,0 +1,141 @@
+"""
+trimmed_median (selection) against the sort-based reference, and the KLL
+sketch's trimmed median against the exact one.
+
+    python -m pytest pricing-engine/tests
+"""
+import bisect
+import os
+import random
+import statistics
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Placeholders so fetch_data's ebay_auth import succeeds; nothing calls eBay
+os.environ.setdefault("CLIENT_ID", "test")
+os.environ.setdefault("CLIENT_SECRET", "test")
+os.environ.setdefault("EBAY_TOKEN_BACKGROUND_REFRESH", "false")
+
+import fetch_data  # noqa: E402
+from quantile_sketch import KLLSketch  # noqa: E402
+
+TRIM_FRACTION = 0.15
+# quantile_sketch documents rank error within about 1.7 / k
+RANK_ERROR_PER_K = 1.7
+
+
+def sort_trimmed_median(values, trim_fraction):
+    """trimmed_median as it was before selection: sort, slice, statistics.median."""
+    vals = sorted(v for v in values if v is not None)
+    n = len(vals)
+    if n == 0:
+        return None
+    if n < 5:
+        return statistics.median(vals)
+    k = int(n * trim_fraction)
+    return statistics.median(vals[k: max(n - k, k + 1)])
+
+
+def make_prices(rng, count):
+    # Listing totals: log-normal around ~$700 with cent resolution
+    return [round(rng.lognormvariate(6.5, 0.35), 2) for _ in range(count)]
+
+
+def rank_error(values, exact, estimate):
+    """Distance in ranks (as a fraction of n) between two values, ties counting as a match"""
+    ordered = sorted(values)
+    target = bisect.bisect_left(ordered, exact)
+    lo = bisect.bisect_left(ordered, estimate)
+    hi = bisect.bisect_right(ordered, estimate)
+    if lo <= target < hi:
+        return 0.0
+    return min(abs(lo - target), abs(hi - 1 - target)) / len(values)
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("size", [5, 6, 7, 50, 51, 1000, 20001])
+def test_selection_matches_sort_random(seed, size):
+    values = make_prices(random.Random(seed * 1000 + size), size)
+    assert fetch_data.trimmed_median(values, TRIM_FRACTION) == sort_trimmed_median(values, TRIM_FRACTION)
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("size", [5, 10, 99, 1000])
+def test_selection_matches_sort_with_ties(seed, size):
+    rng = random.Random(seed)
+    values = [rng.choice([9.99, 10.0, 10.0, 12.5, 12.5, 12.5, 40.0]) for _ in range(size)]
+    assert fetch_data.trimmed_median(values, TRIM_FRACTION) == sort_trimmed_median(values, TRIM_FRACTION)
+    same = [25.0] * size
+    assert fetch_data.trimmed_median(same, TRIM_FRACTION) == 25.0
+
+
+@pytest.mark.parametrize("values", [
+    [],
+    [None],
+    [7.0],
+    [3.0, 1.0],
+    [5.0, None, 1.0, 3.0],
+    [4.0, 1.0, 3.0, 2.0],
+    [1.0, 2.0, 3.0, 4.0, 1000.0],
+    sorted(range(100)),
+    sorted(range(100), reverse=True),
+])
+def test_selection_matches_sort_small_and_empty(values):
+    values = [float(v) if v is not None else None for v in values]
+    for trim_fraction in (0.0, TRIM_FRACTION, 0.45, 0.5):
+        assert fetch_data.trimmed_median(values, trim_fraction) == sort_trimmed_median(values, trim_fraction)
+
+
+@pytest.mark.parametrize("k", [100, 200])
+@pytest.mark.parametrize("seed", range(3))
+def test_sketch_within_documented_rank_error(k, seed):
+    values = make_prices(random.Random(seed), 200000)
+    sketch = KLLSketch(k=k, seed=seed)
+    sketch.extend(values)
+
+    exact = fetch_data.trimmed_median(values, TRIM_FRACTION)
+    assert sketch.count == len(values)
+    assert sketch.retained() < len(values) // 50
+    assert rank_error(values, exact, sketch.trimmed_median(TRIM_FRACTION)) <= RANK_ERROR_PER_K / k
+
+
+def test_sketch_is_exact_before_compacting():
+    values = make_prices(random.Random(3), 150)
+    sketch = KLLSketch(k=200, seed=3)
+    sketch.extend(values)
+    assert sketch.trimmed_median(TRIM_FRACTION) == fetch_data.trimmed_median(values, TRIM_FRACTION)
+
+
+def test_merge_equals_single_sketch_without_compaction():
+    values = make_prices(random.Random(4), 120)
+    left, right, whole = KLLSketch(seed=1), KLLSketch(seed=2), KLLSketch(seed=3)
+    left.extend(values[:60])
+    right.extend(values[60:])
+    whole.extend(values)
+    left.merge(right)
+    assert left.count == whole.count
+    assert left.trimmed_median(TRIM_FRACTION) == whole.trimmed_median(TRIM_FRACTION)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_merge_matches_single_sketch_within_bound(seed):
+    k = 200
+    values = make_prices(random.Random(seed + 10), 200000)
+    left, right, whole = KLLSketch(k=k, seed=seed), KLLSketch(k=k, seed=seed + 1), KLLSketch(k=k, seed=seed + 2)
+    left.extend(values[::2])
+    right.extend(values[1::2])
+    whole.extend(values)
+    left.merge(right)
+
+    assert left.count == whole.count == len(values)
+    exact = fetch_data.trimmed_median(values, TRIM_FRACTION)
+    bound = RANK_ERROR_PER_K / k
+    merged = left.trimmed_median(TRIM_FRACTION)
+    single = whole.trimmed_median(TRIM_FRACTION)
+    assert rank_error(values, exact, merged) <= bound
+    assert rank_error(values, exact, single) <= bound
+    assert rank_error(values, single, merged) <= 2 * bound